@@ -1,5 +1,6 @@
+import math
 import bpy
-from . import helper, blender_nerf_ui, sof_ui, ttc_ui, cos_ui, sof_operator, ttc_operator, cos_operator
+from . import helper, blender_nerf_ui, sof_ui, ttc_ui, cos_ui, pfr_ui, sof_operator, ttc_operator, cos_operator, pfr_operator, merge_operator
 
 
 # blender info
@@ -26,20 +27,45 @@ PROPS = [
     ('test_data', bpy.props.BoolProperty(name='Test', description='Construct the testing data', default=True) ),
     ('aabb', bpy.props.IntProperty(name='AABB', description='AABB scale as defined in Instant NGP', default=4, soft_min=1, soft_max=128) ),
     ('render_frames', bpy.props.BoolProperty(name='Render Frames', description='Whether training frames should be rendered. If not selected, only the transforms.json files will be generated', default=True) ),
+    ('resume', bpy.props.BoolProperty(name='Resume', description='Whether to only render the training frames missing or stale in the manifest of an existing dataset folder, for instance after a crash or a cancelled render', default=False) ),
+    ('progressive', bpy.props.BoolProperty(name='Progressive', description='Whether to render the training frames in batches of growing size following a coverage order of their views, such that a stopped render keeps frames spread over all views', default=False) ),
+    ('render_test', bpy.props.BoolProperty(name='Render Test Frames', description='Whether to also render the testing frames into the test folder, after the training frames in the same Blender session, keeping the scene loaded between both renders', default=False) ),
+    ('pyramid_levels', bpy.props.IntProperty(name='Image Pyramid', description='Number of downscaled copies of the training frames, each half the resolution of the previous one, saved to train_2, train_4, ... folders with matching transforms_train_2.json, transforms_train_4.json, ... files. Requires the OpenImageIO python module bundled with Blender', default=0, min=0, max=4) ),
+    ('render_passes', bpy.props.EnumProperty(name='Render Passes', description='Auxiliary passes written by the compositor alongside each training frame, in the same render', items=[('DEPTH', 'Depth', 'Distance to the camera plane'), ('NORMAL', 'Normal', 'World space normals'), ('MASK', 'Mask', 'Alpha mask, requires a transparent film background')], options={'ENUM_FLAG'}, default=set()) ),
+    ('passes_format', bpy.props.EnumProperty(name='Passes Format', description='File format of the auxiliary render passes', items=[('PNG', 'PNG 16 bit', 'One 16 bit png file per pass and frame, depth divided by the max depth and normals mapped to [0, 1]'), ('EXR', 'Multilayer EXR', 'One 32 bit multilayer exr file per frame with raw pass values')], default='PNG') ),
+    ('depth_max', bpy.props.FloatProperty(name='Max Depth', description='Depth mapped to the maximum 16 bit png value, further depths are clipped', default=10.0, min=0.001, soft_max=1000.0, unit='LENGTH') ),
     ('logs', bpy.props.BoolProperty(name='Save Log File', description='Whether to create a log file containing information on the BlenderNeRF run', default=False) ),
+    ('profile', bpy.props.BoolProperty(name='Profile Run', description='Whether to save the time spent in each stage of the BlenderNeRF run, and the render time, save time and file size of each rendered frame, to profile.json and profile.csv files', default=False) ),
     ('splats', bpy.props.BoolProperty(name='Gaussian Points', description='Whether to export a points3d.ply file for Gaussian Splatting', default=False) ),
+    ('splats_sampling', bpy.props.EnumProperty(name='Points', description='Points of the visible meshes exported to the points3d.ply file', items=[('VERTICES', 'Vertices', 'Every mesh vertex'), ('SURFACE', 'Surface', 'Point budget sampled uniformly on the mesh surfaces (area weighted)'), ('VOXEL', 'Voxel Grid', 'Mesh vertices averaged on a voxel grid of at most point budget cells')], default='VERTICES') ),
+    ('splats_format', bpy.props.EnumProperty(name='Points Format', description='Files of the Gaussian points and training cameras', items=[('PLY', 'PLY', 'points3d.ply file, with the cameras of the transforms files'), ('COLMAP', 'COLMAP', 'COLMAP binary sparse model in sparse/0 : cameras.bin, images.bin and points3D.bin'), ('BOTH', 'Both', 'points3d.ply file and COLMAP binary sparse model')], default='PLY') ),
+    ('splats_budget', bpy.props.IntProperty(name='Point Budget', description='Maximum number of points exported to the points3d.ply file', default=100000, min=1, soft_max=10000000) ),
     ('splats_test_dummy', bpy.props.BoolProperty(name='Dummy Test Camera', description='Whether to export a dummy test transforms.json file or the full set of test camera poses', default=True) ),
     ('nerf', bpy.props.BoolProperty(name='NeRF', description='Whether to export the camera transforms.json files in the defaut NeRF file format convention', default=False) ),
+    ('stream_transforms', bpy.props.BoolProperty(name='Stream Transforms', description='Whether to append the transforms entry of every training frame to a transforms_train.jsonl file as soon as it is rendered', default=False) ),
+    ('compact_json', bpy.props.BoolProperty(name='Compact Transforms', description='Whether to stream the transforms.json files to disk with one compact line per frame, instead of the indented file format', default=False) ),
+    ('pose_sidecar', bpy.props.EnumProperty(name='Pose Sidecar', description='Binary file storing all camera matrices and file paths next to each transforms.json file', items=[('NONE', 'None', 'No pose sidecar'), ('NPZ', 'NPZ', 'NumPy .npz archive with transform_matrix and file_path arrays'), ('RAW', 'Raw', 'Raw little endian float32 matrices and a text file with file paths')], default='NONE') ),
+    ('tar_shard_size', bpy.props.IntProperty(name='Shard Size', description='Approximate size of the tar shards in megabytes', default=256, min=1) ),
+    ('archive_format', bpy.props.EnumProperty(name='Output', description='How the dataset folder is stored once created', items=[('ZIP', 'ZIP', 'ZIP archive, images are stored without recompression'), ('TAR', 'TAR', 'Uncompressed TAR archive'), ('SHARDS', 'Tar Shards', 'WebDataset tar shards of frames and poses, with an index file'), ('FOLDER', 'Folder', 'Keep the dataset folder as is')], default='ZIP') ),
+    ('cache_path', bpy.props.StringProperty(name='Render Cache', description='Path to a render cache directory shared across datasets, frames already rendered with the same camera pose, scene and render settings are reused instead of rendered. Leave empty to disable the cache', subtype='DIR_PATH') ),
+    ('cache_size', bpy.props.FloatProperty(name='Cache Size', description='Maximum size of the render cache in GB, least recently used frames are removed first', default=10.0, min=0.0, soft_max=1000.0) ),
     ('save_path', bpy.props.StringProperty(name='Save Path', description='Path to the output directory in which the synthetic dataset will be stored', subtype='DIR_PATH') ),
 
     # global automatic properties
     ('init_frame_step', bpy.props.IntProperty(name='Initial Frame Step') ),
+    ('init_frame_start', bpy.props.IntProperty(name='Initial Frame Start') ),
+    ('init_use_overwrite', bpy.props.BoolProperty(name='Initial Overwrite', default=True) ),
     ('init_output_path', bpy.props.StringProperty(name='Initial Output Path', subtype='DIR_PATH') ),
-    ('rendering', bpy.props.BoolVectorProperty(name='Rendering', description='Whether one of the SOF, TTC or COS methods is rendering', default=(False, False, False), size=3) ),
+    ('rendering', bpy.props.BoolVectorProperty(name='Rendering', description='Whether one of the SOF, TTC, COS or PFR methods is rendering', default=(False, False, False, False), size=4) ),
     ('blendernerf_version', bpy.props.StringProperty(name='BlenderNeRF Version', default=VERSION) ),
+    ('shard_index', bpy.props.IntProperty(name='Shard Index', description='Index of the training frames shard rendered by this Blender process', default=0, min=0, options={'SKIP_SAVE'}) ), # per process command line settings, not saved with the blender file
+    ('shard_count', bpy.props.IntProperty(name='Shard Count', description='Number of shards the training frames are split into, each rendered by a separate Blender process', default=1, min=1, options={'SKIP_SAVE'}) ),
 
     # sof properties
     ('sof_dataset_name', bpy.props.StringProperty(name='Name', description='Name of the SOF dataset : the data will be stored under <save path>/<name>', default='dataset') ),
+    ('sof_selection', bpy.props.EnumProperty(name='Frame Selection', description='How training frames are selected from the camera animation', items=[('STEP', 'Frame Step', 'Every N-th frame'), ('COVERAGE', 'Coverage', 'Frames with the most diverse camera poses')], default='STEP') ),
+    ('sof_nb_frames', bpy.props.IntProperty(name='Frames', description='Number of training frames selected by pose coverage', default=100, min=1) ),
+    ('sof_min_distance', bpy.props.FloatProperty(name='Min Pose Distance', description='Frames whose camera pose is closer to an already selected frame are never selected. Pose distance combines the camera position, relative to the camera path extent, and the view direction', default=0.01, min=0.0, soft_max=1.0) ),
     ('train_frame_steps', bpy.props.IntProperty(name='Frame Step', description='Frame step N for the captured training frames. Every N-th frame will be used for training NeRF', default=3, soft_min=1) ),
 
     # ttc properties
@@ -56,11 +82,14 @@ PROPS = [
     ('sphere_radius', bpy.props.FloatProperty(name='Radius', description='Radius scale of the training sphere', default=4.0, soft_min=0.01, unit='LENGTH', update=helper.properties_ui_upd) ),
     ('focal', bpy.props.FloatProperty(name='Lens', description='Focal length of the training camera', default=50, soft_min=1, soft_max=5000, unit='CAMERA', update=helper.properties_ui_upd) ),
     ('seed', bpy.props.IntProperty(name='Seed', description='Random seed for sampling views on the training sphere', default=0) ),
+    ('sphere_sampling', bpy.props.EnumProperty(name='Sampling', description='How training views are distributed on the training sphere', items=[('RANDOM', 'Random', 'Independent uniform random views'), ('FIBONACCI', 'Fibonacci', 'Fibonacci lattice, evenly spread views'), ('HALTON', 'Halton', 'Halton low discrepancy sequence'), ('SOBOL', 'Sobol', 'Sobol low discrepancy sequence'), ('POISSON', 'Poisson Disk', 'Blue noise views separated by a minimum angle')], default='RANDOM') ),
+    ('sphere_min_angle', bpy.props.FloatProperty(name='Min Angle', description='Minimum angle between Poisson disk views, automatically derived from the number of frames if zero', default=0.0, min=0.0, max=math.pi, subtype='ANGLE') ),
     ('cos_nb_frames', bpy.props.IntProperty(name='Frames', description='Number of training frames randomly sampled from the training sphere', default=100, soft_min=1) ),
     ('show_sphere', bpy.props.BoolProperty(name='Sphere', description='Whether to show the training sphere from which random views will be sampled', default=False, update=helper.visualize_sphere) ),
     ('show_camera', bpy.props.BoolProperty(name='Camera', description='Whether to show the training camera', default=False, update=helper.visualize_camera) ),
     ('upper_views', bpy.props.BoolProperty(name='Upper Views', description='Whether to sample views from the upper hemisphere of the training sphere only', default=False) ),
     ('outwards', bpy.props.BoolProperty(name='Outwards', description='Whether to point the camera outwards of the training sphere', default=False, update=helper.properties_ui_upd) ),
+    ('cos_static', bpy.props.BoolProperty(name='Static Scene', description='Whether the scene is static, such that only the camera is synchronized between rendered frames', default=False) ),
 
     # cos automatic properties
     ('sphere_exists', bpy.props.BoolProperty(name='Sphere Exists', description='Whether the sphere exists', default=False) ),
@@ -69,6 +98,11 @@ PROPS = [
     ('init_camera_exists', bpy.props.BoolProperty(name='Init camera exists', description='Whether the camera initially exists', default=False) ),
     ('init_active_camera', bpy.props.PointerProperty(type=bpy.types.Object, name='Init active camera', description='Pointer to initial active camera', poll=helper.poll_is_camera) ),
     ('init_frame_end', bpy.props.IntProperty(name='Initial Frame End') ),
+
+    # pfr properties
+    ('pfr_dataset_name', bpy.props.StringProperty(name='Name', description='Name of the PFR dataset : the data will be stored under <save path>/<name>', default='dataset') ),
+    ('pfr_filepath', bpy.props.StringProperty(name='Pose File', description='Camera poses to replay : a transforms.json file, a COLMAP images.txt file or a NumPy .npy or .npz array of camera to world matrices', subtype='FILE_PATH') ),
+    ('pfr_intrinsics', bpy.props.BoolProperty(name='File Intrinsics', description='Whether to set the focal length of the replay camera from the pose file intrinsics, if any, and check that the exported intrinsics match them', default=True) ),
 ]
 
 # classes to register / unregister
@@ -77,9 +111,12 @@ CLASSES = [
     sof_ui.SOF_UI,
     ttc_ui.TTC_UI,
     cos_ui.COS_UI,
+    pfr_ui.PFR_UI,
     sof_operator.SubsetOfFrames,
     ttc_operator.TrainTestCameras,
-    cos_operator.CameraOnSphere
+    cos_operator.CameraOnSphere,
+    pfr_operator.PoseFileReplay,
+    merge_operator.MergeShards
 ]
 
 # load addon
@@ -91,8 +128,16 @@ def register():
         bpy.utils.register_class(cls)
 
     bpy.app.handlers.render_complete.append(helper.post_render)
-    bpy.app.handlers.render_cancel.append(helper.post_render)
-    bpy.app.handlers.frame_change_post.append(helper.cos_camera_update)
+    bpy.app.handlers.render_cancel.append(helper.cancel_render)
+    bpy.app.handlers.render_write.append(helper.archive_frame)
+    bpy.app.handlers.render_write.append(helper.record_frame)
+    bpy.app.handlers.render_write.append(helper.stream_frame)
+    bpy.app.handlers.render_write.append(helper.cache_frame)
+    bpy.app.handlers.render_write.append(helper.pyramid_frame)
+    bpy.app.handlers.render_write.append(helper.progress_frame)
+    bpy.app.handlers.render_pre.append(helper.profile_frame_start)
+    bpy.app.handlers.render_post.append(helper.profile_frame_end)
+    bpy.app.handlers.render_write.append(helper.profile_frame_write)
     bpy.app.handlers.depsgraph_update_post.append(helper.properties_desgraph_upd)
     bpy.app.handlers.depsgraph_update_post.append(helper.set_init_props)
 
@@ -102,8 +147,19 @@ def unregister():
         delattr(bpy.types.Scene, prop_name)
 
     bpy.app.handlers.render_complete.remove(helper.post_render)
-    bpy.app.handlers.render_cancel.remove(helper.post_render)
-    bpy.app.handlers.frame_change_post.remove(helper.cos_camera_update)
+    bpy.app.handlers.render_cancel.remove(helper.cancel_render)
+    bpy.app.handlers.render_write.remove(helper.archive_frame)
+    bpy.app.handlers.render_write.remove(helper.record_frame)
+    bpy.app.handlers.render_write.remove(helper.stream_frame)
+    bpy.app.handlers.render_write.remove(helper.cache_frame)
+    bpy.app.handlers.render_write.remove(helper.pyramid_frame)
+    bpy.app.handlers.render_write.remove(helper.progress_frame)
+    bpy.app.handlers.render_pre.remove(helper.profile_frame_start)
+    bpy.app.handlers.render_post.remove(helper.profile_frame_end)
+    bpy.app.handlers.render_write.remove(helper.profile_frame_write)
+    helper.camera_handler(False)
+    if helper.replay_camera_update in bpy.app.handlers.frame_change_post:
+        bpy.app.handlers.frame_change_post.remove(helper.replay_camera_update)
     bpy.app.handlers.depsgraph_update_post.remove(helper.properties_desgraph_upd)
     # bpy.app.handlers.depsgraph_update_post.remove(helper.set_init_props)
 
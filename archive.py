@@ -0,0 +1,201 @@
+import os
+import io
+import json
+import queue
+import shutil
+import tarfile
+import posixpath
+import threading
+import zipfile
+
+
+# file extensions of already compressed data, stored without deflating in zip archives
+COMPRESSED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.exr', '.jp2', '.j2c', '.npz'}
+
+# folders of the frames stored as samples in tar shards, with the poses of their transforms file
+SHARD_FOLDERS = ('train', 'test')
+SHARD_NAME = 'shard-{:06d}.tar'
+
+# dataset archives still being finalized, by output path
+finalizing = {}
+
+
+# wait until a previous archive of the same dataset is finalized
+def wait_for(output_path):
+    thread = finalizing.get(output_path)
+    if thread is not None:
+        thread.join()
+
+# frames and their poses as webdataset samples in tar shards of about max_size bytes, other dataset files are copied as is
+# a frame train/0001.png is stored as train/0001.png and train/0001.json (camera intrinsics and frame entry of transforms_train.json)
+class ShardWriter:
+    def __init__(self, output_path, shards_path, max_size):
+        self.output_path = output_path
+        self.shards_path = shards_path
+        self.max_size = max_size
+        self.poses = {} # sample data by sample key, of the loaded transforms files
+        self.loaded = set()
+        self.shards = [] # name, number of samples and size of every shard
+        self.samples = {'key': [], 'shard': [], 'offset': []} # tar header offset of the first file of every sample
+        self.tar = None
+        os.makedirs(shards_path, exist_ok=True)
+
+    # sample data of a frame, None for files which are not frames, transforms files are loaded when first needed
+    def pose(self, key):
+        folder = key.split('/')[0]
+        if folder not in SHARD_FOLDERS:
+            return None
+
+        if folder not in self.loaded:
+            self.loaded.add(folder)
+            filepath = os.path.join(self.output_path, f'transforms_{folder}.json')
+            if os.path.isfile(filepath):
+                with open(filepath, 'r') as file:
+                    data = json.load(file)
+                camera = {name: value for name, value in data.items() if name != 'frames'}
+                for frame in data.get('frames', []):
+                    frame_key = posixpath.splitext(frame['file_path'].replace(os.sep, '/'))[0]
+                    self.poses[frame_key] = {**camera, **frame}
+
+        return self.poses.get(key)
+
+    # close the full shard, such that it can be read while the next one is written
+    def next_shard(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.shards[-1]['size'] = os.path.getsize(os.path.join(self.shards_path, self.shards[-1]['url']))
+
+        name = SHARD_NAME.format(len(self.shards))
+        self.tar = tarfile.open(os.path.join(self.shards_path, name), 'w', format=tarfile.GNU_FORMAT) # no pax header per file
+        self.shards.append({'url': name, 'samples': 0, 'size': None})
+
+    def write(self, filepath, arcname):
+        key, extension = posixpath.splitext(arcname)
+        pose = self.pose(key)
+        if pose is None:
+            target = os.path.join(self.shards_path, *arcname.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(filepath, target)
+            return
+
+        data = json.dumps(pose).encode()
+        size = os.path.getsize(filepath) + len(data) + 4 * tarfile.BLOCKSIZE # headers and padding
+        if self.tar is None or (self.shards[-1]['samples'] > 0 and self.tar.offset + size > self.max_size):
+            self.next_shard()
+
+        self.samples['key'].append(key)
+        self.samples['shard'].append(len(self.shards) - 1)
+        self.samples['offset'].append(self.tar.offset)
+
+        self.tar.add(filepath, key + extension, recursive=False)
+        info = tarfile.TarInfo(key + '.json')
+        info.size = len(data)
+        info.mtime = int(os.path.getmtime(filepath))
+        self.tar.addfile(info, io.BytesIO(data))
+        self.shards[-1]['samples'] += 1
+
+    # close the last shard and write the index of all shards and samples
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.shards[-1]['size'] = os.path.getsize(os.path.join(self.shards_path, self.shards[-1]['url']))
+            self.tar = None
+
+        index = {'format': 'webdataset', 'shards': self.shards, 'samples': self.samples}
+        with open(os.path.join(self.shards_path, 'index.json'), 'w') as file:
+            json.dump(index, file, separators=(',', ':'))
+
+# dataset archive filled on a worker thread while frames are written, and finalized in the background
+class DatasetArchive:
+    def __init__(self, output_path, archive_format='ZIP', shard_size=256 * 2 ** 20):
+        assert archive_format == 'ZIP' or archive_format == 'TAR' or archive_format == 'SHARDS' or archive_format == 'FOLDER'
+        wait_for(output_path)
+
+        self.output_path = output_path
+        self.archive_format = archive_format
+        self.added = set()
+        self.queue = queue.Queue()
+
+        self.archive_path = output_path + '.' + archive_format.lower()
+        if archive_format == 'ZIP':
+            self.archive = zipfile.ZipFile(self.archive_path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        elif archive_format == 'TAR':
+            self.archive = tarfile.open(self.archive_path, 'w') # uncompressed
+        elif archive_format == 'SHARDS':
+            self.archive = ShardWriter(output_path, self.archive_path, shard_size)
+        else:
+            self.archive = None
+
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    # queue a dataset file, added to the archive as soon as possible
+    def add(self, filepath):
+        if self.archive is not None:
+            self.queue.put(filepath)
+
+    def run(self):
+        while True:
+            filepath = self.queue.get()
+            if filepath is None:
+                break
+            self.write(filepath)
+
+    def write(self, filepath):
+        arcname = os.path.relpath(filepath, self.output_path).replace(os.sep, '/')
+        if arcname in self.added or not os.path.isfile(filepath):
+            return
+
+        if self.archive_format == 'ZIP':
+            extension = os.path.splitext(filepath)[1].lower()
+            compression = zipfile.ZIP_STORED if extension in COMPRESSED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            self.archive.write(filepath, arcname, compress_type=compression)
+        elif self.archive_format == 'TAR':
+            self.archive.add(filepath, arcname, recursive=False)
+        else:
+            self.archive.write(filepath, arcname)
+
+        self.added.add(arcname)
+
+    # add the remaining files, close the archive and remove the dataset folder on a background thread
+    # on_finish is called on that thread once all files are archived, and returns extra files to archive
+    def finalize(self, remove_folder=True, on_finish=None):
+        self.queue.put(None)
+        thread = threading.Thread(target=self.finish, args=(remove_folder, on_finish))
+        finalizing[self.output_path] = thread
+        thread.start()
+        return thread
+
+    # stop archiving and remove the partial archive
+    def abort(self):
+        self.queue.put(None)
+        self.worker.join()
+
+        if self.archive is not None:
+            self.archive.close()
+            if os.path.isdir(self.archive_path):
+                shutil.rmtree(self.archive_path)
+            else:
+                os.remove(self.archive_path)
+
+    def finish(self, remove_folder=True, on_finish=None):
+        self.worker.join()
+
+        if self.archive is not None:
+            for root, dirs, files in os.walk(self.output_path):
+                dirs.sort()
+                for filename in sorted(files):
+                    self.write(os.path.join(root, filename))
+
+        extra_files = on_finish() if on_finish is not None else []
+
+        if self.archive is not None:
+            for filepath in extra_files:
+                self.write(filepath)
+
+            self.archive.close()
+            if remove_folder:
+                shutil.rmtree(self.output_path)
+
+        if finalizing.get(self.output_path) is threading.current_thread():
+            del finalizing[self.output_path]
@@ -0,0 +1 @@
+# offline benchmarks of the BlenderNeRF export paths, see run.py
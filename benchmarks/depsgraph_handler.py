@@ -0,0 +1,89 @@
+# micro benchmark of the BlenderNeRF depsgraph update handler, run inside blender :
+#
+#   blender -b -P benchmarks/depsgraph_handler.py -- --updates 200 --objects 1000
+#
+# measures the handler cost per depsgraph update when an unrelated object moves, when the sphere moves and when the frame changes,
+# and the number of extra depsgraph updates triggered by the handler itself, for the dirty checked and the full sync
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import blendernerf_cli
+
+
+def parse_args(argv):
+    argv = argv[argv.index('--') + 1:] if '--' in argv else []
+    parser = argparse.ArgumentParser(prog='blender -b -P benchmarks/depsgraph_handler.py --')
+    parser.add_argument('--updates', type=int, default=200, help='depsgraph updates per scenario')
+    parser.add_argument('--objects', type=int, default=1000, help='unrelated objects added to the scene')
+    return parser.parse_args(argv)
+
+# replace the addon handler by a timed version, calling the given sync function
+def timed_handler(helper, sync, durations):
+    def handler(scene, depsgraph=None):
+        start = time.perf_counter()
+        sync(scene, depsgraph)
+        durations.append(time.perf_counter() - start)
+
+    handlers = bpy.app.handlers.depsgraph_update_post
+    index = list(handlers).index(helper.properties_desgraph_upd)
+    handlers[index] = handler
+    return lambda: handlers.__setitem__(index, helper.properties_desgraph_upd)
+
+def run_scenario(scene, update, nb_updates):
+    for i in range(nb_updates):
+        update(i)
+        bpy.context.view_layer.update()
+
+def main():
+    args = parse_args(sys.argv)
+    helper = blendernerf_cli.load_addon()
+    scene = bpy.context.scene
+    if helper.set_init_props in bpy.app.handlers.depsgraph_update_post:
+        helper.set_init_props(scene)
+
+    # heavy scene with the blendernerf sphere and camera
+    mesh = bpy.data.meshes.new('benchmark_mesh')
+    objects = []
+    for i in range(args.objects):
+        obj = bpy.data.objects.new(f'benchmark_{i}', mesh)
+        scene.collection.objects.link(obj)
+        objects.append(obj)
+
+    scene.show_sphere = True
+    scene.show_camera = True
+    sphere = scene.objects[helper.EMPTY_NAME]
+    bpy.context.view_layer.update()
+
+    scenarios = {
+        'unrelated object': lambda i: setattr(objects[i % len(objects)], 'location', (i * 0.01, 0, 0)),
+        'sphere': lambda i: setattr(sphere, 'location', (i * 0.001, 0, 0)),
+        'frame': lambda i: scene.frame_set(scene.frame_start + i),
+    }
+    syncs = {
+        'dirty checked': helper.properties_desgraph,
+        'full sync': lambda scene, depsgraph: helper.properties_desgraph(scene, None),
+    }
+
+    print(f'{"scenario":<18} {"sync":<14} {"calls":>6} {"mean us":>9} {"median us":>10} {"p95 us":>8}')
+    for sync_name, sync in syncs.items():
+        for scenario_name, update in scenarios.items():
+            durations = []
+            restore = timed_handler(helper, sync, durations)
+            run_scenario(scene, update, args.updates)
+            restore()
+
+            durations_us = sorted(x * 1e6 for x in durations)
+            p95 = durations_us[int(0.95 * (len(durations_us) - 1))] if durations_us else 0.0
+            mean = statistics.mean(durations_us) if durations_us else 0.0
+            median = statistics.median(durations_us) if durations_us else 0.0
+            print(f'{scenario_name:<18} {sync_name:<14} {len(durations):>6} {mean:>9.1f} {median:>10.1f} {p95:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,531 @@
+# lightweight stand-in for the bpy and mathutils modules, to drive the addon code on a machine without blender
+#
+# only the api used by the addon is reproduced : scene properties (with update callbacks), objects with transform channels (all rotation
+# modes, delta transforms and object parents), track to constraints and linear fcurves, camera data, frame_set with frame change handlers,
+# and meshes read with foreach_get
+# transforms are evaluated with numpy, so per frame timings exclude the cost of blender's depsgraph evaluation
+
+import os
+import sys
+import math
+import types
+import bisect
+import importlib.util
+import numpy as np
+
+
+# global variables
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_NAME = 'blendernerf'
+AXES = np.eye(3)
+
+
+## mathutils
+
+class Vector(list):
+    def __sub__(self, other):
+        return Vector(a - b for a, b in zip(self, other))
+
+    def __add__(self, other):
+        return Vector(a + b for a, b in zip(self, other))
+
+    @property
+    def length_squared(self):
+        return sum(a * a for a in self)
+
+    @property
+    def length(self):
+        return math.sqrt(self.length_squared)
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+    z = property(lambda self: self[2])
+
+
+## properties
+
+# scene property registered with setattr(bpy.types.Scene, name, property), calling its update function when set
+class Property:
+    DEFAULTS = {'Bool': False, 'Int': 0, 'Float': 0.0, 'String': '', 'Pointer': None}
+
+    def __init__(self, kind, **options):
+        self.kind = kind
+        self.options = options
+        self.name = None
+
+    def default(self):
+        if 'default' in self.options:
+            default = self.options['default']
+        elif self.kind == 'Enum':
+            default = self.options['items'][0][0]
+        elif self.kind.endswith('Vector'):
+            default = (False if self.kind == 'BoolVector' else 0.0,) * self.options.get('size', 3)
+        else:
+            default = self.DEFAULTS[self.kind]
+
+        return list(default) if isinstance(default, tuple) else default
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if self.name not in instance.__dict__:
+            instance.__dict__[self.name] = self.default()
+        return instance.__dict__[self.name]
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = list(value) if self.kind.endswith('Vector') else value
+        update = self.options.get('update')
+        if update is not None:
+            update(instance, context)
+
+def make_props():
+    props = types.ModuleType('bpy.props')
+    for kind in ('Bool', 'Int', 'Float', 'String', 'Enum', 'Pointer', 'FloatVector', 'BoolVector', 'IntVector'):
+        setattr(props, kind + 'Property', lambda kind=kind, **options: Property(kind, **options))
+    return props
+
+class SceneMeta(type):
+    def __setattr__(cls, name, value):
+        if isinstance(value, Property):
+            value.name = name
+        super().__setattr__(name, value)
+
+
+## data blocks
+
+# named collection of data blocks, looked up by their current name
+class Collection(list):
+    def keys(self):
+        return [item.name for item in self]
+
+    def get(self, name, default=None):
+        return next((item for item in self if item.name == name), default)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            item = self.get(key)
+            if item is None:
+                raise KeyError(key)
+            return item
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return self.get(key) is not None
+        return super().__contains__(key)
+
+    def remove(self, item, do_unlink=True):
+        super().remove(item)
+        if do_unlink:
+            for scene in data.scenes:
+                if item in scene.objects:
+                    scene.objects.remove(item, do_unlink=False)
+
+class CameraData:
+    def __init__(self, name, lens=50.0):
+        self.name = name
+        self.type = 'PERSP'
+        self.lens = lens
+        self.sensor_width = 36.0
+        self.sensor_height = 24.0
+        self.sensor_fit = 'AUTO'
+        self.shift_x = 0.0
+        self.shift_y = 0.0
+        self.clip_start = 0.1
+        self.clip_end = 1000.0
+
+    # field of view of the sensor fit axis (horizontal for the default auto fit of landscape images)
+    @property
+    def angle_x(self):
+        return 2 * math.atan(self.sensor_width / (2 * self.lens))
+
+    @property
+    def angle_y(self):
+        return 2 * math.atan(self.sensor_height / (2 * self.lens))
+
+class Constraint:
+    def __init__(self, type):
+        self.type = type
+        self.name = type.replace('_', ' ').title()
+        self.target = None
+        self.subtarget = ''
+        self.track_axis = 'TRACK_NEGATIVE_Z'
+        self.up_axis = 'UP_Y'
+        self.use_target_z = False
+        self.mute = False
+        self.influence = 1.0
+        self.owner_space = 'WORLD'
+        self.target_space = 'WORLD'
+
+class Constraints(Collection):
+    def new(self, type):
+        constraint = Constraint(type)
+        self.append(constraint)
+        return constraint
+
+# linearly interpolated fcurve, evaluated with a binary search on its sorted keyframes as in blender
+class FCurve:
+    def __init__(self, data_path, array_index, keyframes):
+        self.data_path = data_path
+        self.array_index = array_index
+        self.frames = [float(frame) for frame, _ in keyframes]
+        self.values = [float(value) for _, value in keyframes]
+        self.mute = False
+        self.is_valid = True
+        self.group = None
+
+    def evaluate(self, frame):
+        index = bisect.bisect_right(self.frames, frame)
+        if index == 0:
+            return self.values[0]
+        if index == len(self.frames):
+            return self.values[-1]
+
+        frame_a, frame_b = self.frames[index - 1], self.frames[index]
+        value_a, value_b = self.values[index - 1], self.values[index]
+        return value_a + (value_b - value_a) * (frame - frame_a) / (frame_b - frame_a)
+
+class Action:
+    def __init__(self, fcurves):
+        self.fcurves = fcurves
+        self.is_action_layered = False
+
+class AnimationData:
+    def __init__(self, action):
+        self.action = action
+        self.drivers = []
+        self.nla_tracks = []
+        self.use_tweak_mode = False
+        self.action_blend_type = 'REPLACE'
+        self.action_influence = 1.0
+
+# array of mesh elements read with foreach_get
+class MeshArray:
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def foreach_get(self, attribute, buffer):
+        buffer[:] = self.values.ravel()
+
+class Mesh:
+    def __init__(self, name, vertices, normals, triangles):
+        self.name = name
+        self.vertices = MeshArray(vertices)
+        self.vertex_normals = MeshArray(normals)
+        self.loop_triangles = MeshArray(triangles)
+        self.color_attributes = types.SimpleNamespace(active_color=None)
+
+    def calc_loop_triangles(self):
+        pass
+
+class Object:
+    def __init__(self, name, type='EMPTY', data=None):
+        self.name = name
+        self.type = type
+        self.data = data
+        self.mode = 'OBJECT'
+        self.location = Vector((0.0, 0.0, 0.0))
+        self.rotation_mode = 'XYZ'
+        self.rotation_euler = Vector((0.0, 0.0, 0.0))
+        self.rotation_quaternion = Vector((1.0, 0.0, 0.0, 0.0))
+        self.rotation_axis_angle = Vector((0.0, 0.0, 1.0, 0.0))
+        self.scale = Vector((1.0, 1.0, 1.0))
+        self.delta_location = Vector((0.0, 0.0, 0.0))
+        self.delta_rotation_euler = Vector((0.0, 0.0, 0.0))
+        self.delta_rotation_quaternion = Vector((1.0, 0.0, 0.0, 0.0))
+        self.delta_scale = Vector((1.0, 1.0, 1.0))
+        self.parent = None
+        self.parent_type = 'OBJECT'
+        self.matrix_parent_inverse = np.eye(4)
+        self.constraints = Constraints()
+        self.animation_data = None
+        self.rigid_body = None
+        self.hide_render = False
+        self.users_collection = []
+        self.empty_display_size = 1.0
+
+    def __setattr__(self, name, value):
+        if name in ('location', 'rotation_euler', 'rotation_quaternion', 'rotation_axis_angle', 'scale') or name.startswith('delta_'):
+            value = Vector(value)
+        super().__setattr__(name, value)
+
+    def animate(self, fcurves):
+        self.animation_data = AnimationData(Action(fcurves))
+
+    # world matrix of the current channel values : parent matrix @ parent inverse @ local matrix, then track to constraints,
+    # as composed by blender for object parents
+    @property
+    def matrix_world(self):
+        matrix = np.eye(4)
+        matrix[:3, :3] = self.rotation_matrix() * (np.array(self.scale) * np.array(self.delta_scale))
+        matrix[:3, 3] = np.array(self.location) + np.array(self.delta_location)
+
+        if self.parent is not None:
+            matrix = self.parent.matrix_world @ np.array(self.matrix_parent_inverse) @ matrix
+
+        for constraint in self.constraints:
+            if constraint.mute or constraint.influence == 0.0:
+                continue
+            if constraint.type != 'TRACK_TO' or constraint.influence != 1.0:
+                raise NotImplementedError('fake objects only support track to constraints with full influence')
+            if constraint.target is not None:
+                matrix = track_to(matrix, constraint.target.matrix_world, constraint)
+
+        return matrix
+
+    # rotation matrix of the rotation mode, the delta rotation (in the same mode) is applied after the rotation
+    # blender has no delta rotation for axis angles
+    def rotation_matrix(self):
+        if self.rotation_mode == 'QUATERNION':
+            return quaternion_matrix(self.delta_rotation_quaternion) @ quaternion_matrix(self.rotation_quaternion)
+
+        if self.rotation_mode == 'AXIS_ANGLE':
+            angle, *axis = self.rotation_axis_angle
+            length = math.sqrt(sum(a * a for a in axis))
+            return axis_angle_matrix(np.array(axis) / length, angle) if length > 0.0 else np.eye(3)
+
+        return euler_matrix(self.delta_rotation_euler, self.rotation_mode) @ euler_matrix(self.rotation_euler, self.rotation_mode)
+
+    def evaluated_get(self, depsgraph):
+        return self
+
+    def to_mesh(self):
+        return self.data
+
+    def to_mesh_clear(self):
+        pass
+
+    def select_set(self, state):
+        pass
+
+# rotation matrix of an angle around a unit axis (rodrigues formula)
+def axis_angle_matrix(axis, angle):
+    x, y, z = (float(a) for a in axis)
+    c, s = math.cos(angle), math.sin(angle)
+    t = 1 - c
+    return np.array([
+        [t * x * x + c, t * x * y - s * z, t * x * z + s * y],
+        [t * x * y + s * z, t * y * y + c, t * y * z - s * x],
+        [t * x * z - s * y, t * y * z + s * x, t * z * z + c],
+    ])
+
+# rotation matrix of a (w, x, y, z) quaternion, normalized first, identity for a zero quaternion as in blender
+def quaternion_matrix(quaternion):
+    w, x, y, z = quaternion
+    sin_half = math.sqrt(x * x + y * y + z * z)
+    if sin_half == 0.0:
+        return np.eye(3)
+    return axis_angle_matrix(np.array([x, y, z]) / sin_half, 2 * math.atan2(sin_half, w))
+
+# rotation matrix of euler angles, rotating around the axes in the order of the rotation mode ('XZY' : x first, y last)
+def euler_matrix(angles, order):
+    matrix = np.eye(3)
+    for axis in order:
+        index = 'XYZ'.index(axis)
+        if angles[index] != 0.0:
+            matrix = axis_angle_matrix(AXES[index], angles[index]) @ matrix
+    return matrix
+
+# track to constraint : the track axis points to the target and the up axis towards the world z axis (or the target z axis),
+# the third axis completes a right handed frame, scale is kept
+def track_to(matrix, target, constraint):
+    track_axis = ('TRACK_X', 'TRACK_Y', 'TRACK_Z', 'TRACK_NEGATIVE_X', 'TRACK_NEGATIVE_Y', 'TRACK_NEGATIVE_Z').index(constraint.track_axis)
+    up_axis = ('UP_X', 'UP_Y', 'UP_Z').index(constraint.up_axis)
+    scale = np.linalg.norm(matrix[:3, :3], axis=0)
+
+    result = matrix.copy()
+    if track_axis % 3 == up_axis:
+        result[:3, :3] = np.diag(scale)
+        return result
+
+    direction = target[:3, 3] - matrix[:3, 3]
+    direction = direction / np.linalg.norm(direction) if np.linalg.norm(direction) > 0.0 else np.array([0.0, 0.0, -1.0])
+    track = -direction if track_axis > 2 else direction
+
+    up = target[:3, 2] if constraint.use_target_z else np.array([0.0, 0.0, 1.0])
+    up = up - np.dot(up, track) * track
+    up = up / np.linalg.norm(up) if np.linalg.norm(up) > 0.0 else np.array([0.0, 1.0, 0.0])
+
+    axes = [None, None, None]
+    axes[track_axis % 3], axes[up_axis] = track, up
+    other = 3 - track_axis % 3 - up_axis
+    axes[other] = np.cross(axes[(other + 1) % 3], axes[(other + 2) % 3])
+
+    result[:3, :3] = np.stack(axes, axis=1) * scale
+    return result
+
+
+## scene
+
+class Render:
+    def __init__(self):
+        self.engine = 'CYCLES'
+        self.resolution_x = 1920
+        self.resolution_y = 1080
+        self.resolution_percentage = 100
+        self.pixel_aspect_x = 1.0
+        self.pixel_aspect_y = 1.0
+        self.frame_map_old = 100
+        self.frame_map_new = 100
+        self.filepath = '/tmp/'
+        self.use_overwrite = True
+        self.film_transparent = False
+        self.use_motion_blur = False
+        self.image_settings = types.SimpleNamespace(file_format='PNG', color_mode='RGBA', color_depth='8', compression=15, quality=90)
+
+    def frame_path(self, frame=None):
+        extension = '.' + self.image_settings.file_format.lower()
+        return os.path.join(self.filepath, f'{frame:04d}{extension}')
+
+class Scene(metaclass=SceneMeta):
+    def __init__(self, name='Scene'):
+        self.name = name
+        self.objects = Collection()
+        self.collection = types.SimpleNamespace(objects=self.objects)
+        self.render = Render()
+        self.camera = None
+        self.world = None
+        self.frame_start = 1
+        self.frame_end = 250
+        self.frame_step = 1
+        self.frame_current = 1
+        self.view_settings = types.SimpleNamespace(view_transform='Standard', look='None', exposure=0.0, gamma=1.0)
+
+    # evaluate the fcurves of all objects, then call the frame change handlers
+    def frame_set(self, frame, subframe=0.0):
+        self.frame_current = frame
+        for handler in list(app.handlers.frame_change_pre):
+            handler(self)
+
+        for obj in self.objects:
+            if obj.animation_data is not None and obj.animation_data.action is not None:
+                for fcurve in obj.animation_data.action.fcurves:
+                    getattr(obj, fcurve.data_path)[fcurve.array_index] = fcurve.evaluate(frame)
+
+        for handler in list(app.handlers.frame_change_post):
+            handler(self)
+
+    def link(self, obj):
+        self.objects.append(obj)
+        data.objects.append(obj)
+        return obj
+
+
+## bpy modules
+
+class Operator:
+    def report(self, type, message):
+        self.reports.append((type, message))
+
+    @property
+    def reports(self):
+        return self.__dict__.setdefault('report_list', [])
+
+class Handlers(types.SimpleNamespace):
+    @staticmethod
+    def persistent(function):
+        return function
+
+def new_handlers():
+    names = ('frame_change_pre', 'frame_change_post', 'depsgraph_update_post', 'render_pre', 'render_post', 'render_complete', 'render_cancel', 'render_write', 'load_post')
+    return Handlers(**{name: [] for name in names})
+
+app = types.SimpleNamespace(handlers=new_handlers(), is_job_running=lambda job_type: False, background=True, version=(4, 2, 0), version_string='4.2.0 (fake)', binary_path='blender')
+data = types.SimpleNamespace(objects=Collection(), cameras=Collection(), meshes=Collection(), materials=Collection(), scenes=Collection(), filepath='', is_dirty=False)
+context = types.SimpleNamespace(scene=None, active_object=None, object=None, selected_objects=[], window=None)
+
+def add_camera(scene, name='Camera', location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0)):
+    camera_data = CameraData(name)
+    data.cameras.append(camera_data)
+    camera = scene.link(Object(name, type='CAMERA', data=camera_data))
+    camera.location = location
+    camera.rotation_euler = rotation
+    return camera
+
+def add_empty(scene, name='Empty'):
+    return scene.link(Object(name, type='EMPTY'))
+
+# grid mesh of nb_vertices vertices (rounded to a square) in the xy plane
+def add_grid_mesh(scene, name, nb_vertices):
+    size = max(2, int(math.sqrt(nb_vertices)))
+    u, v = np.meshgrid(np.linspace(-1, 1, size), np.linspace(-1, 1, size))
+    vertices = np.stack([u.ravel(), v.ravel(), 0.1 * np.sin(4 * u.ravel())], axis=1).astype(np.float32)
+    normals = np.tile(np.array([0.0, 0.0, 1.0], dtype=np.float32), (len(vertices), 1))
+
+    quads = (np.arange(size - 1)[None, :] + size * np.arange(size - 1)[:, None]).ravel()
+    triangles = np.concatenate([np.stack([quads, quads + 1, quads + size], axis=1), np.stack([quads + 1, quads + size + 1, quads + size], axis=1)])
+
+    mesh = Mesh(name, vertices, normals, triangles.astype(np.int32))
+    data.meshes.append(mesh)
+    return scene.link(Object(name, type='MESH', data=mesh))
+
+def active_object(obj):
+    context.active_object = obj
+    context.object = obj
+    return obj
+
+def new_scene(name='Scene'):
+    for collection in (data.objects, data.cameras, data.meshes, data.scenes):
+        collection.clear()
+
+    scene = Scene(name)
+    data.scenes.append(scene)
+    context.scene = scene
+    context.active_object = None
+    context.object = None
+    return scene
+
+def make_ops():
+    def empty_add(type='PLAIN_AXES', **kwargs):
+        active_object(add_empty(context.scene))
+        return {'FINISHED'}
+
+    def camera_add(**kwargs):
+        active_object(add_camera(context.scene))
+        return {'FINISHED'}
+
+    return types.SimpleNamespace(object=types.SimpleNamespace(empty_add=empty_add, camera_add=camera_add, mode_set=lambda **kwargs: {'FINISHED'}))
+
+# install the fake modules, returns the bpy module
+def install():
+    bpy = types.ModuleType('bpy')
+    bpy.app = app
+    bpy.data = data
+    bpy.context = context
+    bpy.props = make_props()
+    bpy.ops = make_ops()
+    bpy.types = types.SimpleNamespace(Operator=Operator, Panel=object, Scene=Scene, Object=Object)
+    bpy.utils = types.SimpleNamespace(register_class=lambda cls: None, unregister_class=lambda cls: None)
+    bpy.path = types.SimpleNamespace(
+        clean_name=lambda name: ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name),
+        abspath=lambda path: path,
+        basename=os.path.basename,
+    )
+
+    app_module = types.ModuleType('bpy.app')
+    app_module.__dict__.update(vars(app))
+    handlers_module = types.ModuleType('bpy.app.handlers')
+    handlers_module.persistent = Handlers.persistent
+
+    mathutils = types.ModuleType('mathutils')
+    mathutils.Vector = Vector
+
+    sys.modules.update({'bpy': bpy, 'bpy.app': app_module, 'bpy.app.handlers': handlers_module, 'mathutils': mathutils})
+    return bpy
+
+# install the fake modules, then import and register the addon
+def load_addon():
+    if ADDON_NAME in sys.modules:
+        return sys.modules[ADDON_NAME]
+
+    install()
+    spec = importlib.util.spec_from_file_location(ADDON_NAME, os.path.join(ADDON_DIR, '__init__.py'), submodule_search_locations=[ADDON_DIR])
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[ADDON_NAME] = addon
+    spec.loader.exec_module(addon)
+    addon.register()
+
+    return addon
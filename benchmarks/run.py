@@ -0,0 +1,294 @@
+# offline benchmarks of the BlenderNeRF export paths, driven by a fake bpy and mathutils (see fake_blender.py)
+#
+#   python -m benchmarks.run                           # 100, 1000 and 10000 frames
+#   python -m benchmarks.run --frames 100 100000       # custom frame counts
+#   python -m benchmarks.run --cases json archive      # cases whose name contains one of the given words
+#   python -m benchmarks.run --save-baseline           # save timings to benchmarks/baseline.json
+#   python -m benchmarks.run --compare                 # compare to benchmarks/baseline.json, exit code 1 on regression
+#
+# each case reports its wall time and peak python memory (numpy included), setup (and its correctness checks) excluded
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+
+from . import fake_blender
+
+
+# global variables
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_FRAMES = [100, 1000, 10000]
+ARCHIVE_MAX_FILES = 10000 # archive cases write at most this many image files
+IMAGE_SIZE = 16 * 1024
+PLY_VERTICES_PER_FRAME = 10
+NOISE_FLOOR = 0.02 # seconds, differences below are never reported as regressions
+PARITY_TOLERANCE = 1e-5 # batched camera matrices against frame_set matrices, both float32 values
+
+
+## scenes
+
+# scene with an animated camera (and a second one for ttc) over nb_frames frames, keyframed every 10 frames
+def animated_scene(nb_frames, output_dir):
+    scene = fake_blender.new_scene()
+    scene.frame_end = nb_frames
+    scene.save_path = output_dir
+    scene.logs = True
+    scene.render_frames = False
+    scene.train_frame_steps = 1
+    scene.ttc_nb_frames = nb_frames
+    scene.cos_nb_frames = nb_frames
+
+    keyframes = list(range(1, nb_frames + 11, 10))
+    for name, phase in (('Camera', 0.0), ('Test Camera', 1.0)):
+        camera = fake_blender.add_camera(scene, name, location=(0.0, -8.0, 2.0), rotation=(1.3, 0.0, 0.0))
+        camera.animate([
+            fake_blender.FCurve('location', 0, [(f, 8 * np.sin(f / 50 + phase)) for f in keyframes]),
+            fake_blender.FCurve('location', 1, [(f, -8 * np.cos(f / 50 + phase)) for f in keyframes]),
+            fake_blender.FCurve('rotation_euler', 2, [(f, f / 50 + phase) for f in keyframes]),
+        ])
+
+    scene.camera = scene.objects['Camera']
+    scene.camera_train_target = scene.objects['Camera']
+    scene.camera_test_target = scene.objects['Test Camera']
+    return scene
+
+def frames_data(nb_frames):
+    rng = np.random.default_rng(0)
+    matrices = rng.random((nb_frames, 4, 4)).astype(np.float32).tolist()
+    return [{'file_path': f'train/{i:04d}.png', 'transform_matrix': matrix} for i, matrix in enumerate(matrices)]
+
+
+## cases : setup functions returning the timed function
+
+def case_intrinsics(addon, nb_frames, output_dir):
+    scene = animated_scene(nb_frames, output_dir)
+    operator = addon.sof_operator.SubsetOfFrames()
+    return lambda: [operator.get_camera_intrinsics(scene, scene.camera) for _ in range(nb_frames)]
+
+# batched camera matrices must equal the matrices read after setting every frame, for both cameras of the scene
+def check_extrinsics_parity(addon, scene, operator, frames):
+    for camera in (scene.camera, scene.camera_test_target):
+        assert addon.extrinsics.can_batch_evaluate(scene, camera)
+        batch = np.array(addon.extrinsics.batch_matrix_world(scene, camera, frames), dtype=np.float64)
+        per_frame = np.array(operator.get_camera_matrices_per_frame(scene, camera, frames), dtype=np.float64)
+        difference = np.abs(batch - per_frame).max()
+        assert difference <= PARITY_TOLERANCE, f'batched matrices of {camera.name} differ from frame_set matrices by {difference}'
+
+def case_extrinsics_batch(addon, nb_frames, output_dir):
+    scene = animated_scene(nb_frames, output_dir)
+    operator = addon.sof_operator.SubsetOfFrames()
+    check_extrinsics_parity(addon, scene, operator, range(1, nb_frames + 1))
+    return lambda: operator.get_camera_extrinsics(scene, scene.camera, mode='TRAIN', method='SOF')
+
+def case_extrinsics_per_frame(addon, nb_frames, output_dir):
+    scene = animated_scene(nb_frames, output_dir)
+    operator = addon.sof_operator.SubsetOfFrames()
+    return lambda: operator.get_camera_matrices_per_frame(scene, scene.camera, range(1, nb_frames + 1))
+
+def case_sphere_per_frame(addon, nb_frames, output_dir):
+    scene = animated_scene(nb_frames, output_dir)
+    addon.helper.sphere_sample.cache_clear()
+
+    def run():
+        for frame in range(1, nb_frames + 1):
+            scene.frame_current = frame
+            addon.helper.sample_from_sphere(scene)
+    return run
+
+def case_sphere_batch(addon, nb_frames, output_dir):
+    scene = animated_scene(nb_frames, output_dir)
+    return lambda: addon.helper.sample_from_sphere_batch(scene, range(1, nb_frames + 1))
+
+def case_sphere_poisson(addon, nb_frames, output_dir):
+    addon.view_sampling.unit_directions.cache_clear()
+    return lambda: addon.view_sampling.unit_directions('POISSON', min(nb_frames, 10000), 0)
+
+def case_json_indent(addon, nb_frames, output_dir):
+    operator = addon.sof_operator.SubsetOfFrames()
+    data = {'camera_angle_x': 0.69, 'frames': frames_data(nb_frames)}
+    return lambda: operator.save_json(output_dir, 'transforms_train.json', data)
+
+def case_json_compact(addon, nb_frames, output_dir):
+    operator = addon.sof_operator.SubsetOfFrames()
+    data = {'camera_angle_x': 0.69, 'frames': frames_data(nb_frames)}
+    return lambda: operator.stream_json(output_dir, 'transforms_train.json', data)
+
+def case_pose_sidecar(addon, nb_frames, output_dir):
+    operator = addon.sof_operator.SubsetOfFrames()
+    frames = frames_data(nb_frames)
+    return lambda: operator.save_pose_sidecar(output_dir, 'transforms_train.json', frames, sidecar='NPZ')
+
+def case_archive_zip(addon, nb_frames, output_dir):
+    dataset = os.path.join(output_dir, 'dataset')
+    os.makedirs(os.path.join(dataset, 'train'))
+    rng = np.random.default_rng(0)
+    filepaths = []
+    for i in range(min(nb_frames, ARCHIVE_MAX_FILES)):
+        filepath = os.path.join(dataset, 'train', f'{i:04d}.png')
+        rng.integers(0, 256, IMAGE_SIZE, dtype=np.uint8).tofile(filepath)
+        filepaths.append(filepath)
+
+    def run():
+        archive = addon.archive.DatasetArchive(dataset, 'ZIP')
+        for filepath in filepaths:
+            archive.add(filepath)
+        archive.finalize(remove_folder=False).join()
+    return run
+
+def case_ply_vertices(addon, nb_frames, output_dir):
+    scene = animated_scene(nb_frames, output_dir)
+    mesh = fake_blender.add_grid_mesh(scene, 'Grid', nb_frames * PLY_VERTICES_PER_FRAME)
+
+    def run():
+        points, normals, colors = addon.point_cloud.sample_points([mesh], None, sampling='VERTICES')
+        addon.point_cloud.write_ply(os.path.join(output_dir, 'points3d.ply'), points, normals, colors)
+    return run
+
+def case_ply_voxel(addon, nb_frames, output_dir):
+    scene = animated_scene(nb_frames, output_dir)
+    mesh = fake_blender.add_grid_mesh(scene, 'Grid', nb_frames * PLY_VERTICES_PER_FRAME)
+
+    def run():
+        points, normals, colors = addon.point_cloud.sample_points([mesh], None, sampling='VOXEL', budget=nb_frames)
+        addon.point_cloud.write_ply(os.path.join(output_dir, 'points3d.ply'), points, normals, colors)
+    return run
+
+def case_colmap_images(addon, nb_frames, output_dir):
+    frames = frames_data(nb_frames)
+    matrices = [frame['transform_matrix'] for frame in frames]
+    names = [os.path.basename(frame['file_path']) + '.png' for frame in frames]
+    return lambda: addon.colmap.write_images(os.path.join(output_dir, 'images.bin'), matrices, names)
+
+def case_colmap_points(addon, nb_frames, output_dir):
+    scene = animated_scene(nb_frames, output_dir)
+    mesh = fake_blender.add_grid_mesh(scene, 'Grid', nb_frames * PLY_VERTICES_PER_FRAME)
+
+    def run():
+        points, normals, colors = addon.point_cloud.sample_points([mesh], None, sampling='VERTICES')
+        addon.colmap.write_points(os.path.join(output_dir, 'points3D.bin'), points, colors)
+    return run
+
+# full operator run without rendering, including test transforms, log file and the dataset archive
+def operator_case(operator_class, configure=None):
+    def case(addon, nb_frames, output_dir):
+        scene = animated_scene(nb_frames, output_dir)
+        if configure is not None:
+            configure(scene)
+        operator = operator_class(addon)()
+
+        def run():
+            result = operator.execute(fake_blender.context)
+            assert result == {'FINISHED'}, operator.reports
+            for thread in list(addon.archive.finalizing.values()):
+                thread.join()
+        return run
+    return case
+
+CASES = {
+    'intrinsics': case_intrinsics,
+    'extrinsics_batch': case_extrinsics_batch,
+    'extrinsics_per_frame': case_extrinsics_per_frame,
+    'sphere_per_frame': case_sphere_per_frame,
+    'sphere_batch': case_sphere_batch,
+    'sphere_poisson': case_sphere_poisson,
+    'json_indent': case_json_indent,
+    'json_compact': case_json_compact,
+    'pose_sidecar_npz': case_pose_sidecar,
+    'archive_zip': case_archive_zip,
+    'ply_vertices': case_ply_vertices,
+    'ply_voxel': case_ply_voxel,
+    'colmap_images': case_colmap_images,
+    'colmap_points': case_colmap_points,
+    'operator_sof': operator_case(lambda addon: addon.sof_operator.SubsetOfFrames),
+    'operator_ttc': operator_case(lambda addon: addon.ttc_operator.TrainTestCameras),
+    'operator_cos': operator_case(lambda addon: addon.cos_operator.CameraOnSphere),
+}
+
+
+## runner
+
+# wall time (seconds) and peak traced memory (bytes) of a function
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def run_case(addon, name, nb_frames):
+    output_dir = tempfile.mkdtemp(prefix='blendernerf_benchmark_')
+    try:
+        function = CASES[name](addon, nb_frames, output_dir)
+        return measure(function)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def machine_info():
+    return {'platform': platform.platform(), 'python': platform.python_version(), 'numpy': np.__version__, 'cpus': os.cpu_count()}
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Offline benchmarks of the BlenderNeRF export paths')
+    parser.add_argument('--frames', type=int, nargs='+', default=DEFAULT_FRAMES, help='frame counts to benchmark')
+    parser.add_argument('--cases', nargs='+', help='only run cases whose name contains one of these words')
+    parser.add_argument('--save-baseline', action='store_true', help='save the timings as the baseline')
+    parser.add_argument('--compare', action='store_true', help='compare the timings to the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='relative slowdown reported as a regression (0.5 = 50 percent)')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    addon = fake_blender.load_addon()
+
+    names = [name for name in CASES if args.cases is None or any(word in name for word in args.cases)]
+    baseline = {}
+    if args.compare:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)['results']
+
+    results = {}
+    regressions = []
+    print(f'{"case":<22} {"frames":>7} {"seconds":>9} {"peak MB":>9}' + f' {"baseline":>9} {"ratio":>6}' * args.compare)
+    for name in names:
+        for nb_frames in args.frames:
+            key = f'{name}/{nb_frames}'
+            elapsed, peak = run_case(addon, name, nb_frames)
+            results[key] = {'seconds': round(elapsed, 6), 'peak_mb': round(peak / 2 ** 20, 3)}
+
+            line = f'{name:<22} {nb_frames:>7} {elapsed:>9.4f} {peak / 2 ** 20:>9.2f}'
+            if args.compare and key in baseline:
+                reference = baseline[key]['seconds']
+                ratio = elapsed / reference if reference > 0 else float('inf')
+                line += f' {reference:>9.4f} {ratio:>6.2f}'
+                if ratio > 1 + args.tolerance and elapsed - reference > NOISE_FLOOR:
+                    regressions.append(key)
+                    line += '  REGRESSION'
+            print(line, flush=True)
+
+    if args.save_baseline:
+        saved = {'machine': machine_info(), 'results': results}
+        if os.path.isfile(args.baseline): # keep the results of cases and frame counts not run now
+            with open(args.baseline, 'r') as file:
+                saved['results'] = {**json.load(file)['results'], **results}
+        with open(args.baseline, 'w') as file:
+            json.dump(saved, file, indent=4)
+        print('Baseline saved to', args.baseline)
+
+    if len(regressions) > 0:
+        print('Regressions :', ', '.join(regressions))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,20 +1,147 @@
 import os
 import math
 import json
+import time
 import datetime
+import threading
+import numpy as np
 import bpy
+from . import helper, extrinsics, manifest, render_cache, point_cloud, view_sampling, pyramid, render_passes, colmap
 
 
 # global addon script variables
 OUTPUT_TRAIN = 'train'
 OUTPUT_TEST = 'test'
+TRANSFORMS_TRAIN = 'transforms_train.json'
+TRANSFORMS_TEST = 'transforms_test.json'
 CAMERA_NAME = 'BlenderNeRF Camera'
-TMP_VERTEX_COLORS = 'blendernerf_vertex_colors_tmp'
+MODAL_INTERVAL = 0.1 # seconds between modal operator steps
+RENDER_STAGE = 'Rendering'
+PROGRESSIVE_BATCH = 8 # frames of the first progressive render batch, doubled for every next batch
 
 
 # blender nerf operator parent class
+# subclasses implement run(context), a generator yielding the name of each stage before running it and returning the operator result
 class BlenderNeRF_Operator(bpy.types.Operator):
 
+    # create the dataset at once, blender is blocked until the render is started (or done without user interface)
+    def execute(self, context):
+        if helper.run_in_progress():
+            self.report({'ERROR'}, 'A BlenderNeRF dataset is already being created!')
+            return {'CANCELLED'}
+
+        helper.reset_render_progress()
+        self.modal_run = False
+        stages = self.run(context)
+        while True:
+            try:
+                next(stages)
+            except StopIteration as stop:
+                return stop.value
+
+    # create the dataset step by step with user interface : stages run between timer events, with progress in the status bar
+    def invoke(self, context, event):
+        if bpy.app.background:
+            return self.execute(context)
+
+        if helper.run_in_progress():
+            self.report({'ERROR'}, 'A BlenderNeRF dataset is already being created!')
+            return {'CANCELLED'}
+
+        helper.reset_render_progress()
+        helper.active_run = True
+        self.modal_run = True
+        self.stages = self.run(context)
+        self.stage = ''
+        self.timer = context.window_manager.event_timer_add(MODAL_INTERVAL, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        context.window_manager.progress_begin(0, 100)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        # escape while rendering is handled by the render job, which calls the cancel render handler
+        if event.type == 'ESC' and self.stage != RENDER_STAGE:
+            self.cancel(context)
+            self.report({'WARNING'}, f'BlenderNeRF cancelled while : {self.stage}')
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        try:
+            self.stage = next(self.stages)
+        except StopIteration as stop:
+            self.end_modal(context)
+            return stop.value
+        except Exception:
+            self.cancel(context)
+            raise
+
+        context.workspace.status_text_set(self.progress_text())
+        if self.stage == RENDER_STAGE and helper.render_progress['total'] > 0:
+            context.window_manager.progress_update(100 * helper.render_progress['done'] // helper.render_progress['total'])
+        return {'PASS_THROUGH'}
+
+    # stop at the current stage, the partial dataset folder is kept
+    def cancel(self, context):
+        self.stages.close() # worker threads are joined
+        helper.abort_archive()
+        helper.close_profile()
+        helper.close_test_split(context.scene, cancel=True)
+        self.end_modal(context)
+
+    def end_modal(self, context):
+        helper.active_run = False
+        context.window_manager.event_timer_remove(self.timer)
+        context.window_manager.progress_end()
+        context.workspace.status_text_set(None)
+
+    # run a function on a worker thread, yielding the stage name until it is done (or run it directly without modal operator)
+    def in_worker(self, stage, function, *args):
+        if not self.modal_run:
+            return function(*args)
+
+        result = {}
+        def target():
+            try:
+                result['value'] = function(*args)
+            except Exception as error:
+                result['error'] = error
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        try:
+            while thread.is_alive():
+                yield stage
+        finally:
+            thread.join()
+
+        if 'error' in result:
+            raise result['error']
+        return result.get('value')
+
+    # wait until all frames are rendered and the dataset is finalized, with modal operator
+    def wait_for_render(self, scene):
+        if not self.modal_run:
+            return
+
+        while any(scene.rendering) or helper.test_split is not None:
+            yield RENDER_STAGE
+
+    # current stage, and rendered frames, throughput and estimated remaining time while rendering
+    def progress_text(self):
+        if self.stage != RENDER_STAGE:
+            return f'BlenderNeRF : {self.stage}'
+
+        progress = helper.render_progress
+        text = f'BlenderNeRF : {RENDER_STAGE} frame {progress["done"]} / {progress["total"]}'
+        elapsed = time.perf_counter() - progress['start'] if progress['start'] is not None else 0
+        if progress['done'] > 0 and elapsed > 0:
+            frames_per_minute = 60 * progress['done'] / elapsed
+            remaining = (progress['total'] - progress['done']) * 60 / frames_per_minute
+            text += f' | {frames_per_minute:.1f} frames/min | ETA {datetime.timedelta(seconds=round(remaining))}'
+        return text
+
     # camera intrinsics
     def get_camera_intrinsics(self, scene, camera):
         camera_angle_x = camera.data.angle_x
@@ -78,89 +205,380 @@ class BlenderNeRF_Operator(bpy.types.Operator):
             'aabb_scale': scene.aabb
         }
 
-        return {'camera_angle_x': camera_angle_x} if scene.nerf else camera_intr_dict
+        camera_intr_dict = {'camera_angle_x': camera_angle_x} if scene.nerf else camera_intr_dict
+
+        # 16 bit png depth values in scene units
+        if 'DEPTH' in scene.render_passes and scene.passes_format == 'PNG':
+            camera_intr_dict['integer_depth_scale'] = scene.depth_max / render_passes.PNG_DEPTH_LEVELS
+
+        return camera_intr_dict
 
     # camera extrinsics (transform matrices)
     def get_camera_extrinsics(self, scene, camera, mode='TRAIN', method='SOF'):
         assert mode == 'TRAIN' or mode == 'TEST'
-        assert method == 'SOF' or method == 'TTC' or method == 'COS'
+        assert method == 'SOF' or method == 'TTC' or method == 'COS' or method == 'PFR'
 
         if scene.splats and scene.splats_test_dummy and mode == 'TEST':
             return []
 
-        initFrame = scene.frame_current
-        step = scene.train_frame_steps if (mode == 'TRAIN' and method == 'SOF') else scene.frame_step
-        if (mode == 'TRAIN' and method == 'COS'):
-            end = scene.frame_start + scene.cos_nb_frames - 1
-        elif (mode == 'TRAIN' and method == 'TTC'):
-            end = scene.frame_start + scene.ttc_nb_frames - 1
-        else:
-            end = scene.frame_end
+        with helper.profile_stage(f'{mode.lower()} poses'):
+            frames = self.get_frames(scene, mode=mode, method=method)
+            matrices = self.get_camera_matrices(scene, camera, frames)
 
         camera_extr_dict = []
-        for frame in range(scene.frame_start, end + 1, step):
-            scene.frame_set(frame)
+        for frame, matrix in zip(frames, matrices):
             filename = os.path.basename( scene.render.frame_path(frame=frame) )
             filedir = OUTPUT_TRAIN * (mode == 'TRAIN') + OUTPUT_TEST * (mode == 'TEST')
 
             frame_data = {
                 'file_path': os.path.join(filedir, os.path.splitext(filename)[0] if scene.splats else filename),
-                'transform_matrix': self.listify_matrix(camera.matrix_world)
+                'transform_matrix': matrix
             }
 
-            camera_extr_dict.append(frame_data)
+            # auxiliary passes written by the compositor alongside rendered frames
+            if mode == 'TRAIN' and len(scene.render_passes) > 0:
+                frame_data.update(render_passes.frame_entries(frame, scene.render_passes, scene.passes_format, dirname=filedir))
 
-        scene.frame_set(initFrame) # set back to initial frame
+            camera_extr_dict.append(frame_data)
 
         return camera_extr_dict
 
-    # export vertex colors for each visible mesh
-    def save_splats_ply(self, scene, directory):
-        # create temporary vertex colors
-        for obj in scene.objects:
-            if obj.type == 'MESH':
-                if not obj.data.vertex_colors:
-                    obj.data.vertex_colors.new(name=TMP_VERTEX_COLORS)
+    # registered frames, only the shard of this process for sharded training frames
+    def get_frames(self, scene, mode='TRAIN', method='SOF'):
+        step = scene.train_frame_steps if (mode == 'TRAIN' and method == 'SOF') else scene.frame_step
+        if (mode == 'TRAIN' and method == 'COS'):
+            end = scene.frame_start + scene.cos_nb_frames - 1
+        elif (mode == 'TRAIN' and method == 'TTC'):
+            end = scene.frame_start + scene.ttc_nb_frames - 1
+        elif (mode == 'TRAIN' and method == 'PFR'):
+            end = scene.frame_start + len(self.replay_poses) - 1
+        else:
+            end = scene.frame_end
+
+        if (mode == 'TRAIN' and method == 'SOF' and scene.sof_selection == 'COVERAGE'):
+            frames = self.get_coverage_frames(scene, scene.camera)
+        else:
+            frames = range(scene.frame_start, end + 1, step)
+
+        # contiguous shards, such that concatenating them in shard order gives the full frame range
+        if mode == 'TRAIN' and scene.shard_count > 1:
+            begin = len(frames) * scene.shard_index // scene.shard_count
+            stop = len(frames) * (scene.shard_index + 1) // scene.shard_count
+            frames = frames[begin:stop]
 
-        if bpy.context.object is None or bpy.context.active_object is None:
-            self.report({'INFO'}, 'No object active. Setting first object as active.')
-            bpy.context.view_layer.objects.active = bpy.data.objects[0]
+        return frames
 
-        init_mode = bpy.context.object.mode
-        bpy.ops.object.mode_set(mode='OBJECT')
+    # frames of the camera animation with the most diverse poses, computed once per operator run
+    def get_coverage_frames(self, scene, camera):
+        if getattr(self, 'coverage_frames', None) is None:
+            candidates = range(scene.frame_start, scene.frame_end + 1)
+            matrices = np.array(self.get_camera_matrices(scene, camera, candidates), dtype=np.float64).reshape(-1, 4, 4)
+            indices = view_sampling.select_views(matrices[:, :3, 3], -matrices[:, :3, 2], scene.sof_nb_frames, scene.sof_min_distance) # camera looks along -z
+            self.coverage_frames = [candidates[i] for i in indices]
 
-        init_active_object = bpy.context.active_object
-        init_selected_objects = bpy.context.selected_objects
-        bpy.ops.object.select_all(action='DESELECT')
+        return self.coverage_frames
 
-        # select only visible meshes
-        for obj in scene.objects:
-            if obj.type == 'MESH' and self.is_object_visible(obj):
-                obj.select_set(True)
+    # camera world matrices as nested lists, batched when the camera does not depend on a full scene evaluation
+    def get_camera_matrices(self, scene, camera, frames):
+        if extrinsics.can_batch_evaluate(scene, camera):
+            matrices = extrinsics.batch_matrix_world(scene, camera, frames)
+            return matrices.astype(np.float32).tolist() # float32 values, as read from camera.matrix_world
 
-        # save ply file
-        bpy.ops.wm.ply_export(filepath=os.path.join(directory, 'points3d.ply'), export_normals=True, export_attributes=False, ascii_format=True)
+        return self.get_camera_matrices_per_frame(scene, camera, frames)
 
-        # remove temporary vertex colors
-        for obj in scene.objects:
-            if obj.type == 'MESH' and self.is_object_visible(obj):
-                if obj.data.vertex_colors and TMP_VERTEX_COLORS in obj.data.vertex_colors:
-                    obj.data.vertex_colors.remove(obj.data.vertex_colors[TMP_VERTEX_COLORS])
+    # camera world matrices evaluated by setting every frame, always valid but slow on heavy scenes
+    def get_camera_matrices_per_frame(self, scene, camera, frames):
+        initFrame = scene.frame_current
 
-        bpy.context.view_layer.objects.active = init_active_object
-        bpy.ops.object.select_all(action='DESELECT')
+        matrices = []
+        for frame in frames:
+            scene.frame_set(frame)
+            matrices.append(self.listify_matrix(camera.matrix_world))
 
-        # reselect previously selected objects
-        for obj in init_selected_objects:
-            obj.select_set(True)
+        scene.frame_set(initFrame) # set back to initial frame
 
-        bpy.ops.object.mode_set(mode=init_mode)
+        return matrices
+
+    # export points, normals and vertex colors of the visible meshes, leaving selection and object modes untouched
+    # as a ply file and / or the points of a colmap sparse model
+    def save_splats_ply(self, scene, directory):
+        yield 'Gaussian points'
+        objects = [obj for obj in scene.objects if obj.type == 'MESH' and self.is_object_visible(obj)]
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+
+        with helper.profile_stage('ply'):
+            points, normals, colors = point_cloud.sample_points(objects, depsgraph, sampling=scene.splats_sampling, budget=scene.splats_budget, seed=scene.seed)
+            if scene.splats_format != 'COLMAP':
+                yield from self.in_worker('Saving Gaussian points', point_cloud.write_ply, os.path.join(directory, 'points3d.ply'), points, normals, colors)
+            if scene.splats_format != 'PLY':
+                os.makedirs(os.path.join(directory, colmap.SPARSE_DIR), exist_ok=True)
+                yield from self.in_worker('Saving COLMAP points', colmap.write_points, os.path.join(directory, colmap.SPARSE_DIR, 'points3D.bin'), points, colors)
+
+    # record rendered training frames in a manifest, returns the frames to render (when resuming, only missing or stale ones, and never cached ones)
+    def start_manifest(self, scene, output_path, camera, frames, frames_data):
+        self.skip_frames(scene, frames)
+        self.start_pyramid(scene, frames)
+        self.start_passes(scene, output_path)
+
+        filename = manifest.MANIFEST if scene.shard_count == 1 else self.shard_filename(manifest.MANIFEST, scene.shard_index, scene.shard_count)
+        poses = {frame: frame_data['transform_matrix'] for frame, frame_data in zip(frames, frames_data)}
+        frames_manifest = manifest.Manifest(output_path, filename, manifest.settings_hash(scene, camera), poses)
+        helper.open_manifest(frames_manifest)
+
+        if not scene.resume:
+            frames_manifest.reset()
+            frames_to_render = self.fetch_cached_frames(scene, camera, list(frames))
+        else:
+            # valid frames are kept and skipped by blender, stale frames are removed to be rendered again
+            filepaths = [scene.render.frame_path(frame=frame) for frame in frames]
+            stale_frames = frames_manifest.stale_frames(frames, filepaths)
+            for frame in stale_frames:
+                filepath = scene.render.frame_path(frame=frame)
+                if os.path.isfile(filepath): os.remove(filepath)
+
+            scene.render.use_overwrite = False
+            self.report({'INFO'}, f'Resuming : {len(stale_frames)} of {len(frames)} training frames left to render.')
+
+            frames_to_render = self.fetch_cached_frames(scene, camera, stale_frames)
+
+        # existing files of the frames to render are stale frames of a previous run, skipped by blender once overwrite is forced off
+        if scene.init_use_overwrite and not scene.render.use_overwrite:
+            for frame in frames_to_render:
+                filepath = scene.render.frame_path(frame=frame)
+                if os.path.isfile(filepath): os.remove(filepath)
+
+        self.start_stream(scene, output_path, frames, frames_data, frames_to_render)
+        self.start_batches(scene, frames, frames_data, frames_to_render)
+        return frames_to_render
+
+    # stream the transforms entries of the training frames while rendering, starting with the frames already rendered (resumed or cached)
+    def start_stream(self, scene, output_path, frames, frames_data, frames_to_render):
+        stream = None
+        if scene.stream_transforms:
+            filename = manifest.STREAM if scene.shard_count == 1 else self.shard_filename(manifest.STREAM, scene.shard_index, scene.shard_count)
+            stream = manifest.TransformsStream(output_path, filename, dict(zip(frames, frames_data)))
+
+            rendered = set(frames) - set(frames_to_render)
+            for frame in sorted(rendered):
+                filepath = scene.render.frame_path(frame=frame)
+                if os.path.isfile(filepath): stream.record(frame, filepath, timestamp=os.path.getmtime(filepath))
+
+        helper.open_stream(stream)
+
+    # frames of the animation range which are not part of the dataset are skipped by blender, thanks to empty placeholder files
+    def skip_frames(self, scene, frames):
+        skipped = sorted( set(range(scene.frame_start, scene.frame_end + 1, scene.frame_step)) - set(frames) )
+        placeholders = [scene.render.frame_path(frame=frame) for frame in skipped]
+        for filepath in placeholders:
+            open(filepath, 'w').close()
+
+        helper.open_placeholders(placeholders) # removed by the post render handler
+        scene.init_use_overwrite = scene.render.use_overwrite
+        if len(placeholders) > 0:
+            scene.render.use_overwrite = False
+
+    # downscale the training frames to the image pyramid levels while rendering
+    def start_pyramid(self, scene, frames):
+        filepaths = [scene.render.frame_path(frame=frame) for frame in frames]
+        helper.open_pyramid(pyramid.ImagePyramid(scene.pyramid_levels, filepaths) if scene.pyramid_levels > 0 else None)
+
+    # write the auxiliary passes of the training frames with compositor file output nodes, restored by the post render handler
+    def start_passes(self, scene, output_path):
+        state = None
+        if len(scene.render_passes) > 0:
+            state = render_passes.setup(scene, bpy.context.view_layer, output_path, scene.render_passes, scene.passes_format, scene.depth_max, dirname=OUTPUT_TRAIN)
+        helper.open_passes(state)
+
+    # render the training frames in batches of growing size following a coverage order of their views, such that the frames rendered
+    # after each batch are spread over all views, frames of later batches are skipped by blender thanks to placeholder files
+    def start_batches(self, scene, frames, frames_data, frames_to_render):
+        batches = []
+        if scene.progressive and len(frames_to_render) > PROGRESSIVE_BATCH:
+            poses = dict(zip(frames, frames_data))
+            matrices = np.array([poses[frame]['transform_matrix'] for frame in frames_to_render], dtype=np.float64)
+            order = view_sampling.coverage_order(matrices[:, :3, 3], -matrices[:, :3, 2]) # camera looks along -z
+            filepaths = [scene.render.frame_path(frame=frames_to_render[index]) for index in order]
+
+            bounds = [0]
+            while bounds[-1] < len(filepaths):
+                bounds.append(min(max(PROGRESSIVE_BATCH, 2 * bounds[-1]), len(filepaths)))
+            batches = [filepaths[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+            # existing files are skipped without overwrite, the frames to render of the first batch are removed (later ones are replaced by placeholders)
+            for filepath in batches[0]:
+                if os.path.isfile(filepath): os.remove(filepath)
+            scene.render.use_overwrite = False
+
+        helper.open_render_batches(scene, batches[1:])
+
+    # link frames found in the render cache into the dataset, returns the frames still to render
+    def fetch_cached_frames(self, scene, camera, frames):
+        if scene.cache_path == '' or bpy.data.filepath == '' or bpy.data.is_dirty or len(frames) == 0 or len(scene.render_passes) > 0:
+            helper.open_cache(None) # the scene fingerprint requires a saved blender file without unsaved changes, and auxiliary passes are not cached
+            return frames
+
+        base_key = manifest.settings_hash(scene, camera) + render_cache.scene_fingerprint(scene)
+        cache = render_cache.RenderCache(bpy.path.abspath(scene.cache_path), scene.cache_size, base_key)
+        helper.open_cache(cache)
+
+        frames_to_render = []
+        for frame in frames:
+            filepath = scene.render.frame_path(frame=frame)
+            if cache.fetch(frame, helper.dataset_manifest.poses[frame], filepath):
+                helper.dataset_manifest.record(frame, filepath)
+                if helper.dataset_archive is not None: helper.dataset_archive.add(filepath)
+            else:
+                if os.path.isfile(filepath): os.remove(filepath) # not skipped by blender
+                frames_to_render.append(frame)
+
+        # cached frames are skipped by blender
+        if cache.hits > 0:
+            scene.render.use_overwrite = False
+            self.report({'INFO'}, f'Render cache : {cache.hits} of {len(frames)} training frames reused.')
+
+        return frames_to_render
+
+    # render the testing frames in the same session, after the training frames (started by the post render handler) or right away
+    def queue_test_frames(self, scene, output_path, camera, method='SOF'):
+        if scene.render_frames and scene.render_test and not (scene.splats and scene.splats_test_dummy):
+            rendering = (method == 'SOF', method == 'TTC', method == 'COS', method == 'PFR')
+            helper.open_test_split(scene, rendering, camera, self.get_frames(scene, mode='TEST', method=method), output_path)
+
+    # start profiling the run if requested, sharded runs save one profile per shard
+    def start_profile(self, scene, method='SOF'):
+        filename = 'profile.json' if scene.shard_count == 1 else self.shard_filename('profile.json', scene.shard_index, scene.shard_count)
+        helper.open_profile(scene, method, filename, timed=(method == 'COS' and scene.cos_static)) # static scene frame times reported in the log
+
+    # render the scene animation, synchronously when blender runs without user interface
+    def render_animation(self, nb_frames=0):
+        helper.add_render_frames(nb_frames)
+        if helper.dataset_profile is not None:
+            helper.dataset_profile.start('render') # stopped by the post render or cancel handler
+
+        if bpy.app.background:
+            bpy.ops.render.render(animation=True, write_still=True) # handlers are called before returning
+            while len(helper.render_batches) > 0:
+                helper.render_next_batch()
+        else:
+            bpy.ops.render.render('INVOKE_DEFAULT', animation=True, write_still=True)
 
     def save_json(self, directory, filename, data, indent=4):
         filepath = os.path.join(directory, filename)
         with open(filepath, 'w') as file:
             json.dump(data, file, indent=indent)
 
+    # scene settings of the transforms files, read on the main thread since transforms are written on worker threads
+    def transforms_settings(self, scene):
+        scale = scene.render.resolution_percentage / 100
+        return {
+            'shard_index': scene.shard_index,
+            'shard_count': scene.shard_count,
+            'compact_json': scene.compact_json,
+            'pose_sidecar': scene.pose_sidecar,
+            'pyramid_levels': scene.pyramid_levels,
+            'colmap': scene.splats and scene.splats_format != 'PLY',
+            'resolution': (scene.render.resolution_x * scale, scene.render.resolution_y * scale),
+        }
+
+    # save a transforms file, sharded training transforms are saved as partial files merged after rendering
+    def save_transforms(self, settings, directory, filename, data):
+        with helper.profile_stage('write ' + filename):
+            if settings['shard_count'] > 1 and filename == TRANSFORMS_TRAIN:
+                self.save_json(directory, self.shard_filename(filename, settings['shard_index'], settings['shard_count']), data)
+            else:
+                self.write_transforms(settings, directory, filename, data)
+
+    # partial transforms file name of a shard
+    def shard_filename(self, filename, index, count):
+        name, extension = os.path.splitext(filename)
+        return f'{name}.shard-{index:05d}-of-{count:05d}{extension}'
+
+    # write a transforms file, and its pose sidecar if requested
+    def write_transforms(self, settings, directory, filename, data):
+        if settings['compact_json']:
+            self.stream_json(directory, filename, data)
+        else:
+            self.save_json(directory, filename, data)
+
+        if settings['pose_sidecar'] != 'NONE':
+            self.save_pose_sidecar(directory, filename, data['frames'], sidecar=settings['pose_sidecar'])
+
+        # each image pyramid level has its own training transforms file
+        if filename == TRANSFORMS_TRAIN:
+            name, extension = os.path.splitext(filename)
+            for factor in pyramid.level_factors(settings['pyramid_levels']):
+                self.write_transforms(settings, directory, f'{name}_{factor}{extension}', self.pyramid_level_data(data, factor))
+
+        if filename == TRANSFORMS_TRAIN and settings['colmap']:
+            self.save_colmap_cameras(settings, directory, data)
+
+    # colmap binary cameras and images of the training transforms, named relative to the training folder
+    # (file paths have no extension with gaussian points, which require png frames)
+    def save_colmap_cameras(self, settings, directory, data):
+        params, size = colmap.pinhole_intrinsics(data, *settings['resolution'])
+        names = [os.path.relpath(frame['file_path'], OUTPUT_TRAIN).replace(os.sep, '/') + '.png' for frame in data['frames']]
+        matrices = [frame['transform_matrix'] for frame in data['frames']]
+
+        sparse_path = os.path.join(directory, colmap.SPARSE_DIR)
+        os.makedirs(sparse_path, exist_ok=True)
+        colmap.write_cameras(os.path.join(sparse_path, 'cameras.bin'), params, size)
+        colmap.write_images(os.path.join(sparse_path, 'images.bin'), matrices, names)
+
+    # transforms of an image pyramid level : rescaled intrinsics and downscaled frame file paths
+    def pyramid_level_data(self, data, factor):
+        level_data = {key: value for key, value in data.items() if key != 'integer_depth_scale'} # auxiliary passes are not downscaled
+        if 'w' in data: # ngp intrinsics
+            width, height = pyramid.level_size(data['w'], data['h'], factor)
+            scale_x, scale_y = width / data['w'], height / data['h']
+            level_data.update({'fl_x': data['fl_x'] * scale_x, 'fl_y': data['fl_y'] * scale_y, 'cx': data['cx'] * scale_x, 'cy': data['cy'] * scale_y, 'w': width, 'h': height})
+
+        level_dirname = pyramid.level_dirname(OUTPUT_TRAIN, factor)
+        level_data['frames'] = []
+        for frame in data['frames']:
+            level_frame = {key: value for key, value in frame.items() if key not in render_passes.FRAME_KEYS}
+            level_frame['file_path'] = os.path.join(level_dirname, os.path.relpath(frame['file_path'], OUTPUT_TRAIN))
+            level_data['frames'].append(level_frame)
+        return level_data
+
+    # write a transforms file incrementally, one compact line per frame
+    def stream_json(self, directory, filename, data):
+        filepath = os.path.join(directory, filename)
+        with open(filepath, 'w') as file:
+            file.write('{')
+            for key, value in data.items():
+                if key != 'frames':
+                    file.write(json.dumps(key) + ':' + self.compact_json(value) + ',')
+
+            file.write('"frames":[')
+            for i, frame in enumerate(data.get('frames', [])):
+                file.write(',\n' * (i > 0) + self.compact_json(frame))
+            file.write(']}\n')
+
+    # compact json encoding, floats formatted with float32 round trip precision
+    def compact_json(self, value):
+        if isinstance(value, float) and math.isfinite(value):
+            return format(value, '.9g')
+        if isinstance(value, dict):
+            return '{' + ','.join(json.dumps(k) + ':' + self.compact_json(v) for k, v in value.items()) + '}'
+        if isinstance(value, (list, tuple)):
+            return '[' + ','.join(self.compact_json(v) for v in value) + ']'
+        return json.dumps(value)
+
+    # binary sidecar of a transforms file : float32 matrices (N, 4, 4) and file paths, memory mappable
+    def save_pose_sidecar(self, directory, filename, frames, sidecar='NPZ'):
+        assert sidecar == 'NPZ' or sidecar == 'RAW'
+
+        name = os.path.splitext(filename)[0]
+        matrices = np.array([frame['transform_matrix'] for frame in frames], dtype='<f4').reshape(-1, 4, 4)
+        file_paths = [frame['file_path'] for frame in frames]
+
+        if sidecar == 'NPZ':
+            np.savez(os.path.join(directory, name + '.npz'), transform_matrix=matrices, file_path=np.array(file_paths, dtype=str))
+        else:
+            matrices.tofile(os.path.join(directory, name + '_poses.f32'))
+            with open(os.path.join(directory, name + '_paths.txt'), 'w') as file:
+                file.writelines(file_path + '\n' for file_path in file_paths)
+
     def is_power_of_two(self, x):
         return math.log2(x).is_integer()
 
@@ -184,7 +602,7 @@ class BlenderNeRF_Operator(bpy.types.Operator):
 
     # assert messages
     def asserts(self, scene, method='SOF'):
-        assert method == 'SOF' or method == 'TTC' or method == 'COS'
+        assert method == 'SOF' or method == 'TTC' or method == 'COS' or method == 'PFR'
 
         camera = scene.camera
         train_camera = scene.camera_train_target
@@ -193,10 +611,11 @@ class BlenderNeRF_Operator(bpy.types.Operator):
         sof_name = scene.sof_dataset_name
         ttc_name = scene.ttc_dataset_name
         cos_name = scene.cos_dataset_name
+        pfr_name = scene.pfr_dataset_name
 
         error_messages = []
 
-        if (method == 'SOF' or method == 'COS') and not camera.data.type == 'PERSP':
+        if (method == 'SOF' or method == 'COS' or method == 'PFR') and not camera.data.type == 'PERSP':
             error_messages.append('Only perspective cameras are supported!')
 
         if method == 'TTC' and not (train_camera.data.type == 'PERSP' and test_camera.data.type == 'PERSP'):
@@ -207,9 +626,12 @@ class BlenderNeRF_Operator(bpy.types.Operator):
             if not sphere_camera.data.type == 'PERSP':
                 error_messages.append('BlenderNeRF Camera must remain a perspective camera!')
 
-        if (method == 'SOF' and sof_name == '') or (method == 'TTC' and ttc_name == '') or (method == 'COS' and cos_name == ''):
+        if (method == 'SOF' and sof_name == '') or (method == 'TTC' and ttc_name == '') or (method == 'COS' and cos_name == '') or (method == 'PFR' and pfr_name == ''):
             error_messages.append('Dataset name cannot be empty!')
 
+        if method == 'PFR' and not os.path.isfile(bpy.path.abspath(scene.pfr_filepath)):
+            error_messages.append('Pose file does not exist!')
+
         if method == 'COS' and any(x == 0 for x in scene.sphere_scale):
             error_messages.append('The BlenderNeRF Sphere cannot be flat! Change its scale to be non zero in all axes.')
 
@@ -219,16 +641,27 @@ class BlenderNeRF_Operator(bpy.types.Operator):
         if scene.save_path == '':
             error_messages.append('Save path cannot be empty!')
 
+        if scene.shard_index >= scene.shard_count:
+            error_messages.append('Shard index must be lower than the shard count!')
+
         if scene.splats and not scene.test_data:
             error_messages.append('Gaussian Splatting requires test data!')
 
         if scene.splats and scene.render.image_settings.file_format != 'PNG':
             error_messages.append('Gaussian Splatting requires PNG file extensions!')
 
+        if method == 'COS' and scene.cos_static and scene.train_data and scene.render_frames:
+            animated = extrinsics.animated_data(scene)
+            if len(animated) > 0:
+                error_messages.append(f'Static Scene requires that only the BlenderNeRF Camera changes over time, but {animated[0]} does!')
+
+        if scene.render_frames and scene.pyramid_levels > 0 and pyramid.oiio is None:
+            error_messages.append('Image pyramid requires the OpenImageIO python module!')
+
         return error_messages
 
     def save_log_file(self, scene, directory, method='SOF'):
-        assert method == 'SOF' or method == 'TTC' or method == 'COS'
+        assert method == 'SOF' or method == 'TTC' or method == 'COS' or method == 'PFR'
         now = datetime.datetime.now()
 
         logdata = {
@@ -238,13 +671,24 @@ class BlenderNeRF_Operator(bpy.types.Operator):
             'Test': scene.test_data,
             'AABB': scene.aabb,
             'Render Frames': scene.render_frames,
+            'Image Pyramid': scene.pyramid_levels,
+            'Render Passes': sorted(scene.render_passes),
+            'Progressive': scene.progressive,
             'File Format': 'NeRF' if scene.nerf else 'NGP',
             'Save Path': scene.save_path,
+            'Compact Transforms': scene.compact_json,
+            'Pose Sidecar': scene.pose_sidecar,
+            'Output': scene.archive_format,
             'Method': method
         }
 
         if method == 'SOF':
-            logdata['Frame Step'] = scene.train_frame_steps
+            logdata['Frame Selection'] = scene.sof_selection
+            if scene.sof_selection == 'STEP':
+                logdata['Frame Step'] = scene.train_frame_steps
+            else:
+                logdata['Frames'] = scene.sof_nb_frames
+                logdata['Min Pose Distance'] = scene.sof_min_distance
             logdata['Camera'] = scene.camera.name
             logdata['Dataset Name'] = scene.sof_dataset_name
 
@@ -254,6 +698,13 @@ class BlenderNeRF_Operator(bpy.types.Operator):
             logdata['Frames'] = scene.ttc_nb_frames
             logdata['Dataset Name'] = scene.ttc_dataset_name
 
+        elif method == 'PFR':
+            logdata['Camera'] = scene.camera.name
+            logdata['Pose File'] = scene.pfr_filepath
+            logdata['File Intrinsics'] = scene.pfr_intrinsics
+            logdata['Frames'] = len(self.replay_poses)
+            logdata['Dataset Name'] = scene.pfr_dataset_name
+
         else:
             logdata['Camera'] = scene.camera.name
             logdata['Location'] = str(list(scene.sphere_location))
@@ -265,6 +716,7 @@ class BlenderNeRF_Operator(bpy.types.Operator):
             logdata['Frames'] = scene.cos_nb_frames
             logdata['Upper Views'] = scene.upper_views
             logdata['Outwards'] = scene.outwards
+            logdata['Static Scene'] = scene.cos_static
             logdata['Dataset Name'] = scene.cos_dataset_name
 
         self.save_json(directory, filename='log.txt', data=logdata)
\ No newline at end of file
@@ -29,11 +29,25 @@ class BlenderNeRF_UI(bpy.types.Panel):
             if scene.train_data:
                 layout.separator()
                 layout.prop(scene, 'render_frames')
+                if scene.render_frames:
+                    layout.prop(scene, 'resume')
+                    layout.prop(scene, 'progressive')
+                    if scene.test_data: layout.prop(scene, 'render_test')
+                    layout.prop(scene, 'pyramid_levels')
+                    layout.prop(scene, 'render_passes')
+                    if len(scene.render_passes) > 0:
+                        layout.prop(scene, 'passes_format')
+                        if 'DEPTH' in scene.render_passes and scene.passes_format == 'PNG': layout.prop(scene, 'depth_max')
 
             layout.prop(scene, 'logs')
-            layout.prop(scene, 'splats', text='Gaussian Points (PLY file)')
+            layout.prop(scene, 'profile')
+            layout.prop(scene, 'splats', text='Gaussian Points')
 
             if scene.splats:
+                layout.prop(scene, 'splats_format')
+                layout.prop(scene, 'splats_sampling')
+                if scene.splats_sampling != 'VERTICES': layout.prop(scene, 'splats_budget')
+
                 layout.separator()
                 layout.label(text='Gaussian Test Camera Poses')
                 row = layout.row(align=True)
@@ -46,7 +60,14 @@ class BlenderNeRF_UI(bpy.types.Panel):
             row = layout.row(align=True)
             row.prop(scene, 'nerf', toggle=True, text='NGP', invert_checkbox=True)
             row.prop(scene, 'nerf', toggle=True)
+            layout.prop(scene, 'compact_json')
+            layout.prop(scene, 'stream_transforms')
+            layout.prop(scene, 'pose_sidecar')
 
             layout.separator()
             layout.use_property_split = True
+            layout.prop(scene, 'archive_format')
+            if scene.archive_format == 'SHARDS': layout.prop(scene, 'tar_shard_size')
+            layout.prop(scene, 'cache_path')
+            if scene.cache_path != '': layout.prop(scene, 'cache_size')
             layout.prop(scene, 'save_path')
\ No newline at end of file
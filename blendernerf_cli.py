@@ -0,0 +1,197 @@
+# BlenderNeRF command line interface : create a dataset without user interface, e.g. on a render farm
+#
+#   blender -b scene.blend --python-exit-code 1 -P blendernerf_cli.py -- --method COS --config job.toml
+#
+# the config file (toml or json) sets scene properties by name, and nested tables set properties of scene members :
+#
+#   save_path = "/data/datasets"
+#   cos_dataset_name = "lego"
+#   cos_nb_frames = 300
+#   camera = "Camera"
+#
+#   [render]
+#   resolution_x = 800
+#   resolution_y = 800
+#
+# training frames can be split into contiguous shards rendered by separate blender processes, with identical output :
+#
+#   local workers : --workers 4 (renders 4 shards in parallel, then merges them)
+#   remote workers sharing the save path : --shard 0/4 ... --shard 3/4 on each machine, then --merge 4 once all are done
+#
+# exit codes : 0 on success, 1 if the dataset could not be created (see the printed error), 2 on invalid arguments
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import importlib.util
+import bpy
+
+
+# global addon script variables
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+OPERATORS = {
+    'SOF': 'subset_of_frames',
+    'TTC': 'train_test_cameras',
+    'COS': 'camera_on_sphere',
+    'PFR': 'pose_file_replay',
+}
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+
+
+def parse_args(argv):
+    argv = argv[argv.index('--') + 1:] if '--' in argv else []
+
+    parser = argparse.ArgumentParser(prog='blender -b <file.blend> -P blendernerf_cli.py --', description='Create a BlenderNeRF dataset without user interface')
+    parser.add_argument('--method', required=True, choices=list(OPERATORS.keys()), help='BlenderNeRF method')
+    parser.add_argument('--config', help='toml or json file with scene properties to set before running')
+    parser.add_argument('--scene', help='name of the scene to use, active scene by default')
+
+    sharding = parser.add_mutually_exclusive_group()
+    sharding.add_argument('--workers', type=int, default=1, help='number of local blender processes rendering the training frames')
+    sharding.add_argument('--shard', help='render only shard INDEX/COUNT of the training frames, to be merged with --merge COUNT')
+    sharding.add_argument('--merge', type=int, help='merge the COUNT rendered shards and archive the dataset')
+
+    args = parser.parse_args(argv)
+
+    if args.shard is not None:
+        try:
+            index, count = (int(x) for x in args.shard.split('/'))
+        except ValueError:
+            parser.error('--shard expects INDEX/COUNT')
+        if not 0 <= index < count:
+            parser.error('--shard index must be between 0 and COUNT - 1')
+        args.shard = (index, count)
+
+    if args.workers < 1 or (args.merge is not None and args.merge < 1):
+        parser.error('--workers and --merge expect a positive number')
+
+    return args
+
+# render all shards in local blender processes, returns their exit codes
+def run_workers(args):
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    processes = []
+    for index in range(args.workers):
+        command = [bpy.app.binary_path, '-b', bpy.data.filepath, '-t', str(threads), '--python-exit-code', str(EXIT_FAILURE), '-P', os.path.abspath(__file__), '--']
+        command += ['--method', args.method, '--shard', f'{index}/{args.workers}']
+        if args.config: command += ['--config', args.config]
+        if args.scene: command += ['--scene', args.scene]
+        processes.append( subprocess.Popen(command) )
+
+    return [process.wait() for process in processes]
+
+def load_config(filepath):
+    if filepath is None:
+        return {}
+
+    if filepath.endswith('.json'):
+        with open(filepath, 'r') as file:
+            return json.load(file)
+
+    import tomllib
+    with open(filepath, 'rb') as file:
+        return tomllib.load(file)
+
+# set properties from a (nested) config dictionary, object pointers are given by name
+def apply_config(target, config):
+    for key, value in config.items():
+        if isinstance(value, dict):
+            apply_config(getattr(target, key), value)
+            continue
+
+        prop = target.bl_rna.properties.get(key)
+        if prop is None:
+            raise KeyError(f'Unknown property {key} of {target.bl_rna.identifier}')
+
+        if prop.type == 'POINTER' and isinstance(value, str):
+            value = bpy.data.objects[value]
+
+        if prop.type == 'ENUM' and prop.is_enum_flag and isinstance(value, list):
+            value = set(value) # e.g. render_passes = ["DEPTH", "MASK"]
+
+        setattr(target, key, value)
+
+# addon helper module, from the enabled addon or by registering the addon next to this script
+def load_addon():
+    for handler in bpy.app.handlers.render_complete:
+        if handler.__name__ == 'post_render' and handler.__module__.endswith('.helper'):
+            return sys.modules[handler.__module__]
+
+    spec = importlib.util.spec_from_file_location('blendernerf', os.path.join(ADDON_DIR, '__init__.py'), submodule_search_locations=[ADDON_DIR])
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = addon
+    spec.loader.exec_module(addon)
+    addon.register()
+
+    return addon.helper
+
+def main():
+    args = parse_args(sys.argv) # exits with code 2 on invalid arguments
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as error:
+        print('BlenderNeRF :', error)
+        return EXIT_USAGE
+
+    helper = load_addon()
+    scene = bpy.data.scenes[args.scene] if args.scene else bpy.context.scene
+    if bpy.context.window is not None:
+        bpy.context.window.scene = scene
+
+    # set initial properties now, so that the first depsgraph update does not override the config
+    if helper.set_init_props in bpy.app.handlers.depsgraph_update_post:
+        helper.set_init_props(scene)
+
+    try:
+        apply_config(scene, config)
+    except (KeyError, AttributeError, TypeError, ValueError) as error:
+        print('BlenderNeRF :', error)
+        return EXIT_USAGE
+
+    if args.workers > 1:
+        if bpy.data.filepath == '':
+            print('BlenderNeRF : the blender file must be saved to render with workers')
+            return EXIT_USAGE
+
+        exit_codes = run_workers(args)
+        if any(exit_code != EXIT_SUCCESS for exit_code in exit_codes):
+            print('BlenderNeRF : worker exit codes', exit_codes)
+            return EXIT_FAILURE
+        args.merge = args.workers
+
+    if args.merge is not None:
+        scene.shard_count = args.merge
+        operator = bpy.ops.object.blendernerf_merge_shards
+        kwargs = {'method': args.method}
+    else:
+        if args.shard is not None:
+            scene.shard_index, scene.shard_count = args.shard
+        operator = getattr(bpy.ops.object, OPERATORS[args.method])
+        kwargs = {}
+
+    # operators reporting an error raise a runtime error, after printing the reported message
+    try:
+        with bpy.context.temp_override(scene=scene):
+            result = operator(**kwargs)
+    except RuntimeError as error:
+        print('BlenderNeRF :', error)
+        return EXIT_FAILURE
+
+    if 'FINISHED' not in result:
+        return EXIT_FAILURE
+
+    # the render handlers already ran when rendering synchronously : this only resets a run left unfinished
+    helper.post_render(scene)
+    for thread in list(helper.archive.finalizing.values()):
+        thread.join()
+
+    return EXIT_SUCCESS
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import os
+import math
+import numpy as np
+
+
+# global addon script variables
+SPARSE_DIR = os.path.join('sparse', '0') # colmap sparse model folder, as read by gaussian splatting trainers
+PINHOLE_MODEL_ID = 1 # colmap camera model id, with fx, fy, cx, cy parameters
+BLENDER_TO_OPENCV = np.diag([1.0, -1.0, -1.0]) # blender cameras look along -z with y up, colmap cameras along +z with y down
+
+# binary record layouts of colmap/src/colmap/scene/reconstruction_io.cc, little endian and unpadded
+CAMERA_DTYPE = np.dtype([('camera_id', '<i4'), ('model_id', '<i4'), ('width', '<u8'), ('height', '<u8'), ('params', '<f8', (4,))])
+IMAGE_DTYPE = np.dtype([('image_id', '<i4'), ('qvec', '<f8', (4,)), ('tvec', '<f8', (3,)), ('camera_id', '<i4')])
+POINT_DTYPE = np.dtype([('point3D_id', '<u8'), ('xyz', '<f8', (3,)), ('rgb', 'u1', (3,)), ('error', '<f8'), ('track_length', '<u8')])
+
+
+## conversions
+
+# pinhole parameters (fx, fy, cx, cy) and resolution of a transforms file, derived from camera_angle_x for nerf files
+def pinhole_intrinsics(data, width, height):
+    if 'fl_x' in data:
+        return (data['fl_x'], data['fl_y'], data['cx'], data['cy']), (data['w'], data['h'])
+
+    focal = width / (2 * math.tan(data['camera_angle_x'] / 2))
+    return (focal, focal, width / 2, height / 2), (width, height)
+
+# unit quaternions (N, 4) in wxyz convention with non negative w, of rotation matrices (N, 3, 3)
+# each row of the symmetric matrix below is proportional to the quaternion, the row of the largest diagonal value is used
+def rotation_to_quaternion(rotations):
+    m = rotations
+    k = np.empty((len(m), 4, 4))
+    k[:, 0, 0] = 1 + m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2]
+    k[:, 1, 1] = 1 + m[:, 0, 0] - m[:, 1, 1] - m[:, 2, 2]
+    k[:, 2, 2] = 1 - m[:, 0, 0] + m[:, 1, 1] - m[:, 2, 2]
+    k[:, 3, 3] = 1 - m[:, 0, 0] - m[:, 1, 1] + m[:, 2, 2]
+    k[:, 0, 1] = k[:, 1, 0] = m[:, 2, 1] - m[:, 1, 2]
+    k[:, 0, 2] = k[:, 2, 0] = m[:, 0, 2] - m[:, 2, 0]
+    k[:, 0, 3] = k[:, 3, 0] = m[:, 1, 0] - m[:, 0, 1]
+    k[:, 1, 2] = k[:, 2, 1] = m[:, 0, 1] + m[:, 1, 0]
+    k[:, 1, 3] = k[:, 3, 1] = m[:, 0, 2] + m[:, 2, 0]
+    k[:, 2, 3] = k[:, 3, 2] = m[:, 1, 2] + m[:, 2, 1]
+
+    best = np.argmax(np.diagonal(k, axis1=1, axis2=2), axis=1)
+    quaternions = k[np.arange(len(m)), best]
+    quaternions /= np.linalg.norm(quaternions, axis=1, keepdims=True)
+    quaternions *= np.where(quaternions[:, :1] < 0, -1.0, 1.0)
+    return quaternions
+
+# colmap world to camera quaternions (N, 4) and translations (N, 3) of blender camera to world matrices (N, 4, 4)
+def world_to_camera(matrices):
+    matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+    rotations = matrices[:, :3, :3] @ BLENDER_TO_OPENCV
+    rotations = rotations / np.linalg.norm(rotations, axis=1, keepdims=True) # scaled cameras
+    rotations = rotations.transpose(0, 2, 1)
+    translations = -np.einsum('nij,nj->ni', rotations, matrices[:, :3, 3])
+    return rotation_to_quaternion(rotations), translations
+
+
+## binary model files
+
+# cameras.bin with a single pinhole camera of id 1
+def write_cameras(filepath, params, size):
+    cameras = np.zeros(1, dtype=CAMERA_DTYPE)
+    cameras['camera_id'] = 1
+    cameras['model_id'] = PINHOLE_MODEL_ID
+    cameras['width'], cameras['height'] = round(size[0]), round(size[1])
+    cameras['params'] = params
+
+    with open(filepath, 'wb') as file:
+        file.write(np.uint64(len(cameras)).tobytes())
+        cameras.tofile(file)
+
+# images.bin with the camera to world matrices of the named images, all taken by camera 1 and without 2d points
+def write_images(filepath, matrices, names):
+    quaternions, translations = world_to_camera(matrices)
+    images = np.zeros(len(names), dtype=IMAGE_DTYPE)
+    images['image_id'] = np.arange(1, len(names) + 1)
+    images['qvec'] = quaternions
+    images['tvec'] = translations
+    images['camera_id'] = 1
+
+    # fixed size records interleaved with the null terminated names and the number of 2d points
+    no_points = np.uint64(0).tobytes()
+    with open(filepath, 'wb') as file:
+        file.write(np.uint64(len(images)).tobytes())
+        file.write(b''.join(image.tobytes() + name.encode('utf-8') + b'\0' + no_points for image, name in zip(images, names)))
+
+# points3D.bin with 8 bit colors from srgb colors in [0, 1], without tracks
+def write_points(filepath, points, colors):
+    records = np.zeros(len(points), dtype=POINT_DTYPE)
+    records['point3D_id'] = np.arange(1, len(points) + 1)
+    records['xyz'] = points
+    records['rgb'] = np.clip(np.round(np.asarray(colors) * 255), 0, 255)
+
+    with open(filepath, 'wb') as file:
+        file.write(np.uint64(len(records)).tobytes())
+        records.tofile(file)
\ No newline at end of file
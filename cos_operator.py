@@ -1,5 +1,4 @@
 import os
-import shutil
 import bpy
 from . import helper, blender_nerf_operator
 
@@ -14,20 +13,21 @@ class CameraOnSphere(blender_nerf_operator.BlenderNeRF_Operator):
     bl_idname = 'object.camera_on_sphere'
     bl_label = 'Camera on Sphere COS'
 
-    def execute(self, context):
+    # dataset creation stages, see BlenderNeRF_Operator.execute and invoke
+    def run(self, context):
         scene = context.scene
         camera = scene.camera
 
         # check if camera is selected : next errors depend on an existing camera
         if camera == None:
             self.report({'ERROR'}, 'Be sure to have a selected camera!')
-            return {'FINISHED'}
+            return {'CANCELLED'}
 
         # if there is an error, print first error message
         error_messages = self.asserts(scene, method='COS')
         if len(error_messages) > 0:
            self.report({'ERROR'}, error_messages[0])
-           return {'FINISHED'}
+           return {'CANCELLED'}
 
         output_data = self.get_camera_intrinsics(scene, camera)
 
@@ -35,23 +35,28 @@ class CameraOnSphere(blender_nerf_operator.BlenderNeRF_Operator):
         output_dir = bpy.path.clean_name(scene.cos_dataset_name)
         output_path = os.path.join(scene.save_path, output_dir)
         os.makedirs(output_path, exist_ok=True)
-
-        if scene.logs: self.save_log_file(scene, output_path, method='COS')
-        if scene.splats: self.save_splats_ply(scene, output_path)
+        if scene.shard_count == 1: helper.open_archive(scene, output_path)
+        self.start_profile(scene, method='COS')
 
         # initial property might have changed since set_init_props update
         scene.init_output_path = scene.render.filepath
 
-        # other intial properties
+        # other intial properties, set before the first stage since restored when cancelling
         scene.init_sphere_exists = scene.show_sphere
         scene.init_camera_exists = scene.show_camera
-        scene.init_frame_end = scene.frame_end
         scene.init_active_camera = camera
 
-        if scene.test_data:
+        # shared dataset files are only saved by the first shard
+        first_shard = (scene.shard_index == 0)
+        if scene.logs and first_shard: self.save_log_file(scene, output_path, method='COS')
+        if scene.splats and first_shard: yield from self.save_splats_ply(scene, output_path)
+
+        if scene.test_data and first_shard:
             # testing transforms
+            yield 'Test camera poses'
             output_data['frames'] = self.get_camera_extrinsics(scene, camera, mode='TEST', method='COS')
-            self.save_json(output_path, 'transforms_test.json', output_data)
+            yield from self.in_worker('Saving test transforms', self.save_transforms, self.transforms_settings(scene), output_path, 'transforms_test.json', output_data)
+            self.queue_test_frames(scene, output_path, camera, method='COS')
 
         if scene.train_data:
             if not scene.show_camera: scene.show_camera = True
@@ -62,32 +67,53 @@ class CameraOnSphere(blender_nerf_operator.BlenderNeRF_Operator):
             scene.camera = sphere_camera
 
             # training transforms
+            yield 'Training camera poses'
             sphere_output_data['frames'] = self.get_camera_extrinsics(scene, sphere_camera, mode='TRAIN', method='COS')
-            self.save_json(output_path, 'transforms_train.json', sphere_output_data)
+            yield from self.in_worker('Saving training transforms', self.save_transforms, self.transforms_settings(scene), output_path, 'transforms_train.json', sphere_output_data)
 
             # rendering
-            if scene.render_frames:
+            frames = self.get_frames(scene, mode='TRAIN', method='COS')
+            render = scene.render_frames and len(frames) > 0
+            if render:
                 output_train = os.path.join(output_path, 'train')
                 os.makedirs(output_train, exist_ok=True)
-                scene.rendering = (False, False, True)
-                scene.frame_end = scene.frame_start + scene.cos_nb_frames - 1 # update end frame
+                scene.rendering = (False, False, True, False)
+                helper.open_pose_table(scene, frames) # camera locations looked up while rendering, before the shard changes the start frame
+                helper.set_frame_range(scene, frames) # update end frame (and range of the shard)
+                if scene.cos_static: helper.open_persistent_data(scene) # only the camera is synchronized between frames
                 scene.render.filepath = os.path.join(output_train, '') # training frames path
-                bpy.ops.render.render('INVOKE_DEFAULT', animation=True, write_still=True) # render scene
+
+                # render scene, or directly finalize the dataset if all frames are already rendered
+                with helper.profile_stage('manifest'): # resumed and cached frames
+                    frames_to_render = self.start_manifest(scene, output_path, sphere_camera, frames, sphere_output_data['frames'])
+                if len(frames_to_render) > 0:
+                    self.render_animation(len(frames_to_render))
+                else:
+                    helper.post_render(scene)
+
+        # testing frames are rendered right away if no training frames are, or once they are without user interface
+        rendering = scene.train_data and render
+        if helper.test_split is not None and (bpy.app.background or not rendering):
+            helper.render_test_split()
+            rendering = True
+
+        # with user interface, wait until all frames are rendered and the dataset is finalized by the handler function
+        yield from self.wait_for_render(scene)
+        if rendering and helper.render_cancelled:
+            return {'CANCELLED'}
 
         # if frames are rendered, the below code is executed by the handler function
-        if not any(scene.rendering):
+        if not rendering:
             # reset camera settings
-            if not scene.init_camera_exists: helper.delete_camera(scene, CAMERA_NAME)
-            if not scene.init_sphere_exists:
-                objects = bpy.data.objects
-                objects.remove(objects[EMPTY_NAME], do_unlink=True)
-                scene.show_sphere = False
-                scene.sphere_exists = False
+            helper.reset_cos_camera(scene)
 
-            scene.camera = scene.init_active_camera
+            # compress dataset and remove folder (only keep archive), finalized in the background
+            if scene.shard_count == 1: helper.close_archive(scene, output_path)
+            else: helper.close_profile(output_path)
 
-            # compress dataset and remove folder (only keep zip)
-            shutil.make_archive(output_path, 'zip', output_path) # output filename = output_path
-            shutil.rmtree(output_path)
+        return {'FINISHED'}
 
-        return {'FINISHED'}
\ No newline at end of file
+    # the blendernerf sphere and camera are removed if created by this run
+    def cancel(self, context):
+        super().cancel(context)
+        helper.reset_cos_camera(context.scene)
\ No newline at end of file
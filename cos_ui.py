@@ -25,10 +25,13 @@ class COS_UI(bpy.types.Panel):
         layout.prop(scene, 'sphere_radius')
         layout.prop(scene, 'focal')
         layout.prop(scene, 'seed')
+        layout.prop(scene, 'sphere_sampling')
+        if scene.sphere_sampling == 'POISSON': layout.prop(scene, 'sphere_min_angle')
 
         layout.prop(scene, 'cos_nb_frames')
         layout.prop(scene, 'upper_views', toggle=True)
         layout.prop(scene, 'outwards', toggle=True)
+        layout.prop(scene, 'cos_static', toggle=True)
 
         layout.use_property_split = False
         layout.separator()
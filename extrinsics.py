@@ -0,0 +1,367 @@
+import numpy as np
+import bpy
+from . import helper
+
+
+# global addon script variables
+CAMERA_NAME = 'BlenderNeRF Camera'
+EMPTY_NAME = 'BlenderNeRF Sphere'
+
+# object transform channels evaluated from fcurves
+TRANSFORM_CHANNELS = (
+    'location', 'rotation_euler', 'rotation_quaternion', 'rotation_axis_angle', 'scale',
+    'delta_location', 'delta_rotation_euler', 'delta_rotation_quaternion', 'delta_scale',
+)
+
+# modifiers whose result changes over time without any animation data
+TIME_DEPENDENT_MODIFIERS = {
+    'CLOTH', 'SOFT_BODY', 'FLUID', 'DYNAMIC_PAINT', 'PARTICLE_SYSTEM', 'EXPLODE',
+    'OCEAN', 'WAVE', 'BUILD', 'MESH_CACHE', 'MESH_SEQUENCE_CACHE',
+}
+
+# track to constraint enum values, matching blender's internal axis indices
+TRACK_AXES = {'TRACK_X': 0, 'TRACK_Y': 1, 'TRACK_Z': 2, 'TRACK_NEGATIVE_X': 3, 'TRACK_NEGATIVE_Y': 4, 'TRACK_NEGATIVE_Z': 5}
+UP_AXES = {'UP_X': 0, 'UP_Y': 1, 'UP_Z': 2}
+
+
+## dependency analysis
+
+# fcurves of the action assigned to an animation data block (legacy and layered actions)
+def action_fcurves(anim):
+    action = anim.action
+    if action is None:
+        return []
+
+    if getattr(action, 'is_action_layered', False):
+        channelbag = action.layers[0].strips[0].channelbag(anim.action_slot)
+        return list(channelbag.fcurves) if channelbag else []
+
+    return list(action.fcurves)
+
+# whether the animation data of an object only consists of a plain action on its own channels
+def is_plain_animation(obj):
+    anim = obj.animation_data
+    if anim is None:
+        return True
+
+    if len(anim.drivers) > 0 or anim.use_tweak_mode:
+        return False
+
+    if any(not track.mute for track in anim.nla_tracks):
+        return False
+
+    if anim.action_blend_type != 'REPLACE' or anim.action_influence != 1.0:
+        return False
+
+    action = anim.action
+    if action is not None and getattr(action, 'is_action_layered', False):
+        if len(action.layers) != 1 or len(action.layers[0].strips) != 1:
+            return False
+
+    return True
+
+# whether a constraint can be evaluated in batch (track to in world space only)
+def is_supported_constraint(constraint):
+    if constraint.mute or constraint.influence == 0.0:
+        return True
+
+    if constraint.type != 'TRACK_TO' or constraint.influence != 1.0:
+        return False
+
+    if constraint.owner_space != 'WORLD' or constraint.target_space != 'WORLD':
+        return False
+
+    target = constraint.target
+    if target is None or (target.type == 'ARMATURE' and constraint.subtarget != ''):
+        return False
+
+    return True
+
+# objects the world matrix of obj depends on : parent chain and constraint targets, None if cyclic
+def dependency_chain(obj, chain=None, ancestors=()):
+    chain = [] if chain is None else chain
+    if obj in ancestors:
+        return None
+    if obj not in chain:
+        chain.append(obj)
+
+    dependencies = [obj.parent] if obj.parent is not None else []
+    dependencies += [c.target for c in obj.constraints if not c.mute and c.influence > 0.0 and getattr(c, 'target', None) is not None]
+
+    for dependency in dependencies:
+        if dependency_chain(dependency, chain, ancestors + (obj,)) is None:
+            return None
+
+    return chain
+
+# whether the camera world matrix can be evaluated for all frames without scene.frame_set
+def can_batch_evaluate(scene, camera):
+    # time remapping changes the evaluated scene time of each frame
+    if scene.render.frame_map_old != scene.render.frame_map_new:
+        return False
+
+    # foreign frame change handlers may move anything, the addon handlers only move the blendernerf camera (see batch_matrix_world)
+    # and the replay camera (whose poses are never evaluated)
+    own_handlers = (helper.cos_camera_update, helper.replay_camera_update)
+    handlers = list(bpy.app.handlers.frame_change_pre) + list(bpy.app.handlers.frame_change_post)
+    if any(handler not in own_handlers for handler in handlers):
+        return False
+
+    chain = dependency_chain(camera)
+    if chain is None:
+        return False
+
+    for obj in chain:
+        # the blendernerf camera location is set by the frame change handler, which is only reproduced for the camera itself
+        if obj.name == CAMERA_NAME and obj != camera:
+            return False
+
+        if obj.parent is not None and obj.parent_type != 'OBJECT':
+            return False
+
+        if obj.parent is not None and obj.parent.type == 'CURVE' and obj.parent.data.use_path:
+            return False
+
+        if obj.rigid_body is not None or not is_plain_animation(obj):
+            return False
+
+        if not all(is_supported_constraint(c) for c in obj.constraints):
+            return False
+
+        if sum(1 for c in obj.constraints if not c.mute and c.influence > 0.0) > 1:
+            return False
+
+    return True
+
+
+## static scene analysis
+
+# whether an id block (object, data, material, node tree, ...) has an action, drivers or active nla tracks
+def is_animated(block):
+    anim = getattr(block, 'animation_data', None)
+    if anim is None:
+        return False
+
+    return anim.action is not None or len(anim.drivers) > 0 or any(not track.mute for track in anim.nla_tracks)
+
+# whether a node tree (and its node groups) reads the scene time or an image sequence or movie
+def is_time_dependent_tree(tree, visited=None):
+    visited = set() if visited is None else visited
+    if tree is None or tree.name in visited:
+        return False
+    visited.add(tree.name)
+
+    for node in tree.nodes:
+        if node.bl_idname == 'GeometryNodeInputSceneTime':
+            return True
+        image = getattr(node, 'image', None)
+        if image is not None and image.source in ('SEQUENCE', 'MOVIE'):
+            return True
+        group = getattr(node, 'node_tree', None)
+        if is_animated(group) or is_time_dependent_tree(group, visited):
+            return True
+
+    return False
+
+# names of what changes over time in a scene, apart from the blendernerf camera and sphere, an empty list for static scenes
+def animated_data(scene):
+    animated = []
+
+    # foreign frame change handlers may change anything, the addon handlers only move the blendernerf and replay cameras
+    own_handlers = (helper.cos_camera_update, helper.replay_camera_update)
+    handlers = list(bpy.app.handlers.frame_change_pre) + list(bpy.app.handlers.frame_change_post)
+    animated += [f'frame change handler {handler.__name__}' for handler in handlers if handler not in own_handlers]
+
+    blocks = [(scene, scene.name), (scene.node_tree, scene.name)]
+    world = scene.world
+    if world is not None:
+        blocks += [(world, world.name), (world.node_tree, world.name)]
+        if is_time_dependent_tree(world.node_tree):
+            animated.append(world.name)
+
+    for obj in scene.objects:
+        if obj.name in (CAMERA_NAME, EMPTY_NAME, helper.REPLAY_CAMERA_NAME):
+            continue
+
+        # objects parented to or constrained by the blendernerf camera move with it
+        chain = dependency_chain(obj)
+        if chain is None or any(dependency.name == CAMERA_NAME for dependency in chain):
+            animated.append(obj.name)
+            continue
+
+        if obj.rigid_body is not None or any(modifier.type in TIME_DEPENDENT_MODIFIERS for modifier in obj.modifiers):
+            animated.append(obj.name)
+        elif any(modifier.type == 'NODES' and is_time_dependent_tree(modifier.node_group) for modifier in obj.modifiers):
+            animated.append(obj.name)
+
+        blocks += [(obj, obj.name), (obj.data, obj.name), (getattr(obj.data, 'shape_keys', None), obj.name)]
+
+        for slot in obj.material_slots:
+            material = slot.material
+            if material is None:
+                continue
+            blocks += [(material, material.name), (material.node_tree, material.name)]
+            if is_time_dependent_tree(material.node_tree):
+                animated.append(material.name)
+
+    animated += [name for block, name in blocks if is_animated(block)]
+
+    return list(dict.fromkeys(animated)) # unique names, in order
+
+
+## batched transform evaluation
+
+# transform channels of an object for all frames, as arrays of shape (N, size)
+def evaluate_channels(obj, frames):
+    frames = list(frames)
+    channels = {}
+    for data_path in TRANSFORM_CHANNELS:
+        channels[data_path] = np.tile(np.array(getattr(obj, data_path), dtype=np.float64), (len(frames), 1))
+
+    if obj.animation_data is None:
+        return channels
+
+    for fcurve in action_fcurves(obj.animation_data):
+        if fcurve.data_path not in channels or fcurve.mute or not fcurve.is_valid:
+            continue
+        if fcurve.group is not None and fcurve.group.mute:
+            continue
+
+        channels[fcurve.data_path][:, fcurve.array_index] = [fcurve.evaluate(frame) for frame in frames]
+
+    return channels
+
+# rotation matrices of shape (N, 3, 3) around a single axis
+def axis_rotation(axis, angles):
+    c, s = np.cos(angles), np.sin(angles)
+    rot = np.zeros((len(angles), 3, 3))
+    i, j = [(1, 2), (2, 0), (0, 1)][axis]
+    rot[:, axis, axis] = 1.0
+    rot[:, i, i] = c
+    rot[:, j, j] = c
+    rot[:, i, j] = -s
+    rot[:, j, i] = s
+    return rot
+
+# euler angles (N, 3) to rotation matrices, with blender rotation order 'ABC' = R_C @ R_B @ R_A
+def euler_to_matrix(euler, order='XYZ'):
+    rot = np.tile(np.eye(3), (len(euler), 1, 1))
+    for axis_name in order:
+        axis = 'XYZ'.index(axis_name)
+        rot = axis_rotation(axis, euler[:, axis]) @ rot
+    return rot
+
+# quaternions (N, 4) in wxyz convention to rotation matrices, normalized before use
+def quaternion_to_matrix(quat):
+    norm = np.linalg.norm(quat, axis=1, keepdims=True)
+    quat = np.where(norm > 0.0, quat / np.where(norm > 0.0, norm, 1.0), np.array([1.0, 0.0, 0.0, 0.0]))
+    w, x, y, z = quat.T
+
+    rot = np.empty((len(quat), 3, 3))
+    rot[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    rot[:, 0, 1] = 2 * (x * y - w * z)
+    rot[:, 0, 2] = 2 * (x * z + w * y)
+    rot[:, 1, 0] = 2 * (x * y + w * z)
+    rot[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    rot[:, 1, 2] = 2 * (y * z - w * x)
+    rot[:, 2, 0] = 2 * (x * z - w * y)
+    rot[:, 2, 1] = 2 * (y * z + w * x)
+    rot[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return rot
+
+# axis angles (N, 4) as (angle, x, y, z) to rotation matrices
+def axis_angle_to_matrix(axis_angle):
+    angle = axis_angle[:, 0]
+    axis = axis_angle[:, 1:]
+    norm = np.linalg.norm(axis, axis=1)
+    valid = norm > 0.0
+    axis = np.where(valid[:, None], axis / np.where(valid, norm, 1.0)[:, None], 0.0)
+
+    half = np.where(valid, angle / 2, 0.0)
+    quat = np.concatenate([np.cos(half)[:, None], axis * np.sin(half)[:, None]], axis=1)
+    return quaternion_to_matrix(quat)
+
+# local transform matrices (N, 4, 4) of an object from its evaluated channels
+def basis_matrices(obj, channels):
+    mode = obj.rotation_mode
+    if mode == 'QUATERNION':
+        rot = quaternion_to_matrix(channels['delta_rotation_quaternion']) @ quaternion_to_matrix(channels['rotation_quaternion'])
+    elif mode == 'AXIS_ANGLE':
+        rot = axis_angle_to_matrix(channels['rotation_axis_angle'])
+    else:
+        rot = euler_to_matrix(channels['delta_rotation_euler'], mode) @ euler_to_matrix(channels['rotation_euler'], mode)
+
+    scale = channels['scale'] * channels['delta_scale']
+    location = channels['location'] + channels['delta_location']
+
+    basis = np.tile(np.eye(4), (len(location), 1, 1))
+    basis[:, :3, :3] = rot * scale[:, None, :]
+    basis[:, :3, 3] = location
+    return basis
+
+# track to rotation as in blender's vectomat, vec = owner location - target location
+def track_to_rotation(vec, target_up, track_axis, up_axis):
+    count = len(vec)
+    length = np.linalg.norm(vec, axis=1, keepdims=True)
+    n = np.where(length > 1e-35, vec / np.where(length > 1e-35, length, 1.0), np.array([0.0, 0.0, 1.0]))
+
+    axis = track_axis
+    if axis > 2:
+        axis -= 3
+    else:
+        n = -n
+
+    if axis == up_axis:
+        return np.tile(np.eye(3), (count, 1, 1))
+
+    # project the up vector onto the plane orthogonal to the track axis
+    proj = target_up - np.sum(target_up * n, axis=1, keepdims=True) * n
+    proj_length = np.linalg.norm(proj, axis=1, keepdims=True)
+    proj = np.where(proj_length > 1e-35, proj / np.where(proj_length > 1e-35, proj_length, 1.0), np.array([0.0, 1.0, 0.0]))
+
+    right = np.cross(proj, n)
+    right_length = np.linalg.norm(right, axis=1, keepdims=True)
+    right = right / np.where(right_length > 1e-35, right_length, 1.0)
+
+    right_index = 3 - axis - up_axis
+    neg = 1.0 if (axis - up_axis) in (1, -2) else -1.0
+
+    rot = np.empty((count, 3, 3))
+    rot[:, :, right_index] = neg * right
+    rot[:, :, up_axis] = proj
+    rot[:, :, axis] = n
+    return rot
+
+# apply a world space track to constraint on world matrices (N, 4, 4)
+def apply_track_to(scene, constraint, matrices, frames):
+    target = batch_matrix_world(scene, constraint.target, frames)
+    up = target[:, :3, 2] if constraint.use_target_z else np.tile(np.array([0.0, 0.0, 1.0]), (len(matrices), 1))
+    vec = matrices[:, :3, 3] - target[:, :3, 3]
+
+    rot = track_to_rotation(vec, up, TRACK_AXES[constraint.track_axis], UP_AXES[constraint.up_axis])
+    size = np.linalg.norm(matrices[:, :3, :3], axis=1)
+
+    result = matrices.copy()
+    result[:, :3, :3] = rot * size[:, None, :]
+    return result
+
+# world matrices (N, 4, 4) of an object for all frames, see can_batch_evaluate for supported setups
+def batch_matrix_world(scene, obj, frames):
+    frames = list(frames)
+    channels = evaluate_channels(obj, frames)
+
+    # reproduce helper.cos_camera_update, which moves the blendernerf camera on the training sphere at every frame
+    if obj.name == CAMERA_NAME:
+        channels['location'] = helper.sample_from_sphere_batch(scene, frames)
+
+    matrices = basis_matrices(obj, channels)
+
+    if obj.parent is not None:
+        parent_inverse = np.array(obj.matrix_parent_inverse, dtype=np.float64)
+        matrices = batch_matrix_world(scene, obj.parent, frames) @ parent_inverse @ matrices
+
+    for constraint in obj.constraints:
+        if not constraint.mute and constraint.influence > 0.0 and constraint.type == 'TRACK_TO':
+            matrices = apply_track_to(scene, constraint, matrices, frames)
+
+    return matrices
@@ -1,15 +1,60 @@
 import os
-import shutil
+import json
 import random
 import math
+import time
+import functools
+import contextlib
+import numpy as np
 import mathutils
 import bpy
 from bpy.app.handlers import persistent
+from . import extrinsics, archive, view_sampling, profiling, render_passes
 
 
 # global addon script variables
 EMPTY_NAME = 'BlenderNeRF Sphere'
 CAMERA_NAME = 'BlenderNeRF Camera'
+REPLAY_CAMERA_NAME = 'BlenderNeRF Replay Camera'
+
+# archive, frame manifest, streamed transforms and render cache of the dataset currently being created
+dataset_archive = None
+dataset_manifest = None
+dataset_stream = None
+dataset_cache = None
+
+# blendernerf camera locations of the training frames being rendered, by frame
+pose_table = None
+
+# replay camera world matrices of the pose file replay, by frame
+replay_table = None
+
+# frame file paths of the progressive render batches still to render, after the current one
+render_batches = []
+
+# empty files of the frames skipped while rendering
+placeholder_files = []
+
+# whether a modal run is creating a dataset, since runs share the module state of this file
+active_run = False
+
+# stage and frame timings of the dataset currently being created, if profiled
+dataset_profile = None
+
+# frames to render and rendered frames of the current run, for progress and throughput, and whether its render was cancelled
+render_progress = {'total': 0, 'done': 0, 'start': None}
+render_cancelled = False
+
+# testing frames rendered after the training frames, and render settings restored once they are rendered
+test_split = None
+init_camera = None
+init_use_persistent_data = None
+
+# downscaled copies of the training frames being rendered
+dataset_pyramid = None
+
+# scene settings changed to write the auxiliary render passes, restored after rendering
+passes_state = None
 
 ## property poll and update functions
 
@@ -61,6 +106,7 @@ def visualize_camera(self, context):
         cam_constraint.target = bpy.data.objects[EMPTY_NAME]
 
         scene.camera_exists = True
+        camera_handler(True)
 
     elif CAMERA_NAME in scene.objects.keys() and scene.camera_exists:
         objects = bpy.data.objects
@@ -71,6 +117,7 @@ def visualize_camera(self, context):
                 bpy.data.cameras.remove(block)
 
         scene.camera_exists = False
+        camera_handler(False)
 
 def delete_camera(scene, name):
     objects = bpy.data.objects
@@ -78,32 +125,70 @@ def delete_camera(scene, name):
 
     scene.show_camera = False
     scene.camera_exists = False
+    camera_handler(False)
 
     for block in bpy.data.cameras:
         if name in block.name:
             bpy.data.cameras.remove(block)
 
+# register the frame change handler only while the blendernerf camera exists
+def camera_handler(enable):
+    handlers = bpy.app.handlers.frame_change_post
+    if enable and cos_camera_update not in handlers:
+        handlers.append(cos_camera_update)
+    elif not enable and cos_camera_update in handlers:
+        handlers.remove(cos_camera_update)
+
+# random numbers of a training sphere view, one generator seeded per frame
+def sphere_random(seed, frame):
+    rng = random.Random( (2654435761 * (seed + 1)) ^ (805459861 * (frame + 1)) ) # random number generator
+    return rng.random(), rng.random()
+
 # non uniform sampling when stretched or squeezed sphere
 def sample_from_sphere(scene):
-    seed = (2654435761 * (scene.seed + 1)) ^ (805459861 * (scene.frame_current + 1))
-    rng = random.Random(seed) # random number generator
+    return mathutils.Vector( sphere_sample(sphere_params(scene), scene.frame_current) )
+
+# training sphere sampling parameters of a scene, hashable
+def sphere_params(scene):
+    return (scene.seed, tuple(scene.sphere_location), tuple(scene.sphere_rotation), tuple(scene.sphere_scale), scene.sphere_radius, scene.upper_views,
+            scene.sphere_sampling, scene.frame_start, scene.cos_nb_frames, scene.sphere_min_angle)
+
+# training sphere position of a single frame, cached since sampled on every frame change and depsgraph update
+@functools.lru_cache(maxsize=4096)
+def sphere_sample(params, frame):
+    return tuple( sample_sphere_points(params, [frame])[0] )
+
+# training sphere positions (N, 3) for all frames at once
+def sample_from_sphere_batch(scene, frames):
+    return sample_sphere_points(sphere_params(scene), frames)
+
+def sample_sphere_points(params, frames):
+    seed, sphere_location, sphere_rotation, sphere_scale, sphere_radius, upper_views, sampling, frame_start, nb_frames, min_angle = params
+
+    if sampling == 'RANDOM':
+        randoms = np.array([sphere_random(seed, frame) for frame in frames], dtype=np.float64).reshape(-1, 2)
 
-    # sample random angles
-    theta = rng.random() * 2 * math.pi
-    phi = math.acos(1 - 2 * rng.random()) # ensure uniform sampling from unit sphere
+        # sample random angles
+        theta = randoms[:, 0] * 2 * math.pi
+        phi = np.arccos(1 - 2 * randoms[:, 1]) # ensure uniform sampling from unit sphere
 
-    # uniform sample from unit sphere, given theta and phi
-    unit_x = math.cos(theta) * math.sin(phi)
-    unit_y = math.sin(theta) * math.sin(phi)
-    unit_z = abs( math.cos(phi) ) if scene.upper_views else math.cos(phi)
-    unit = mathutils.Vector((unit_x, unit_y, unit_z))
+        # uniform sample from unit sphere, given theta and phi
+        unit_x = np.cos(theta) * np.sin(phi)
+        unit_y = np.sin(theta) * np.sin(phi)
+        unit_z = np.abs( np.cos(phi) ) if upper_views else np.cos(phi)
+        unit = np.stack([unit_x, unit_y, unit_z], axis=1)
+
+    else:
+        # views spread over the whole sphere : frames index the view set of all training frames (repeated after it)
+        directions = view_sampling.unit_directions(sampling, max(nb_frames, 1), seed, upper_views, min_angle)
+        unit = directions[(np.asarray(frames, dtype=np.int64).reshape(-1) - frame_start) % len(directions)]
 
     # ellipsoid sample : center + rotation @ radius * unit sphere
-    point = scene.sphere_radius * mathutils.Vector(scene.sphere_scale) * unit
-    rotation = mathutils.Euler(scene.sphere_rotation).to_matrix()
-    point = mathutils.Vector(scene.sphere_location) + rotation @ point
+    points = sphere_radius * np.array(sphere_scale) * unit
+    rotation = extrinsics.euler_to_matrix(np.array([sphere_rotation], dtype=np.float64))[0]
+    points = np.array(sphere_location) + points @ rotation.T
 
-    return point
+    return points
 
 ## two way property link between sphere and ui (property and handler functions)
 # https://blender.stackexchange.com/questions/261174/2-way-property-link-or-a-filtered-property-display
@@ -112,8 +197,8 @@ def properties_ui_upd(self, context):
     can_scene_upd(self, context)
 
 @persistent
-def properties_desgraph_upd(scene):
-    can_properties_upd(scene)
+def properties_desgraph_upd(scene, depsgraph=None):
+    can_properties_upd(scene, depsgraph)
 
 def properties_ui(self, context):
     scene = context.scene
@@ -132,9 +217,23 @@ def properties_ui(self, context):
         bpy.context.scene.objects[CAMERA_NAME].constraints['Track To'].track_axis = 'TRACK_Z' if scene.outwards else 'TRACK_NEGATIVE_Z'
         upd_on()
 
-# if empty sphere modified outside of ui panel, edit panel properties
-def properties_desgraph(scene):
-    if scene.show_sphere and EMPTY_NAME in scene.objects.keys():
+# names of the blendernerf sphere and camera updated in a depsgraph, all when unknown
+def updated_objects(depsgraph):
+    if depsgraph is None:
+        return {EMPTY_NAME, CAMERA_NAME}
+
+    updated = set()
+    for update in depsgraph.updates:
+        name = getattr(update.id, 'name', None)
+        if name == EMPTY_NAME or name == CAMERA_NAME: # camera object or camera data
+            updated.add(name)
+    return updated
+
+# if empty sphere modified outside of ui panel, edit panel properties (only when the sphere or camera were updated)
+def properties_desgraph(scene, depsgraph=None):
+    updated = updated_objects(depsgraph)
+
+    if scene.show_sphere and EMPTY_NAME in updated and EMPTY_NAME in scene.objects.keys():
         upd_off()
         scene.sphere_location = bpy.data.objects[EMPTY_NAME].location
         scene.sphere_rotation = bpy.data.objects[EMPTY_NAME].rotation_euler
@@ -142,7 +241,7 @@ def properties_desgraph(scene):
         scene.sphere_radius = bpy.data.objects[EMPTY_NAME].empty_display_size
         upd_on()
 
-    if scene.show_camera and CAMERA_NAME in scene.objects.keys():
+    if scene.show_camera and CAMERA_NAME in updated and CAMERA_NAME in scene.objects.keys():
         upd_off()
         scene.focal = bpy.data.cameras[CAMERA_NAME].lens
         scene.outwards = (bpy.context.scene.objects[CAMERA_NAME].constraints['Track To'].track_axis == 'TRACK_Z')
@@ -163,8 +262,20 @@ def properties_desgraph(scene):
             if CAMERA_NAME in block.name:
                 bpy.data.cameras.remove(block)
 
+    # camera created, deleted, loaded with a file or restored by undo
+    camera_handler(CAMERA_NAME in scene.objects.keys())
+
     if CAMERA_NAME in scene.objects.keys():
-        scene.objects[CAMERA_NAME].location = sample_from_sphere(scene)
+        update_camera_location(scene)
+
+# move the blendernerf camera to its sphere position, only if changed (writing it triggers another depsgraph update)
+def update_camera_location(scene):
+    camera = scene.objects[CAMERA_NAME]
+    location = pose_table.get(scene.frame_current) if pose_table is not None else None
+    if location is None:
+        location = mathutils.Vector( sphere_sample(sphere_params(scene), scene.frame_current) )
+    if (camera.location - location).length_squared > 1e-12:
+        camera.location = location
 
 def empty_fn(self, context): pass
 
@@ -181,41 +292,372 @@ def upd_on():
     can_properties_upd = properties_desgraph
 
 
+## dataset archive functions
+
+# start archiving the dataset, frames are added as they are written
+def open_archive(scene, output_path):
+    global dataset_archive
+    dataset_archive = archive.DatasetArchive(output_path, scene.archive_format, scene.tar_shard_size * 2 ** 20)
+
+# add remaining dataset files and finalize the archive in the background
+def close_archive(scene, output_path):
+    global dataset_archive, dataset_profile
+    if dataset_archive is None or dataset_archive.output_path != output_path:
+        open_archive(scene, output_path)
+
+    # the profile is saved once all other files are archived, to time the archiving stage
+    on_finish = None
+    if dataset_profile is not None:
+        dataset_profile.start('archive')
+        on_finish = functools.partial(dataset_profile.save, output_path)
+        dataset_profile = None
+
+    dataset_archive.finalize(on_finish=on_finish)
+    dataset_archive = None
+
+# stop archiving and remove the partial archive, keeping the dataset folder
+def abort_archive():
+    global dataset_archive
+    if dataset_archive is not None:
+        dataset_archive.abort()
+        dataset_archive = None
+
+# precompute the blendernerf camera locations of the frames to render, looked up on each frame change
+def open_pose_table(scene, frames):
+    global pose_table
+    positions = sample_from_sphere_batch(scene, frames)
+    pose_table = {frame: mathutils.Vector(position) for frame, position in zip(frames, positions)}
+
+# empty files making blender skip frames which are not part of the dataset
+def open_placeholders(placeholders):
+    global placeholder_files
+    placeholder_files = placeholders
+
+def remove_placeholders():
+    global placeholder_files
+    for filepath in placeholder_files:
+        if os.path.isfile(filepath) and os.path.getsize(filepath) == 0:
+            os.remove(filepath)
+    placeholder_files = []
+
+# frames of later progressive batches are skipped thanks to placeholder files, the scene is kept loaded between batches
+def open_render_batches(scene, batches):
+    global render_batches
+    render_batches = [list(batch) for batch in batches]
+    if len(render_batches) == 0:
+        return
+
+    for batch in render_batches:
+        for filepath in batch:
+            open(filepath, 'w').close()
+        placeholder_files.extend(batch) # left ones removed when the render is cancelled
+    open_persistent_data(scene)
+
+# render the next progressive batch, on a timer when blender has a user interface since renders cannot start from render handlers
+def render_next_batch():
+    for filepath in render_batches.pop(0):
+        if os.path.isfile(filepath) and os.path.getsize(filepath) == 0:
+            os.remove(filepath)
+
+    render_animation()
+
+# record rendered frames of the current dataset in a manifest
+def open_manifest(manifest):
+    global dataset_manifest
+    dataset_manifest = manifest
+
+# stream the transforms entries of the rendered frames of the current dataset
+def open_stream(stream):
+    global dataset_stream
+    dataset_stream = stream
+
+# store rendered frames of the current dataset in a render cache
+def open_cache(cache):
+    global dataset_cache
+    dataset_cache = cache
+
+# count frames about to be rendered, the throughput is measured from the first render
+def add_render_frames(nb_frames):
+    if render_progress['start'] is None:
+        render_progress['start'] = time.perf_counter()
+    render_progress['total'] += nb_frames
+
+def reset_render_progress():
+    render_progress.update(total=0, done=0, start=None)
+
+# whether a dataset is being created : by a modal run, or rendered by a render job or a pending testing split
+def run_in_progress():
+    return active_run or test_split is not None or bpy.app.is_job_running('RENDER')
+
+# set the animation range to the given frames (a stepped range or a sorted list), reset by the post render handler
+def set_frame_range(scene, frames):
+    global render_cancelled
+    render_cancelled = False # a new render is set up
+    scene.init_frame_start = scene.frame_start
+    scene.init_frame_end = scene.frame_end
+    scene.init_frame_step = scene.frame_step
+
+    scene.frame_start = frames[0] # set first, the end frame is pushed to be after the start frame
+    scene.frame_end = frames[-1]
+    scene.frame_step = frames.step if isinstance(frames, range) else 1
+
+# render the testing frames of a dataset in the same session, after the training frames
+# the scene is kept loaded (and its render data persistent) between both renders, only the camera changes
+def open_test_split(scene, rendering, camera, frames, output_path):
+    global test_split
+    test_split = {'scene': scene.name, 'rendering': tuple(rendering), 'camera': camera.name, 'frames': frames, 'output_path': output_path}
+    open_persistent_data(scene)
+
+# keep the render data of the scene between frames and renders, restored by close_test_split once all frames are rendered
+def open_persistent_data(scene):
+    global init_use_persistent_data
+    if init_use_persistent_data is None:
+        init_use_persistent_data = scene.render.use_persistent_data
+    scene.render.use_persistent_data = True
+
+# set up the scene for the queued testing frames
+def start_test_split(scene):
+    global test_split, init_camera
+    split, test_split = test_split, None
+
+    output_test = os.path.join(split['output_path'], 'test')
+    os.makedirs(output_test, exist_ok=True)
+
+    scene.rendering = split['rendering']
+    set_frame_range(scene, split['frames'])
+    scene.render.filepath = os.path.join(output_test, '') # testing frames path
+    scene.init_use_overwrite = scene.render.use_overwrite
+    if scene.resume: scene.render.use_overwrite = False # existing testing frames are kept
+
+    init_camera = scene.camera
+    scene.camera = bpy.data.objects[split['camera']]
+    add_render_frames(len(split['frames']))
+
+    if dataset_profile is not None:
+        dataset_profile.start('render')
+
+# render the queued testing frames, on a timer when blender has a user interface since renders cannot start from render handlers
+def render_test_split():
+    scene = bpy.data.scenes[test_split['scene']]
+    start_test_split(scene)
+    render_animation()
+
+# render the scene animation from a handler or timer, synchronously when blender runs without user interface
+def render_animation():
+    if bpy.app.background:
+        bpy.ops.render.render(animation=True, write_still=True) # handlers are called before returning
+    else:
+        with bpy.context.temp_override(window=bpy.context.window_manager.windows[0]):
+            bpy.ops.render.render('INVOKE_DEFAULT', animation=True, write_still=True)
+
+# forget the queued testing frames, and restore the render settings once all frames are rendered
+def close_test_split(scene, cancel=False):
+    global test_split, init_use_persistent_data
+    if cancel:
+        test_split = None
+
+    if test_split is None and init_use_persistent_data is not None:
+        scene.render.use_persistent_data = init_use_persistent_data
+        init_use_persistent_data = None
+
+# camera without keyframes, moved to the replayed pose of every frame by the frame change handler
+def open_replay(scene, camera_data, poses):
+    global replay_table
+    stale_camera = bpy.data.objects.get(REPLAY_CAMERA_NAME) # left by an interrupted blender session
+    if stale_camera is not None: bpy.data.objects.remove(stale_camera, do_unlink=True)
+
+    camera = bpy.data.objects.new(REPLAY_CAMERA_NAME, camera_data)
+    scene.collection.objects.link(camera)
+
+    replay_table = {frame: mathutils.Matrix(matrix) for frame, matrix in poses.items()}
+    if replay_camera_update not in bpy.app.handlers.frame_change_post:
+        bpy.app.handlers.frame_change_post.append(replay_camera_update)
+    replay_camera_update(scene)
+
+    return camera
+
+# remove the replay camera and its handler, and set back the active camera
+def close_replay(scene):
+    global replay_table
+    replay_table = None
+    if replay_camera_update in bpy.app.handlers.frame_change_post:
+        bpy.app.handlers.frame_change_post.remove(replay_camera_update)
+
+    camera = bpy.data.objects.get(REPLAY_CAMERA_NAME)
+    if camera is not None:
+        camera_data = camera.data
+        bpy.data.objects.remove(camera, do_unlink=True)
+        if camera_data.users == 0: bpy.data.cameras.remove(camera_data)
+
+    scene.camera = scene.init_active_camera
+
+# compute downscaled copies of the training frames as they are written
+def open_pyramid(pyramid):
+    global dataset_pyramid
+    dataset_pyramid = pyramid
+
+# wait for all downscaled frames, before the dataset folder is archived, frames which failed are added to the log file
+def close_pyramid(output_path=None, cancel=False):
+    global dataset_pyramid
+    if dataset_pyramid is None:
+        return
+
+    with profile_stage('pyramid'):
+        failed = dataset_pyramid.close(cancel=cancel)
+    if output_path is not None and len(failed) > 0:
+        update_log_file(output_path, {'Image Pyramid Failed Frames': {os.path.relpath(filepath, output_path).replace(os.sep, '/'): str(error) for filepath, error in failed}})
+    dataset_pyramid = None
+
+# compositor settings writing the auxiliary render passes
+def open_passes(state):
+    global passes_state
+    passes_state = state
+
+def close_passes(scene):
+    global passes_state
+    if passes_state is not None:
+        render_passes.restore(scene, passes_state)
+        passes_state = None
+
+# time the dataset creation stages and rendered frames if requested, saved next to the log file
+# timed runs are profiled without saving the profile files
+def open_profile(scene, method, filename='profile.json', timed=False):
+    global dataset_profile
+    dataset_profile = profiling.RunProfile(method, filename if scene.profile else None) if (scene.profile or timed) else None
+
+# time a stage of the dataset creation, when profiled
+def profile_stage(name):
+    return dataset_profile.stage(name) if dataset_profile is not None else contextlib.nullcontext()
+
+# save the profile files of a dataset which is not archived, or discard the profile without output path
+def close_profile(output_path=None):
+    global dataset_profile
+    if dataset_profile is not None and output_path is not None:
+        dataset_profile.save(output_path)
+    dataset_profile = None
+
+# render time of the first frame of a static scene, which synchronizes the whole scene, and of the next ones, which only synchronize the camera
+def static_scene_stats(profile, directory):
+    times = profile.render_times(directory)
+    if len(times) < 2:
+        return {}
+
+    first_seconds = times[0]
+    frame_seconds = sum(times[1:]) / (len(times) - 1)
+    return {
+        'Static Scene First Frame Seconds': round(first_seconds, 3),
+        'Static Scene Frame Seconds': round(frame_seconds, 3),
+        'Static Scene First / Next Frame Time': round(first_seconds / frame_seconds, 2) if frame_seconds > 0 else None,
+    }
+
+# add entries to the log file of a dataset, if saved
+def update_log_file(output_path, data):
+    filepath = os.path.join(output_path, 'log.txt')
+    if not os.path.isfile(filepath):
+        return
+
+    with open(filepath, 'r') as file:
+        logdata = json.load(file)
+    logdata.update(data)
+    with open(filepath, 'w') as file:
+        json.dump(logdata, file, indent=4)
+
+
 ## blender handler functions
 
-# reset properties back to intial
-@persistent
-def post_render(scene):
-    if any(scene.rendering): # execute this function only when rendering with addon
-        dataset_names = (scene.sof_dataset_name, scene.ttc_dataset_name, scene.cos_dataset_name)
-        method_dataset_name = dataset_names[ list(scene.rendering).index(True) ]
+# remove the blendernerf sphere and camera if created by the cos operator, and set back the active camera
+def reset_cos_camera(scene):
+    if not scene.init_camera_exists and CAMERA_NAME in scene.objects.keys(): delete_camera(scene, CAMERA_NAME)
+    if not scene.init_sphere_exists and EMPTY_NAME in scene.objects.keys():
+        objects = bpy.data.objects
+        objects.remove(objects[EMPTY_NAME], do_unlink=True)
+        scene.show_sphere = False
+        scene.sphere_exists = False
+
+    scene.camera = scene.init_active_camera
 
-        if scene.rendering[0]: scene.frame_step = scene.init_frame_step # sof : reset frame step
+# reset properties back to intial, returns the dataset output path
+def reset_render(scene):
+    global dataset_manifest, dataset_stream, dataset_cache, pose_table, init_camera, render_batches
+    dataset_names = (scene.sof_dataset_name, scene.ttc_dataset_name, scene.cos_dataset_name, scene.pfr_dataset_name)
+    method_dataset_name = dataset_names[ list(scene.rendering).index(True) ]
+    static_scene = scene.rendering[2] and scene.cos_static
 
-        if scene.rendering[1]: # ttc : reset frame end
-            scene.frame_end = scene.init_frame_end
+    # reset frame range (sof : frame step, ttc and cos : frame end, shards : frame start)
+    scene.frame_start = scene.init_frame_start
+    scene.frame_end = scene.init_frame_end
+    scene.frame_step = scene.init_frame_step
 
-        if scene.rendering[2]: # cos : reset camera settings
-            if not scene.init_camera_exists: delete_camera(scene, CAMERA_NAME)
-            if not scene.init_sphere_exists:
-                objects = bpy.data.objects
-                objects.remove(objects[EMPTY_NAME], do_unlink=True)
-                scene.show_sphere = False
-                scene.sphere_exists = False
+    if init_camera is not None: # testing frames camera
+        scene.camera = init_camera
+        init_camera = None
 
-            scene.camera = scene.init_active_camera
-            scene.frame_end = scene.init_frame_end
+    if scene.rendering[2] and test_split is None: # cos : reset camera settings, once testing frames are rendered
+        reset_cos_camera(scene)
 
-        scene.rendering = (False, False, False)
-        scene.render.filepath = scene.init_output_path # reset filepath
+    if scene.rendering[3] and test_split is None: # pfr : remove the replay camera, once testing frames are rendered
+        close_replay(scene)
 
-        # clean directory name (unsupported characters replaced) and output path
-        output_dir = bpy.path.clean_name(method_dataset_name)
-        output_path = os.path.join(scene.save_path, output_dir)
+    scene.rendering = (False, False, False, False)
+    scene.render.filepath = scene.init_output_path # reset filepath
+    scene.render.use_overwrite = scene.init_use_overwrite # reset resume setting
+    close_passes(scene)
+    close_test_split(scene)
+    dataset_manifest = None
+    dataset_stream = None
+    pose_table = None
+    render_batches = [] # cancelled render
+    remove_placeholders() # before the dataset folder is archived
 
-        # compress dataset and remove folder (only keep zip)
-        shutil.make_archive(output_path, 'zip', output_path) # output filename = output_path
-        shutil.rmtree(output_path)
+    # clean directory name (unsupported characters replaced) and output path
+    output_dir = bpy.path.clean_name(method_dataset_name)
+    output_path = os.path.join(scene.save_path, output_dir)
+
+    if dataset_cache is not None:
+        update_log_file(output_path, dataset_cache.stats())
+        dataset_cache = None
+
+    if static_scene and test_split is None and dataset_profile is not None: # once the training frames are rendered
+        update_log_file(output_path, static_scene_stats(dataset_profile, os.path.join(output_path, 'train')))
+
+    if dataset_profile is not None:
+        dataset_profile.stop('render')
+
+    close_pyramid(output_path)
+
+    return output_path
+
+@persistent
+def post_render(scene):
+    if any(scene.rendering): # execute this function only when rendering with addon
+        # next progressive batch of training frames, rendered by the operator without user interface
+        if len(render_batches) > 0:
+            if not bpy.app.background: bpy.app.timers.register(render_next_batch)
+            return
+
+        output_path = reset_render(scene)
+
+        # testing frames are rendered next, by the operator without user interface, the dataset is finalized after them
+        if test_split is not None:
+            if not bpy.app.background: bpy.app.timers.register(render_test_split)
+            return
+
+        # compress dataset and remove folder (only keep archive), finalized in the background
+        # sharded datasets are archived once all shards are merged
+        if scene.shard_count == 1: close_archive(scene, output_path)
+        else: close_profile(output_path)
+
+# keep the partial dataset folder when rendering is cancelled, to be resumed later
+@persistent
+def cancel_render(scene):
+    global render_cancelled
+    if any(scene.rendering):
+        render_cancelled = True
+        close_pyramid(cancel=True)
+        close_test_split(scene, cancel=True)
+        output_path = reset_render(scene)
+        abort_archive()
+        close_profile(output_path)
 
 # set initial property values (bpy.data and bpy.context require a loaded scene)
 @persistent
@@ -230,8 +672,70 @@ def set_init_props(scene):
 
     bpy.app.handlers.depsgraph_update_post.remove(set_init_props)
 
+# add rendered frame to the dataset archive
+@persistent
+def archive_frame(scene):
+    if any(scene.rendering) and dataset_archive is not None:
+        dataset_archive.add( scene.render.frame_path(frame=scene.frame_current) )
+
+# add rendered frame to the frame manifest
+@persistent
+def record_frame(scene):
+    if any(scene.rendering) and dataset_manifest is not None:
+        dataset_manifest.record(scene.frame_current, scene.render.frame_path(frame=scene.frame_current))
+
+# add rendered frame to the streamed transforms
+@persistent
+def stream_frame(scene):
+    if any(scene.rendering) and dataset_stream is not None:
+        dataset_stream.record(scene.frame_current, scene.render.frame_path(frame=scene.frame_current))
+
+# add rendered frame to the render cache
+@persistent
+def cache_frame(scene):
+    if any(scene.rendering) and dataset_cache is not None:
+        dataset_cache.store(scene.frame_current, scene.render.frame_path(frame=scene.frame_current))
+
+# downscale rendered frame to the image pyramid levels
+@persistent
+def pyramid_frame(scene):
+    if any(scene.rendering) and dataset_pyramid is not None:
+        dataset_pyramid.add( scene.render.frame_path(frame=scene.frame_current) )
+
+# count rendered frames, for progress
+@persistent
+def progress_frame(scene):
+    if any(scene.rendering):
+        render_progress['done'] += 1
+
+# time frames being rendered : before rendering, after rendering and compositing, and after saving the image
+@persistent
+def profile_frame_start(scene):
+    if any(scene.rendering) and dataset_profile is not None:
+        dataset_profile.render_pre(scene.frame_current, scene.render.frame_path(frame=scene.frame_current))
+
+@persistent
+def profile_frame_end(scene):
+    if any(scene.rendering) and dataset_profile is not None:
+        dataset_profile.render_post(scene.render.frame_path(frame=scene.frame_current))
+
+@persistent
+def profile_frame_write(scene):
+    if any(scene.rendering) and dataset_profile is not None:
+        dataset_profile.render_write(scene.render.frame_path(frame=scene.frame_current))
+
 # update cos camera when changing frame
 @persistent
 def cos_camera_update(scene):
     if CAMERA_NAME in scene.objects.keys():
-        scene.objects[CAMERA_NAME].location = sample_from_sphere(scene)
\ No newline at end of file
+        update_camera_location(scene)
+
+# move the replay camera to the replayed pose when changing frame
+@persistent
+def replay_camera_update(scene):
+    if replay_table is None or REPLAY_CAMERA_NAME not in scene.objects.keys():
+        return
+
+    matrix = replay_table.get(scene.frame_current)
+    if matrix is not None:
+        scene.objects[REPLAY_CAMERA_NAME].matrix_world = matrix
\ No newline at end of file
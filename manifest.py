@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import glob
+import hashlib
+import bpy
+
+
+# global addon script variables
+MANIFEST = 'manifest.jsonl'
+STREAM = 'transforms_train.jsonl'
+POSE_TOLERANCE = 1e-6
+
+
+# checksum of a file content
+def file_checksum(filepath, chunk_size=1 << 20):
+    checksum = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+# render settings affecting the rendered images, except for the camera pose
+def render_settings(scene, camera):
+    render = scene.render
+    image = render.image_settings
+    view = scene.view_settings
+
+    settings = {
+        'engine': render.engine,
+        'resolution': [render.resolution_x, render.resolution_y, render.resolution_percentage],
+        'pixel_aspect': [render.pixel_aspect_x, render.pixel_aspect_y],
+        'film_transparent': render.film_transparent,
+        'motion_blur': render.use_motion_blur,
+        'image': [image.file_format, image.color_mode, image.color_depth, image.compression, image.quality],
+        'view': [view.view_transform, view.look, view.exposure, view.gamma],
+        'camera': [camera.data.type, camera.data.lens, camera.data.sensor_width, camera.data.sensor_height, camera.data.sensor_fit,
+                   camera.data.shift_x, camera.data.shift_y, camera.data.clip_start, camera.data.clip_end],
+    }
+
+    if render.engine == 'CYCLES' and hasattr(scene, 'cycles'):
+        settings['samples'] = scene.cycles.samples
+    elif hasattr(scene, 'eevee'):
+        settings['samples'] = scene.eevee.taa_render_samples
+
+    return settings
+
+def settings_hash(scene, camera):
+    settings = json.dumps(render_settings(scene, camera), sort_keys=True)
+    return hashlib.sha256(settings.encode('utf-8')).hexdigest()
+
+# per frame record of the rendered training frames, appended as each frame is written
+class Manifest:
+    def __init__(self, output_path, filename, settings_hash, poses):
+        self.output_path = output_path
+        self.filepath = os.path.join(output_path, filename)
+        self.settings_hash = settings_hash
+        self.poses = poses # frame -> transform matrix
+
+    # latest record of each frame, from all manifests of the dataset (including those of other shards)
+    def load(self):
+        records = {}
+        for filepath in sorted(glob.glob(os.path.join(self.output_path, 'manifest*.jsonl'))):
+            with open(filepath, 'r') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue # line cut by a crash
+                    records[record['frame']] = record
+        return records
+
+    def reset(self):
+        if os.path.isfile(self.filepath):
+            os.remove(self.filepath)
+
+    # whether a frame has been rendered with the current pose and settings, and its image is intact
+    def is_valid(self, record, frame, filepath):
+        if record is None or record['settings_hash'] != self.settings_hash or not os.path.isfile(filepath):
+            return False
+
+        pose = [x for row in self.poses[frame] for x in row]
+        record_pose = [x for row in record['transform_matrix'] for x in row]
+        if any(abs(x - y) > POSE_TOLERANCE for x, y in zip(pose, record_pose)):
+            return False
+
+        return record['checksum'] == file_checksum(filepath)
+
+    # frames still to be rendered, given their image file paths
+    def stale_frames(self, frames, filepaths):
+        records = self.load()
+        return [frame for frame, filepath in zip(frames, filepaths) if not self.is_valid(records.get(frame), frame, filepath)]
+
+    def record(self, frame, filepath):
+        if frame not in self.poses or not os.path.isfile(filepath):
+            return
+
+        record = {
+            'frame': frame,
+            'file_path': os.path.relpath(filepath, self.output_path).replace(os.sep, '/'),
+            'transform_matrix': self.poses[frame],
+            'settings_hash': self.settings_hash,
+            'checksum': file_checksum(filepath),
+            'blender_version': bpy.app.version_string,
+        }
+
+        with open(self.filepath, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+
+# transforms entries of the training frames, appended to a jsonl file with their write time as soon as each frame is written
+class TransformsStream:
+    def __init__(self, output_path, filename, entries):
+        self.filepath = os.path.join(output_path, filename)
+        self.entries = entries # frame -> transforms entry
+        open(self.filepath, 'w').close()
+
+    def record(self, frame, filepath, timestamp=None):
+        if frame not in self.entries or not os.path.isfile(filepath):
+            return
+
+        record = {'frame': frame, **self.entries[frame], 'time': time.time() if timestamp is None else timestamp}
+
+        # single write per record, such that readers never see a partial line unless blender crashes
+        with open(self.filepath, 'a') as file:
+            file.write(json.dumps(record) + '\n')
@@ -0,0 +1,75 @@
+import os
+import json
+import glob
+import bpy
+from . import helper, blender_nerf_operator, manifest
+
+
+# merge shards operator class : assembles the dataset rendered by several blender processes
+class MergeShards(blender_nerf_operator.BlenderNeRF_Operator):
+    '''Merge Shards Operator'''
+    bl_idname = 'object.blendernerf_merge_shards'
+    bl_label = 'Merge BlenderNeRF Shards'
+    bl_options = {'INTERNAL'}
+
+    method: bpy.props.EnumProperty(name='Method', items=[('SOF', 'SOF', 'Subset of Frames'), ('TTC', 'TTC', 'Train and Test Cameras'), ('COS', 'COS', 'Camera on Sphere'), ('PFR', 'PFR', 'Pose File Replay')], default='SOF')
+
+    # merge stages, see BlenderNeRF_Operator.execute and invoke
+    def run(self, context):
+        scene = context.scene
+        count = scene.shard_count
+
+        # clean directory name (unsupported characters replaced) and output path
+        dataset_names = {'SOF': scene.sof_dataset_name, 'TTC': scene.ttc_dataset_name, 'COS': scene.cos_dataset_name, 'PFR': scene.pfr_dataset_name}
+        output_dir = bpy.path.clean_name(dataset_names[self.method])
+        output_path = os.path.join(scene.save_path, output_dir)
+
+        if not os.path.isdir(output_path):
+            self.report({'ERROR'}, f'Dataset folder {output_path} does not exist!')
+            return {'CANCELLED'}
+
+        if scene.train_data:
+            filenames = [self.shard_filename(blender_nerf_operator.TRANSFORMS_TRAIN, index, count) for index in range(count)]
+            missing = [filename for filename in filenames if not os.path.isfile(os.path.join(output_path, filename))]
+            if len(missing) > 0:
+                self.report({'ERROR'}, f'Missing shard transforms {missing[0]}!')
+                return {'CANCELLED'}
+
+            # concatenate frames in shard order, equal to the frame order of a single process run
+            yield 'Merging shard transforms'
+            output_data = None
+            frames = []
+            for filename in filenames:
+                with open(os.path.join(output_path, filename), 'r') as file:
+                    shard_data = json.load(file)
+                frames += shard_data.pop('frames')
+                output_data = shard_data if output_data is None else output_data
+
+            output_data['frames'] = frames
+            yield from self.in_worker('Saving training transforms', self.write_transforms, self.transforms_settings(scene), output_path, blender_nerf_operator.TRANSFORMS_TRAIN, output_data)
+
+            for filename in filenames:
+                os.remove(os.path.join(output_path, filename))
+
+            # combine the frame manifests of all shards
+            yield 'Merging shard manifests'
+            with open(os.path.join(output_path, manifest.MANIFEST), 'a') as file:
+                for filepath in sorted(glob.glob(os.path.join(output_path, 'manifest.shard-*.jsonl'))):
+                    with open(filepath, 'r') as shard_file:
+                        file.write(shard_file.read())
+                    os.remove(filepath)
+
+            # concatenate the streamed transforms of all shards in shard order, if streamed
+            stream_paths = [os.path.join(output_path, self.shard_filename(manifest.STREAM, index, count)) for index in range(count)]
+            stream_paths = [filepath for filepath in stream_paths if os.path.isfile(filepath)]
+            if len(stream_paths) > 0:
+                with open(os.path.join(output_path, manifest.STREAM), 'w') as file:
+                    for filepath in stream_paths:
+                        with open(filepath, 'r') as shard_file:
+                            file.write(shard_file.read())
+                        os.remove(filepath)
+
+        # compress dataset and remove folder (only keep archive), finalized in the background
+        helper.close_archive(scene, output_path)
+
+        return {'FINISHED'}
@@ -0,0 +1,143 @@
+import os
+import numpy as np
+import bpy
+from . import helper, blender_nerf_operator, pose_replay
+
+
+# pose file replay operator class
+class PoseFileReplay(blender_nerf_operator.BlenderNeRF_Operator):
+    '''Pose File Replay Operator'''
+    bl_idname = 'object.pose_file_replay'
+    bl_label = 'Pose File Replay PFR'
+
+    # dataset creation stages, see BlenderNeRF_Operator.execute and invoke
+    def run(self, context):
+        scene = context.scene
+        camera = scene.camera
+
+        # check if camera is selected : next errors depend on an existing camera
+        if camera == None:
+            self.report({'ERROR'}, 'Be sure to have a selected camera!')
+            return {'CANCELLED'}
+
+        # if there is an error, print first error message
+        error_messages = self.asserts(scene, method='PFR')
+        if len(error_messages) > 0:
+           self.report({'ERROR'}, error_messages[0])
+           return {'CANCELLED'}
+
+        # initial properties, set before the first stage since restored when cancelling
+        scene.init_output_path = scene.render.filepath
+        scene.init_active_camera = camera
+
+        # camera to world matrices, and intrinsics if the file has them
+        yield 'Loading poses'
+        try:
+            matrices, intrinsics = pose_replay.load_poses(bpy.path.abspath(scene.pfr_filepath))
+        except (OSError, ValueError, KeyError) as error:
+            self.report({'ERROR'}, f'Cannot load the pose file : {error}')
+            return {'CANCELLED'}
+
+        if len(matrices) == 0:
+            self.report({'ERROR'}, 'The pose file has no camera poses!')
+            return {'CANCELLED'}
+
+        # replayed poses by frame, from the scene start frame (float32 values, as read from camera.matrix_world)
+        self.replay_poses = {scene.frame_start + i: matrix for i, matrix in enumerate(matrices.astype(np.float32).tolist())}
+        use_intrinsics = scene.pfr_intrinsics and intrinsics is not None
+
+        # a single replay camera without keyframes, with the lens settings of the active camera or of the pose file
+        camera_data = camera.data.copy()
+        camera_data.name = helper.REPLAY_CAMERA_NAME
+        if use_intrinsics: pose_replay.apply_intrinsics(camera_data, intrinsics)
+        replay_camera = helper.open_replay(scene, camera_data, self.replay_poses)
+
+        # the exported intrinsics must match the pose file ones
+        replay_output_data = self.get_camera_intrinsics(scene, replay_camera)
+        mismatch = pose_replay.intrinsics_mismatch(intrinsics, replay_output_data) if use_intrinsics else []
+        if len(mismatch) > 0:
+            helper.close_replay(scene)
+            key, value, camera_value = mismatch[0]
+            self.report({'ERROR'}, f'Pose file {key} of {value:g} differs from the replay camera {key} of {camera_value:g}! Check the render resolution.')
+            return {'CANCELLED'}
+
+        output_data = self.get_camera_intrinsics(scene, camera)
+
+        # clean directory name (unsupported characters replaced) and output path
+        output_dir = bpy.path.clean_name(scene.pfr_dataset_name)
+        output_path = os.path.join(scene.save_path, output_dir)
+        os.makedirs(output_path, exist_ok=True)
+        if scene.shard_count == 1: helper.open_archive(scene, output_path)
+        self.start_profile(scene, method='PFR')
+
+        # shared dataset files are only saved by the first shard
+        first_shard = (scene.shard_index == 0)
+        if scene.logs and first_shard: self.save_log_file(scene, output_path, method='PFR')
+        if scene.splats and first_shard: yield from self.save_splats_ply(scene, output_path)
+
+        if scene.test_data and first_shard:
+            # testing transforms
+            yield 'Test camera poses'
+            output_data['frames'] = self.get_camera_extrinsics(scene, camera, mode='TEST', method='PFR')
+            yield from self.in_worker('Saving test transforms', self.save_transforms, self.transforms_settings(scene), output_path, 'transforms_test.json', output_data)
+            self.queue_test_frames(scene, output_path, camera, method='PFR')
+
+        if scene.train_data:
+            scene.camera = replay_camera
+
+            # training transforms
+            yield 'Training camera poses'
+            replay_output_data['frames'] = self.get_camera_extrinsics(scene, replay_camera, mode='TRAIN', method='PFR')
+            yield from self.in_worker('Saving training transforms', self.save_transforms, self.transforms_settings(scene), output_path, 'transforms_train.json', replay_output_data)
+
+            # rendering
+            frames = self.get_frames(scene, mode='TRAIN', method='PFR')
+            render = scene.render_frames and len(frames) > 0
+            if render:
+                output_train = os.path.join(output_path, 'train')
+                os.makedirs(output_train, exist_ok=True)
+                scene.rendering = (False, False, False, True)
+                helper.set_frame_range(scene, frames) # update end frame (and range of the shard)
+                scene.render.filepath = os.path.join(output_train, '') # training frames path
+
+                # render scene, or directly finalize the dataset if all frames are already rendered
+                with helper.profile_stage('manifest'): # resumed and cached frames
+                    frames_to_render = self.start_manifest(scene, output_path, replay_camera, frames, replay_output_data['frames'])
+                if len(frames_to_render) > 0:
+                    self.render_animation(len(frames_to_render))
+                else:
+                    helper.post_render(scene)
+
+        # testing frames are rendered right away if no training frames are, or once they are without user interface
+        rendering = scene.train_data and render
+        if helper.test_split is not None and (bpy.app.background or not rendering):
+            helper.render_test_split()
+            rendering = True
+
+        # with user interface, wait until all frames are rendered and the dataset is finalized by the handler function
+        yield from self.wait_for_render(scene)
+        if rendering and helper.render_cancelled:
+            return {'CANCELLED'}
+
+        # if frames are rendered, the below code is executed by the handler function
+        if not rendering:
+            # remove the replay camera
+            helper.close_replay(scene)
+
+            # compress dataset and remove folder (only keep archive), finalized in the background
+            if scene.shard_count == 1: helper.close_archive(scene, output_path)
+            else: helper.close_profile(output_path)
+
+        return {'FINISHED'}
+
+    # replayed poses of the training frames, the replay camera is never evaluated by blender
+    def get_camera_matrices(self, scene, camera, frames):
+        if camera.name != helper.REPLAY_CAMERA_NAME:
+            return super().get_camera_matrices(scene, camera, frames)
+
+        return [self.replay_poses[frame] for frame in frames]
+
+    # the replay camera is removed if created by this run
+    def cancel(self, context):
+        super().cancel(context)
+        helper.close_replay(context.scene)
\ No newline at end of file
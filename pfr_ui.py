@@ -0,0 +1,29 @@
+import bpy
+
+
+# pose file replay ui class
+class PFR_UI(bpy.types.Panel):
+    '''Pose File Replay UI'''
+    bl_idname = 'VIEW3D_PT_pfr_ui'
+    bl_label = 'Pose File Replay PFR'
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'BlenderNeRF'
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+
+        layout.alignment = 'CENTER'
+
+        layout.use_property_split = True
+        layout.prop(scene, 'camera')
+        layout.prop(scene, 'pfr_filepath')
+        layout.prop(scene, 'pfr_intrinsics')
+
+        layout.separator()
+        layout.prop(scene, 'pfr_dataset_name')
+
+        layout.separator()
+        layout.operator('object.pose_file_replay', text='PLAY PFR')
\ No newline at end of file
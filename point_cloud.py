@@ -0,0 +1,171 @@
+import numpy as np
+
+
+# global addon script variables
+PLY_DTYPE = np.dtype([
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+    ('nx', '<f4'), ('ny', '<f4'), ('nz', '<f4'),
+    ('red', 'u1'), ('green', 'u1'), ('blue', 'u1'),
+])
+VOXEL_SEARCH_STEPS = 12
+
+
+# world space vertices, vertex normals, vertex colors and triangles of an evaluated mesh object, None if it is scaled to zero
+def mesh_arrays(obj, depsgraph):
+    if obj.mode == 'EDIT':
+        obj.update_from_editmode() # sync edit mode changes without leaving edit mode
+
+    obj_eval = obj.evaluated_get(depsgraph)
+    matrix = np.array(obj_eval.matrix_world, dtype=np.float64)
+
+    # objects with a zero scale (often hidden or animated away) have no surface, and no inverse transpose for their normals
+    try:
+        normal_matrix = np.linalg.inv(matrix[:3, :3])
+    except np.linalg.LinAlgError:
+        return None
+
+    mesh = obj_eval.to_mesh()
+    try:
+        nb_vertices = len(mesh.vertices)
+        vertices = np.empty(nb_vertices * 3, dtype=np.float32)
+        mesh.vertices.foreach_get('co', vertices)
+        vertices = vertices.reshape(-1, 3)
+
+        normals = np.empty(nb_vertices * 3, dtype=np.float32)
+        if hasattr(mesh, 'vertex_normals'): # blender 3.5+
+            mesh.vertex_normals.foreach_get('vector', normals)
+        else:
+            mesh.vertices.foreach_get('normal', normals)
+        normals = normals.reshape(-1, 3)
+
+        colors = vertex_colors(mesh)
+
+        mesh.calc_loop_triangles()
+        triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get('vertices', triangles)
+        triangles = triangles.reshape(-1, 3)
+    finally:
+        obj_eval.to_mesh_clear()
+
+    # vertices and normals to world space (normals with the inverse transpose)
+    vertices = vertices @ matrix[:3, :3].T + matrix[:3, 3]
+    normals = normals @ normal_matrix
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+
+    return vertices, normals, colors, triangles
+
+# srgb vertex colors (N, 3) in [0, 1] of the active color attribute, white if the mesh has none (as a new blender color layer)
+def vertex_colors(mesh):
+    nb_vertices = len(mesh.vertices)
+    attributes = getattr(mesh, 'color_attributes', None)
+    attribute = attributes.active_color if attributes is not None else None
+    if attribute is None or attribute.domain not in ('POINT', 'CORNER'):
+        return np.ones((nb_vertices, 3), dtype=np.float32)
+
+    colors = np.empty(len(attribute.data) * 4, dtype=np.float32)
+    try:
+        attribute.data.foreach_get('color_srgb', colors)
+    except (AttributeError, TypeError): # blender versions without srgb access
+        attribute.data.foreach_get('color', colors)
+    colors = colors.reshape(-1, 4)[:, :3]
+
+    if attribute.domain == 'POINT':
+        return colors
+
+    # face corner colors averaged per vertex
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_vertices)
+    counts = np.maximum(np.bincount(loop_vertices, minlength=nb_vertices), 1)
+    return np.stack([np.bincount(loop_vertices, weights=colors[:, i], minlength=nb_vertices) / counts for i in range(3)], axis=1)
+
+# points (N, 3), normals (N, 3) and colors (N, 3) of the given mesh objects
+# VERTICES : every vertex, SURFACE : budget points sampled uniformly on the surface, VOXEL : vertices averaged on a voxel grid of at most budget cells
+def sample_points(objects, depsgraph, sampling='VERTICES', budget=0, seed=0):
+    assert sampling == 'VERTICES' or sampling == 'SURFACE' or sampling == 'VOXEL'
+
+    meshes = [mesh_arrays(obj, depsgraph) for obj in objects]
+    meshes = [arrays for arrays in meshes if arrays is not None]
+    if len(meshes) == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3))
+
+    # merge all meshes, with triangle indices offset to the merged vertices
+    offsets = np.cumsum([0] + [len(vertices) for vertices, _, _, _ in meshes])
+    points = np.concatenate([vertices for vertices, _, _, _ in meshes])
+    normals = np.concatenate([normals for _, normals, _, _ in meshes])
+    colors = np.concatenate([colors for _, _, colors, _ in meshes])
+    triangles = np.concatenate([triangles + offset for (_, _, _, triangles), offset in zip(meshes, offsets)])
+
+    if sampling == 'SURFACE' and budget > 0 and len(triangles) > 0:
+        return sample_surface(points, colors, triangles, budget, seed)
+
+    if sampling == 'VOXEL' and 0 < budget < len(points):
+        return voxel_downsample(points, normals, colors, budget)
+
+    return points, normals, colors
+
+# area weighted uniform sampling of points on triangles, with face normals and interpolated colors
+def sample_surface(vertices, colors, triangles, budget, seed=0):
+    a, b, c = (vertices[triangles[:, i]] for i in range(3))
+    cross = np.cross(b - a, c - a)
+    areas = np.linalg.norm(cross, axis=1)
+    if areas.sum() == 0:
+        return vertices, np.zeros_like(vertices), colors
+
+    rng = np.random.default_rng(seed & 0xFFFFFFFF) # numpy seeds must be non negative
+    faces = rng.choice(len(triangles), size=budget, p=areas / areas.sum())
+
+    # uniform barycentric coordinates
+    r1 = np.sqrt(rng.random(budget))[:, None]
+    r2 = rng.random(budget)[:, None]
+    weights = (1 - r1, r1 * (1 - r2), r1 * r2)
+
+    points = sum(w * vertices[triangles[faces, i]] for i, w in enumerate(weights))
+    colors = sum(w * colors[triangles[faces, i]] for i, w in enumerate(weights))
+    normals = cross[faces] / np.maximum(areas[faces, None], 1e-12)
+
+    return points, normals, colors
+
+# average points per voxel, with the smallest voxel size (searched in log scale) leading to at most budget voxels
+def voxel_downsample(points, normals, colors, budget):
+    origin = points.min(axis=0)
+    extent = max(float((points.max(axis=0) - origin).max()), 1e-12)
+
+    def voxelize(size):
+        keys = np.floor((points - origin) / size).astype(np.int64)
+        _, inverse = np.unique(keys, axis=0, return_inverse=True)
+        return inverse.reshape(-1), inverse.max() + 1
+
+    low, high = np.log2(extent) - np.log2(budget), np.log2(extent) # 1 voxel with the highest size
+    inverse, nb_voxels = voxelize(2 ** high)
+    for _ in range(VOXEL_SEARCH_STEPS):
+        middle = (low + high) / 2
+        middle_inverse, middle_nb_voxels = voxelize(2 ** middle)
+        if middle_nb_voxels <= budget:
+            high, inverse, nb_voxels = middle, middle_inverse, middle_nb_voxels
+        else:
+            low = middle
+
+    counts = np.bincount(inverse, minlength=nb_voxels)[:, None]
+    average = lambda values: np.stack([np.bincount(inverse, weights=values[:, i], minlength=nb_voxels) for i in range(3)], axis=1) / counts
+
+    normals = average(normals)
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+
+    return average(points), normals, average(colors)
+
+# binary little endian ply file with positions, normals and 8 bit colors
+def write_ply(filepath, points, normals, colors):
+    vertices = np.empty(len(points), dtype=PLY_DTYPE)
+    for i, axis in enumerate('xyz'):
+        vertices[axis] = points[:, i]
+        vertices['n' + axis] = normals[:, i]
+    for i, channel in enumerate(('red', 'green', 'blue')):
+        vertices[channel] = np.clip(np.round(colors[:, i] * 255), 0, 255)
+
+    header = ['ply', 'format binary_little_endian 1.0', f'element vertex {len(vertices)}']
+    header += [f'property {"float" if PLY_DTYPE[name] == np.float32 else "uchar"} {name}' for name in PLY_DTYPE.names]
+    header += ['end_header']
+
+    with open(filepath, 'wb') as file:
+        file.write(('\n'.join(header) + '\n').encode('ascii'))
+        vertices.tofile(file)
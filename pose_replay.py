@@ -0,0 +1,178 @@
+import os
+import json
+import numpy as np
+
+
+# global addon script variables
+INTRINSICS_KEYS = ('camera_angle_x', 'fl_x', 'fl_y', 'cx', 'cy', 'w', 'h', 'k1', 'k2', 'p1', 'p2')
+DISTORTION_KEYS = ('k1', 'k2', 'p1', 'p2')
+PIXEL_TOLERANCE = 0.5 # pixels, for focal lengths, principal point and resolution
+ANGLE_TOLERANCE = 1e-3 # radians
+DISTORTION_TOLERANCE = 1e-6
+
+# colmap camera model parameters, see colmap/src/colmap/sensor/models.h
+COLMAP_MODELS = {
+    'SIMPLE_PINHOLE': ('f', 'cx', 'cy'),
+    'PINHOLE': ('fx', 'fy', 'cx', 'cy'),
+    'SIMPLE_RADIAL': ('f', 'cx', 'cy', 'k1'),
+    'RADIAL': ('f', 'cx', 'cy', 'k1', 'k2'),
+    'OPENCV': ('fx', 'fy', 'cx', 'cy', 'k1', 'k2', 'p1', 'p2'),
+}
+
+# opencv cameras look along +z with y down, blender cameras along -z with y up
+OPENCV_TO_BLENDER = np.diag([1.0, -1.0, -1.0, 1.0])
+
+
+## pose files
+
+# camera to world matrices (N, 4, 4) in blender camera convention, and the camera intrinsics of the file (None if it has none)
+def load_poses(filepath):
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == '.json':
+        return load_transforms(filepath)
+    if extension == '.txt':
+        return load_colmap(filepath)
+    if extension == '.npy' or extension == '.npz':
+        return load_numpy(filepath), None
+
+    raise ValueError(f'Unsupported pose file {os.path.basename(filepath)}, expected a transforms .json, a COLMAP images.txt or a .npy or .npz file')
+
+# transforms.json file (nerf, instant ngp or nerfstudio), per frame intrinsics must be the same for all frames
+def load_transforms(filepath):
+    with open(filepath, 'r') as file:
+        data = json.load(file)
+
+    frames = data.get('frames', [])
+    matrices = np.array([frame['transform_matrix'] for frame in frames], dtype=np.float64).reshape(-1, 4, 4)
+
+    intrinsics = {key: float(data[key]) for key in INTRINSICS_KEYS if key in data}
+    for frame in frames:
+        for key in INTRINSICS_KEYS:
+            if key not in frame:
+                continue
+            if key in intrinsics and abs(float(frame[key]) - intrinsics[key]) > DISTORTION_TOLERANCE:
+                raise ValueError(f'Frames of {os.path.basename(filepath)} have different {key} values, only a single camera is supported')
+            intrinsics[key] = float(frame[key])
+
+    return matrices, (intrinsics if len(intrinsics) > 0 else None)
+
+# rotation matrix of a unit quaternion in wxyz convention
+def quaternion_to_matrix(qw, qx, qy, qz):
+    norm = np.sqrt(qw * qw + qx * qx + qy * qy + qz * qz)
+    w, x, y, z = qw / norm, qx / norm, qy / norm, qz / norm
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+    ])
+
+# colmap images.txt file (world to camera poses), sorted by image name, with the intrinsics of the cameras.txt file next to it
+def load_colmap(filepath):
+    with open(filepath, 'r') as file:
+        lines = [line.rstrip('\n') for line in file if not line.startswith('#')]
+
+    images = []
+    for line in lines[0::2]: # every image line is followed by a (possibly empty) line of 2d points
+        fields = line.split()
+        if len(fields) < 10:
+            raise ValueError(f'Invalid image line in {os.path.basename(filepath)} : {line}')
+
+        qw, qx, qy, qz, tx, ty, tz = (float(x) for x in fields[1:8])
+        world_to_camera = np.eye(4)
+        world_to_camera[:3, :3] = quaternion_to_matrix(qw, qx, qy, qz)
+        world_to_camera[:3, 3] = (tx, ty, tz)
+        images.append((' '.join(fields[9:]), int(fields[8]), np.linalg.inv(world_to_camera) @ OPENCV_TO_BLENDER))
+
+    images.sort(key=lambda image: image[0])
+    matrices = np.array([matrix for _, _, matrix in images], dtype=np.float64).reshape(-1, 4, 4)
+
+    cameras_path = os.path.join(os.path.dirname(filepath), 'cameras.txt')
+    intrinsics = load_colmap_cameras(cameras_path, {camera_id for _, camera_id, _ in images}) if os.path.isfile(cameras_path) else None
+
+    return matrices, intrinsics
+
+# intrinsics of the colmap cameras used by the replayed images, which must all be the same
+def load_colmap_cameras(filepath, camera_ids):
+    intrinsics = None
+    with open(filepath, 'r') as file:
+        for line in file:
+            fields = line.split()
+            if line.startswith('#') or len(fields) < 4 or int(fields[0]) not in camera_ids:
+                continue
+
+            model = fields[1]
+            if model not in COLMAP_MODELS:
+                raise ValueError(f'COLMAP camera model {model} is not supported')
+
+            params = dict(zip(COLMAP_MODELS[model], (float(x) for x in fields[4:])))
+            camera = {
+                'fl_x': params.get('fx', params.get('f')),
+                'fl_y': params.get('fy', params.get('f')),
+                'cx': params['cx'],
+                'cy': params['cy'],
+                'w': float(fields[2]),
+                'h': float(fields[3]),
+            }
+            camera.update({key: params[key] for key in DISTORTION_KEYS if key in params})
+
+            if intrinsics is not None and intrinsics != camera:
+                raise ValueError('The COLMAP images use different cameras, only a single camera is supported')
+            intrinsics = camera
+
+    return intrinsics
+
+# numpy array of camera to world matrices (N, 4, 4) or (N, 3, 4), or a pose sidecar archive with a transform_matrix array
+def load_numpy(filepath):
+    if filepath.lower().endswith('.npz'):
+        with np.load(filepath) as data:
+            if 'transform_matrix' not in data:
+                raise ValueError(f'{os.path.basename(filepath)} has no transform_matrix array')
+            matrices = np.array(data['transform_matrix'], dtype=np.float64)
+    else:
+        matrices = np.load(filepath).astype(np.float64)
+
+    if matrices.ndim != 3 or matrices.shape[1:] not in ((4, 4), (3, 4)):
+        raise ValueError(f'{os.path.basename(filepath)} must hold an array of shape (N, 4, 4) or (N, 3, 4), not {matrices.shape}')
+
+    if matrices.shape[1] == 3:
+        bottom = np.tile([[[0.0, 0.0, 0.0, 1.0]]], (len(matrices), 1, 1))
+        matrices = np.concatenate([matrices, bottom], axis=1)
+
+    return matrices
+
+
+## intrinsics
+
+# set the focal length of a blender camera (horizontal sensor fit, centered) from replayed intrinsics
+def apply_intrinsics(camera_data, intrinsics):
+    camera_data.sensor_fit = 'HORIZONTAL'
+    camera_data.shift_x = 0.0
+    camera_data.shift_y = 0.0
+
+    if 'fl_x' in intrinsics and 'w' in intrinsics:
+        camera_data.lens = intrinsics['fl_x'] / intrinsics['w'] * camera_data.sensor_width
+    elif 'camera_angle_x' in intrinsics:
+        camera_data.angle_x = intrinsics['camera_angle_x']
+
+# replayed intrinsics which differ from the intrinsics exported for the replay camera, as (key, replayed value, exported value)
+# exported intrinsics have no lens distortion, the principal point at the image center and the render resolution
+# (resolution first, since the other pixel intrinsics depend on it)
+def intrinsics_mismatch(intrinsics, camera_intrinsics):
+    mismatch = []
+    for key in sorted(intrinsics, key=lambda key: key not in ('w', 'h')):
+        value = intrinsics[key]
+        camera_value = camera_intrinsics.get(key, 0.0 if key in DISTORTION_KEYS else None)
+        if camera_value is None:
+            continue
+
+        if key in DISTORTION_KEYS:
+            tolerance = DISTORTION_TOLERANCE
+        elif key == 'camera_angle_x':
+            tolerance = ANGLE_TOLERANCE
+        else:
+            tolerance = PIXEL_TOLERANCE
+
+        if abs(value - camera_value) > tolerance:
+            mismatch.append((key, value, camera_value))
+
+    return mismatch
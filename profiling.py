@@ -0,0 +1,115 @@
+import os
+import csv
+import json
+import time
+import contextlib
+import numpy as np
+
+
+# global addon script variables
+PERCENTILES = (50, 90, 95, 99)
+FRAME_COLUMNS = ['frame', 'render_seconds', 'save_seconds', 'file_size', 'file_path']
+
+
+# summary statistics of a list of values
+def summarize(values):
+    if len(values) == 0:
+        return {}
+
+    values = np.asarray(values, dtype=np.float64)
+    summary = {'mean': float(values.mean()), 'min': float(values.min())}
+    summary.update({f'p{p}': float(value) for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))})
+    summary.update({'max': float(values.max()), 'total': float(values.sum())})
+    return summary
+
+# wall time of the dataset creation stages and of every rendered frame, saved as a json summary and a per frame csv file
+# (profiles without file name only time the run and are never saved)
+class RunProfile:
+    def __init__(self, method, filename='profile.json'):
+        self.method = method
+        self.filename = filename
+        self.start_time = time.perf_counter()
+        self.stages = {} # seconds by stage name, in order of first start
+        self.running = {} # start time of running stages
+        self.frames = {} # file path : [frame, render start, render end, save end, file size], training and testing frames share frame numbers
+
+    def start(self, name):
+        self.stages.setdefault(name, 0.0)
+        self.running[name] = time.perf_counter()
+
+    def stop(self, name):
+        if name in self.running:
+            self.stages[name] += time.perf_counter() - self.running.pop(name)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    # render handlers : before rendering a frame, after rendering and compositing it, and after saving its image
+    def render_pre(self, frame, filepath):
+        self.frames[filepath] = [frame, time.perf_counter(), None, None, None]
+
+    def render_post(self, filepath):
+        if filepath in self.frames:
+            self.frames[filepath][2] = time.perf_counter()
+
+    def render_write(self, filepath):
+        if filepath in self.frames:
+            record = self.frames[filepath]
+            record[3] = time.perf_counter()
+            record[4] = os.path.getsize(filepath) if os.path.isfile(filepath) else None
+
+    # per frame render time, save time and file size, file paths relative to the given directory
+    def frame_rows(self, directory=None):
+        rows = []
+        for filepath, (frame, render_start, render_end, save_end, file_size) in sorted(self.frames.items()):
+            render_seconds = render_end - render_start if render_end is not None else None
+            save_seconds = save_end - render_end if (render_end is not None and save_end is not None) else None
+            if directory is not None:
+                filepath = os.path.relpath(filepath, directory).replace(os.sep, '/')
+            rows.append({'frame': frame, 'render_seconds': render_seconds, 'save_seconds': save_seconds, 'file_size': file_size, 'file_path': filepath})
+        return rows
+
+    # render seconds of the frames written to a directory, in render order
+    def render_times(self, directory):
+        records = [record for filepath, record in self.frames.items() if os.path.dirname(filepath) == os.path.normpath(directory)]
+        return [render_end - render_start for _, render_start, render_end, _, _ in sorted(records, key=lambda record: record[1]) if render_end is not None]
+
+    def summary(self):
+        rows = self.frame_rows()
+        column = lambda name: [row[name] for row in rows if row[name] is not None]
+
+        return {
+            'method': self.method,
+            'total_seconds': time.perf_counter() - self.start_time,
+            'stages': dict(self.stages),
+            'rendered_frames': len(rows),
+            'render_seconds': summarize(column('render_seconds')),
+            'save_seconds': summarize(column('save_seconds')),
+            'file_size': summarize(column('file_size')),
+        }
+
+    # save the json summary and the per frame csv file to a directory (running stages are stopped first), returns their paths
+    def save(self, directory):
+        if self.filename is None:
+            return []
+
+        for name in list(self.running):
+            self.stop(name)
+
+        json_path = os.path.join(directory, self.filename)
+        csv_path = os.path.splitext(json_path)[0] + '.csv'
+
+        with open(json_path, 'w') as file:
+            json.dump(self.summary(), file, indent=4)
+
+        with open(csv_path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=FRAME_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.frame_rows(directory))
+
+        return [json_path, csv_path]
@@ -0,0 +1,75 @@
+import os
+import concurrent.futures
+
+try:
+    import OpenImageIO as oiio # bundled with blender 4.0+
+except ImportError:
+    oiio = None
+
+
+# downscale factors of the pyramid levels : 2, 4, 8, ...
+def level_factors(levels):
+    return [2 ** level for level in range(1, levels + 1)]
+
+# folder of a pyramid level, next to the full resolution folder
+def level_dirname(dirname, factor):
+    return f'{dirname}_{factor}'
+
+def level_size(width, height, factor):
+    return max(1, round(width / factor)), max(1, round(height / factor))
+
+# write downscaled copies of an image, each level resized from the previous one
+def downscale(filepath, outputs):
+    source = oiio.ImageBuf(filepath)
+    spec = source.spec()
+
+    for factor, output_path in outputs:
+        width, height = level_size(spec.width, spec.height, factor)
+        image = oiio.ImageBufAlgo.resize(source, roi=oiio.ROI(0, width, 0, height, 0, 1, 0, spec.nchannels))
+        image.set_write_format(spec.format) # keep the bit depth of the rendered frame
+
+        # written to a temporary file first, such that partial images are never part of the dataset
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        root, extension = os.path.splitext(output_path)
+        tmp_path = root + '.tmp' + extension
+        if not image.write(tmp_path):
+            raise OSError(f'Cannot write {output_path} : {image.geterror()}')
+        os.replace(tmp_path, output_path)
+
+        source = image
+
+# downscaled copies of the training frames, computed on worker threads as frames are written
+# (image decoding, resizing and encoding release the gil)
+class ImagePyramid:
+    def __init__(self, levels, filepaths, workers=None):
+        self.factors = level_factors(levels)
+        self.filepaths = list(filepaths) # all training frames, including frames rendered before (resumed or cached)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers or max(1, (os.cpu_count() or 2) // 2))
+        self.futures = {}
+
+    # file path of every level of a frame, in level order
+    def level_paths(self, filepath):
+        dirname, filename = os.path.split(filepath)
+        return [(factor, os.path.join(level_dirname(dirname, factor), filename)) for factor in self.factors]
+
+    # queue a written frame, its levels are computed as soon as possible
+    def add(self, filepath):
+        self.futures[filepath] = self.executor.submit(downscale, filepath, self.level_paths(filepath))
+
+    # compute the levels missing for frames not written while rendering, and wait for all levels, returns the failed frames
+    # cancelled pyramids only wait for the frames being downscaled
+    def close(self, cancel=False):
+        if not cancel:
+            for filepath in self.filepaths:
+                missing = any(not os.path.isfile(level_path) for _, level_path in self.level_paths(filepath))
+                if filepath not in self.futures and missing and os.path.isfile(filepath) and os.path.getsize(filepath) > 0:
+                    self.add(filepath)
+
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
+
+        failed = []
+        for filepath, future in self.futures.items():
+            if not future.cancelled() and future.exception() is not None:
+                failed.append((filepath, future.exception()))
+
+        return failed
@@ -0,0 +1,139 @@
+import os
+import json
+import shutil
+import hashlib
+import collections
+import bpy
+
+
+# global addon script variables
+EMPTY_NAME = 'BlenderNeRF Sphere'
+
+
+# fingerprint of the saved blender file and of the rendered scene content, only valid without unsaved changes (cameras excluded, their pose is part of each frame key)
+def scene_fingerprint(scene):
+    filepath = bpy.data.filepath
+    objects = []
+    for obj in scene.objects:
+        if obj.hide_render or obj.type == 'CAMERA' or obj.name == EMPTY_NAME:
+            continue
+
+        data = obj.data
+        objects.append([
+            obj.name,
+            obj.type,
+            data.name if data is not None else None,
+            len(data.vertices) if obj.type == 'MESH' else None,
+            [round(x, 6) for row in obj.matrix_world for x in row],
+        ])
+
+    fingerprint = {
+        'file': [filepath, os.path.getmtime(filepath), os.path.getsize(filepath)],
+        'scene': scene.name,
+        'objects': sorted(objects, key=lambda x: x[0]),
+        'materials': sorted(material.name for material in bpy.data.materials),
+        'world': scene.world.name if scene.world is not None else None,
+    }
+
+    return hashlib.sha256(json.dumps(fingerprint).encode('utf-8')).hexdigest()
+
+# local render cache of frames keyed by content, shared across datasets, with least recently used eviction
+class RenderCache:
+    def __init__(self, cache_path, max_size_gb, base_key):
+        os.makedirs(cache_path, exist_ok=True)
+        self.cache_path = cache_path
+        self.max_size = int(max_size_gb * 1024 ** 3)
+        self.base_key = base_key # render settings and scene fingerprint
+        self.keys = {} # frame -> key of the frames being rendered
+
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+        # cached file -> [size, last use time], least recently used first
+        entries = []
+        for root, _, files in os.walk(cache_path):
+            for filename in files:
+                filepath = os.path.join(root, filename)
+                stat = os.stat(filepath)
+                entries.append((filepath, [stat.st_size, stat.st_mtime]))
+        self.entries = collections.OrderedDict(sorted(entries, key=lambda entry: entry[1][1]))
+        self.total_size = sum(size for size, _ in self.entries.values())
+
+    def frame_key(self, frame, matrix):
+        pose = ','.join(format(x, '.6f') for row in matrix for x in row)
+        return hashlib.sha256(f'{self.base_key}/{frame}/{pose}'.encode('utf-8')).hexdigest()
+
+    def cache_filepath(self, key, extension):
+        return os.path.join(self.cache_path, key[:2], key + extension)
+
+    # hard link (or copy) a cached frame to filepath, returns whether the frame was cached
+    def fetch(self, frame, matrix, filepath):
+        key = self.frame_key(frame, matrix)
+        self.keys[frame] = key
+
+        cached = self.cache_filepath(key, os.path.splitext(filepath)[1])
+        if cached not in self.entries or not os.path.isfile(cached):
+            self.misses += 1
+            return False
+
+        try:
+            link_or_copy(cached, filepath)
+        except OSError: # evicted meanwhile by another blender process
+            self.misses += 1
+            return False
+
+        os.utime(cached) # mark as recently used
+        self.entries[cached][1] = os.path.getmtime(cached)
+        self.entries.move_to_end(cached)
+        self.hits += 1
+
+        return True
+
+    # add a rendered frame to the cache
+    def store(self, frame, filepath):
+        if frame not in self.keys or not os.path.isfile(filepath):
+            return
+
+        cached = self.cache_filepath(self.keys[frame], os.path.splitext(filepath)[1])
+        link_or_copy(filepath, cached)
+        if cached in self.entries:
+            self.total_size -= self.entries.pop(cached)[0]
+        self.entries[cached] = [os.path.getsize(cached), os.path.getmtime(cached)]
+        self.total_size += self.entries[cached][0]
+        self.stored += 1
+
+        self.evict()
+
+    # remove least recently used frames until the cache fits its maximum size
+    def evict(self):
+        while self.total_size > self.max_size and len(self.entries) > 0:
+            cached, (size, _) = self.entries.popitem(last=False)
+            self.total_size -= size
+            if os.path.isfile(cached):
+                os.remove(cached)
+            self.evicted += 1
+
+    def stats(self):
+        return {
+            'Cache Hits': self.hits,
+            'Cache Misses': self.misses,
+            'Cache Stored': self.stored,
+            'Cache Evicted': self.evicted,
+            'Cache Size': f'{self.total_size / 1024 ** 3:.3f} GB',
+        }
+
+# hard link a file, or copy it when linking is not possible (e.g. across file systems)
+def link_or_copy(source, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    tmp_destination = destination + '.tmp'
+    if os.path.exists(tmp_destination):
+        os.remove(tmp_destination)
+
+    try:
+        os.link(source, tmp_destination)
+    except OSError:
+        shutil.copy2(source, tmp_destination)
+
+    os.replace(tmp_destination, destination)
@@ -0,0 +1,121 @@
+import os
+
+
+# global addon script variables
+NODE_PREFIX = 'BlenderNeRF '
+PASSES = ['DEPTH', 'NORMAL', 'MASK']
+FRAME_KEYS = [f'{pass_name.lower()}_file_path' for pass_name in PASSES]
+PNG_DEPTH_LEVELS = 2 ** 16 - 1
+
+
+# folder of a pass next to the frames folder, one multilayer exr folder for all passes
+def pass_dirname(dirname, pass_name, file_format='PNG'):
+    return f'{dirname}_passes' if file_format == 'EXR' else f'{dirname}_{pass_name.lower()}'
+
+# transforms entries of the passes of a frame, as written by the compositor
+def frame_entries(frame, passes, file_format='PNG', dirname='train'):
+    extension = '.exr' if file_format == 'EXR' else '.png'
+    return {f'{pass_name.lower()}_file_path': os.path.join(pass_dirname(dirname, pass_name, file_format), f'{frame:04d}{extension}') for pass_name in PASSES if pass_name in passes}
+
+# output file node slots of the passes, written with raw values
+def add_slot(node, path, file_format, color_mode):
+    if file_format == 'EXR':
+        node.layer_slots.new(path)
+        return
+
+    node.file_slots.new(path)
+    slot = node.file_slots[-1]
+    slot.use_node_format = False
+    slot.format.file_format = 'PNG'
+    slot.format.color_depth = '16'
+    slot.format.color_mode = color_mode
+    slot.format.color_management = 'OVERRIDE'
+    slot.format.view_settings.view_transform = 'Raw'
+
+# compositor nodes writing the selected passes of every rendered frame next to the frames folder, returns the settings to restore
+# png depth is divided by depth_max, png normals are mapped from [-1, 1] to [0, 1]
+def setup(scene, view_layer, output_path, passes, file_format='PNG', depth_max=10.0, dirname='train'):
+    state = {
+        'use_nodes': scene.use_nodes,
+        'use_compositing': scene.render.use_compositing,
+        'view_layer': view_layer.name,
+        'use_pass_z': view_layer.use_pass_z,
+        'use_pass_normal': view_layer.use_pass_normal,
+        'nodes': [],
+    }
+
+    scene.use_nodes = True
+    scene.render.use_compositing = True
+    view_layer.use_pass_z = view_layer.use_pass_z or 'DEPTH' in passes
+    view_layer.use_pass_normal = view_layer.use_pass_normal or 'NORMAL' in passes
+
+    tree = scene.node_tree
+    links = tree.links
+
+    def new_node(node_type, name):
+        node = tree.nodes.new(node_type)
+        node.name = NODE_PREFIX + name
+        state['nodes'].append(node.name)
+        return node
+
+    # existing render layers and composite nodes are reused, such that the rendered frames are unchanged
+    render_layers = next((node for node in tree.nodes if node.type == 'R_LAYERS' and node.layer == view_layer.name), None)
+    if render_layers is None:
+        render_layers = new_node('CompositorNodeRLayers', 'Render Layers')
+        render_layers.layer = view_layer.name
+
+    if not any(node.type == 'COMPOSITE' for node in tree.nodes):
+        composite = new_node('CompositorNodeComposite', 'Composite')
+        links.new(render_layers.outputs['Image'], composite.inputs['Image'])
+
+    output = new_node('CompositorNodeOutputFile', 'Passes')
+    if file_format == 'EXR':
+        output.base_path = os.path.join(output_path, pass_dirname(dirname, None, 'EXR'), '')
+        output.format.file_format = 'OPEN_EXR_MULTILAYER'
+        output.format.color_depth = '32'
+        output.layer_slots.clear()
+    else:
+        output.base_path = output_path
+        output.file_slots.clear()
+
+    depth_socket = render_layers.outputs.get('Depth') or render_layers.outputs.get('Z')
+
+    for pass_name in [pass_name for pass_name in PASSES if pass_name in passes]:
+        path = pass_name.lower() if file_format == 'EXR' else os.path.join(pass_dirname(dirname, pass_name), '')
+        socket = {'DEPTH': depth_socket, 'NORMAL': render_layers.outputs['Normal'], 'MASK': render_layers.outputs['Alpha']}[pass_name]
+
+        if file_format == 'PNG' and pass_name == 'DEPTH':
+            divide = new_node('CompositorNodeMath', 'Depth Scale')
+            divide.operation = 'DIVIDE'
+            divide.inputs[1].default_value = depth_max
+            links.new(socket, divide.inputs[0])
+            socket = divide.outputs[0]
+
+        if file_format == 'PNG' and pass_name == 'NORMAL':
+            for operation in ('MULTIPLY', 'ADD'):
+                mix = new_node('CompositorNodeMixRGB', f'Normal {operation.title()}')
+                mix.blend_type = operation
+                mix.inputs[2].default_value = (0.5, 0.5, 0.5, 1.0)
+                links.new(socket, mix.inputs[1])
+                socket = mix.outputs[0]
+
+        add_slot(output, path, file_format, 'RGB' if pass_name == 'NORMAL' else 'BW')
+        links.new(socket, output.inputs[-1])
+
+    return state
+
+# remove the added compositor nodes and restore the scene settings
+def restore(scene, state):
+    tree = scene.node_tree
+    if tree is not None:
+        for name in state['nodes']:
+            if name in tree.nodes:
+                tree.nodes.remove(tree.nodes[name])
+
+    view_layer = scene.view_layers.get(state['view_layer'])
+    if view_layer is not None:
+        view_layer.use_pass_z = state['use_pass_z']
+        view_layer.use_pass_normal = state['use_pass_normal']
+
+    scene.render.use_compositing = state['use_compositing']
+    scene.use_nodes = state['use_nodes']
@@ -1,7 +1,6 @@
 import os
-import shutil
 import bpy
-from . import blender_nerf_operator
+from . import helper, blender_nerf_operator
 
 
 # subset of frames operator class
@@ -10,20 +9,21 @@ class SubsetOfFrames(blender_nerf_operator.BlenderNeRF_Operator):
     bl_idname = 'object.subset_of_frames'
     bl_label = 'Subset of Frames SOF'
 
-    def execute(self, context):
+    # dataset creation stages, see BlenderNeRF_Operator.execute and invoke
+    def run(self, context):
         scene = context.scene
         camera = scene.camera
 
         # check if camera is selected : next errors depend on an existing camera
         if camera == None:
             self.report({'ERROR'}, 'Be sure to have a selected camera!')
-            return {'FINISHED'}
+            return {'CANCELLED'}
 
         # if there is an error, print first error message
         error_messages = self.asserts(scene, method='SOF')
         if len(error_messages) > 0:
            self.report({'ERROR'}, error_messages[0])
-           return {'FINISHED'}
+           return {'CANCELLED'}
 
         output_data = self.get_camera_intrinsics(scene, camera)
 
@@ -31,37 +31,63 @@ class SubsetOfFrames(blender_nerf_operator.BlenderNeRF_Operator):
         output_dir = bpy.path.clean_name(scene.sof_dataset_name)
         output_path = os.path.join(scene.save_path, output_dir)
         os.makedirs(output_path, exist_ok=True)
+        if scene.shard_count == 1: helper.open_archive(scene, output_path)
+        self.start_profile(scene, method='SOF')
 
-        if scene.logs: self.save_log_file(scene, output_path, method='SOF')
-        if scene.splats: self.save_splats_ply(scene, output_path)
+        # shared dataset files are only saved by the first shard
+        first_shard = (scene.shard_index == 0)
+        if scene.logs and first_shard: self.save_log_file(scene, output_path, method='SOF')
+        if scene.splats and first_shard: yield from self.save_splats_ply(scene, output_path)
 
         # initial properties might have changed since set_init_props update
-        scene.init_frame_step = scene.frame_step
         scene.init_output_path = scene.render.filepath
 
-        if scene.test_data:
+        if scene.test_data and first_shard:
             # testing transforms
+            yield 'Test camera poses'
             output_data['frames'] = self.get_camera_extrinsics(scene, camera, mode='TEST', method='SOF')
-            self.save_json(output_path, 'transforms_test.json', output_data)
+            yield from self.in_worker('Saving test transforms', self.save_transforms, self.transforms_settings(scene), output_path, 'transforms_test.json', output_data)
+            self.queue_test_frames(scene, output_path, camera, method='SOF')
 
         if scene.train_data:
             # training transforms
+            yield 'Training camera poses'
             output_data['frames'] = self.get_camera_extrinsics(scene, camera, mode='TRAIN', method='SOF')
-            self.save_json(output_path, 'transforms_train.json', output_data)
+            yield from self.in_worker('Saving training transforms', self.save_transforms, self.transforms_settings(scene), output_path, 'transforms_train.json', output_data)
 
             # rendering
-            if scene.render_frames:
+            frames = self.get_frames(scene, mode='TRAIN', method='SOF')
+            render = scene.render_frames and len(frames) > 0
+            if render:
                 output_train = os.path.join(output_path, 'train')
                 os.makedirs(output_train, exist_ok=True)
-                scene.rendering = (True, False, False)
-                scene.frame_step = scene.train_frame_steps # update frame step
+                scene.rendering = (True, False, False, False)
+                helper.set_frame_range(scene, frames) # update frame step (and range of the shard)
                 scene.render.filepath = os.path.join(output_train, '') # training frames path
-                bpy.ops.render.render('INVOKE_DEFAULT', animation=True, write_still=True) # render scene
+
+                # render scene, or directly finalize the dataset if all frames are already rendered
+                with helper.profile_stage('manifest'): # resumed and cached frames
+                    frames_to_render = self.start_manifest(scene, output_path, camera, frames, output_data['frames'])
+                if len(frames_to_render) > 0:
+                    self.render_animation(len(frames_to_render))
+                else:
+                    helper.post_render(scene)
+
+        # testing frames are rendered right away if no training frames are, or once they are without user interface
+        rendering = scene.train_data and render
+        if helper.test_split is not None and (bpy.app.background or not rendering):
+            helper.render_test_split()
+            rendering = True
+
+        # with user interface, wait until all frames are rendered and the dataset is finalized by the handler function
+        yield from self.wait_for_render(scene)
+        if rendering and helper.render_cancelled:
+            return {'CANCELLED'}
 
         # if frames are rendered, the below code is executed by the handler function
-        if not any(scene.rendering):
-            # compress dataset and remove folder (only keep zip)
-            shutil.make_archive(output_path, 'zip', output_path) # output filename = output_path
-            shutil.rmtree(output_path)
+        if not rendering:
+            # compress dataset and remove folder (only keep archive), finalized in the background
+            if scene.shard_count == 1: helper.close_archive(scene, output_path)
+            else: helper.close_profile(output_path)
 
         return {'FINISHED'}
\ No newline at end of file
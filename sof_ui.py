@@ -17,7 +17,12 @@ class SOF_UI(bpy.types.Panel):
 
         layout.alignment = 'CENTER'
 
-        layout.prop(scene, 'train_frame_steps')
+        layout.prop(scene, 'sof_selection', expand=True)
+        if scene.sof_selection == 'STEP':
+            layout.prop(scene, 'train_frame_steps')
+        else:
+            layout.prop(scene, 'sof_nb_frames')
+            layout.prop(scene, 'sof_min_distance')
 
         layout.use_property_split = True
         layout.prop(scene, 'camera')
@@ -0,0 +1,30 @@
+# tests of the BlenderNeRF add-on code, driven by the bpy and mathutils stand-in of the benchmarks (see benchmarks/fake_blender.py)
+#
+#   python -m pytest tests
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import fake_blender
+
+# installed on collection, since pytest also imports the add-on folder (a python package importing bpy) before running tests
+ADDON = fake_blender.load_addon()
+
+
+@pytest.fixture(scope='session')
+def addon():
+    return ADDON
+
+# empty scene, with the frame change handlers restored afterwards
+@pytest.fixture
+def scene(addon, tmp_path):
+    handlers = fake_blender.app.handlers
+    frame_change = (list(handlers.frame_change_pre), list(handlers.frame_change_post))
+
+    scene = fake_blender.new_scene()
+    scene.save_path = str(tmp_path)
+    yield scene
+
+    handlers.frame_change_pre[:], handlers.frame_change_post[:] = frame_change
\ No newline at end of file
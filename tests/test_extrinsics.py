@@ -0,0 +1,222 @@
+import math
+import types
+import numpy as np
+import pytest
+from benchmarks import fake_blender
+
+
+# global variables
+NB_FRAMES = 24
+TOLERANCE = 1e-5 # batched camera matrices against frame_set matrices, both float32 values
+EULER_ORDERS = ['XYZ', 'XZY', 'YXZ', 'YZX', 'ZXY', 'ZYX']
+
+
+## scenes
+
+# fcurves keyframed every 5 frames with smooth values, one per array index of the given channel
+def fcurves(data_path, values):
+    keyframes = range(1, NB_FRAMES + 6, 5)
+    return [fake_blender.FCurve(data_path, index, [(frame, value(frame)) for frame in keyframes]) for index, value in enumerate(values)]
+
+def animated_camera(scene, name='Camera'):
+    camera = fake_blender.add_camera(scene, name, location=(0.0, -8.0, 2.0), rotation=(1.3, 0.0, 0.0))
+    camera.animate(fcurves('location', [lambda f: 8 * math.sin(f / 7), lambda f: -8 * math.cos(f / 7), lambda f: 2 + f / 10]))
+    scene.camera = camera
+    return camera
+
+def add_fcurves(obj, curves):
+    obj.animation_data.action.fcurves += curves
+
+# batched camera matrices, which must equal the matrices read after setting every frame
+def assert_batch_parity(addon, scene, camera, frames=None):
+    frames = list(range(1, NB_FRAMES + 1)) if frames is None else frames
+    operator = addon.sof_operator.SubsetOfFrames()
+    assert addon.extrinsics.can_batch_evaluate(scene, camera)
+
+    batch = np.array(operator.get_camera_matrices(scene, camera, frames), dtype=np.float64)
+    per_frame = np.array(operator.get_camera_matrices_per_frame(scene, camera, frames), dtype=np.float64)
+    assert batch.shape == per_frame.shape == (len(frames), 4, 4)
+    assert np.abs(batch - per_frame).max() <= TOLERANCE
+    assert np.abs(per_frame - per_frame[0]).max() > 0.1 # animated camera
+
+@pytest.fixture
+def scene(scene):
+    scene.frame_end = NB_FRAMES
+    return scene
+
+
+## batched evaluation
+
+@pytest.mark.parametrize('order', EULER_ORDERS)
+def test_euler_orders(addon, scene, order):
+    camera = animated_camera(scene)
+    camera.rotation_mode = order
+    camera.delta_rotation_euler = (0.3, -0.2, 0.5)
+    add_fcurves(camera, fcurves('rotation_euler', [lambda f: 1.3 + f / 20, lambda f: 0.4 * math.sin(f / 5), lambda f: f / 9]))
+
+    assert_batch_parity(addon, scene, camera)
+
+def test_quaternion(addon, scene):
+    camera = animated_camera(scene)
+    camera.rotation_mode = 'QUATERNION'
+    camera.delta_rotation_quaternion = (0.9, 0.1, -0.2, 0.3) # normalized by blender, as the animated quaternions
+    add_fcurves(camera, fcurves('rotation_quaternion', [lambda f: 2 * math.cos(f / 10), lambda f: 2 * math.sin(f / 10), lambda f: 0.5, lambda f: f / 30]))
+
+    assert_batch_parity(addon, scene, camera)
+
+def test_axis_angle(addon, scene):
+    camera = animated_camera(scene)
+    camera.rotation_mode = 'AXIS_ANGLE'
+    camera.delta_rotation_euler = (0.3, -0.2, 0.5) # unused by axis angles
+    add_fcurves(camera, fcurves('rotation_axis_angle', [lambda f: f / 6, lambda f: 1.0, lambda f: math.sin(f / 4), lambda f: 2.0]))
+
+    assert_batch_parity(addon, scene, camera)
+
+def test_delta_transforms(addon, scene):
+    camera = animated_camera(scene)
+    camera.rotation_mode = 'YZX'
+    camera.delta_location = (0.5, 0.0, -1.0)
+    camera.delta_scale = (1.0, 2.0, 0.5)
+    add_fcurves(camera, fcurves('delta_rotation_euler', [lambda f: f / 15, lambda f: -f / 25, lambda f: 0.2]))
+    add_fcurves(camera, fcurves('scale', [lambda f: 1 + f / 20, lambda f: 1.0, lambda f: 2 - f / 30]))
+
+    assert_batch_parity(addon, scene, camera)
+
+def test_parents(addon, scene):
+    camera = animated_camera(scene)
+    parent = fake_blender.add_empty(scene, 'Parent')
+    grandparent = fake_blender.add_empty(scene, 'Grandparent')
+
+    grandparent.rotation_mode = 'QUATERNION'
+    grandparent.location = (1.0, 2.0, 3.0)
+    grandparent.animate(fcurves('rotation_quaternion', [lambda f: math.cos(f / 12), lambda f: 0.0, lambda f: 0.0, lambda f: math.sin(f / 12)]))
+
+    parent.parent = grandparent
+    parent.scale = (2.0, 2.0, 2.0)
+    parent.matrix_parent_inverse = np.linalg.inv(grandparent.matrix_world) # parented at frame 1
+    parent.animate(fcurves('rotation_euler', [lambda f: 0.1, lambda f: f / 30, lambda f: 0.0]))
+
+    camera.parent = parent
+    camera.matrix_parent_inverse = np.linalg.inv(parent.matrix_world)
+
+    assert_batch_parity(addon, scene, camera)
+
+@pytest.mark.parametrize('track_axis, up_axis', [
+    ('TRACK_NEGATIVE_Z', 'UP_Y'), ('TRACK_Z', 'UP_Y'), ('TRACK_X', 'UP_Z'), ('TRACK_NEGATIVE_Y', 'UP_X'), ('TRACK_Y', 'UP_Z'), ('TRACK_Z', 'UP_Z'),
+])
+@pytest.mark.parametrize('use_target_z', [False, True])
+def test_track_to(addon, scene, track_axis, up_axis, use_target_z):
+    camera = animated_camera(scene)
+    camera.scale = (1.0, 1.5, 0.5)
+    target = fake_blender.add_empty(scene, 'Target')
+    target.animate(fcurves('location', [lambda f: 0.0, lambda f: f / 10, lambda f: 0.5]) + fcurves('rotation_euler', [lambda f: f / 20, lambda f: 0.3, lambda f: 0.0]))
+
+    constraint = camera.constraints.new('TRACK_TO')
+    constraint.target = target
+    constraint.track_axis = track_axis
+    constraint.up_axis = up_axis
+    constraint.use_target_z = use_target_z
+
+    assert_batch_parity(addon, scene, camera)
+
+def test_inactive_constraints(addon, scene):
+    camera = animated_camera(scene)
+    target = fake_blender.add_empty(scene, 'Target')
+    camera.constraints.new('COPY_LOCATION').mute = True
+    camera.constraints.new('DAMPED_TRACK').influence = 0.0
+    camera.constraints.new('TRACK_TO').target = target
+
+    assert_batch_parity(addon, scene, camera)
+
+@pytest.mark.parametrize('sampling', ['RANDOM', 'FIBONACCI', 'POISSON'])
+@pytest.mark.parametrize('outwards', [False, True])
+def test_camera_on_sphere(addon, scene, sampling, outwards):
+    scene.sphere_location = (1.0, -2.0, 0.5)
+    scene.sphere_rotation = (0.2, 0.1, 0.4)
+    scene.sphere_scale = (1.0, 2.0, 0.5)
+    scene.sphere_sampling = sampling
+    scene.cos_nb_frames = NB_FRAMES
+    scene.outwards = outwards
+    scene.show_sphere = True
+    scene.show_camera = True # blendernerf camera moved by its frame change handler, with a track to constraint on the sphere
+
+    camera = scene.objects[addon.helper.CAMERA_NAME]
+    assert camera.constraints['Track To'].track_axis == ('TRACK_Z' if outwards else 'TRACK_NEGATIVE_Z')
+    assert addon.helper.cos_camera_update in fake_blender.app.handlers.frame_change_post
+
+    frames = addon.cos_operator.CameraOnSphere().get_frames(scene, mode='TRAIN', method='COS')
+    assert_batch_parity(addon, scene, camera, frames)
+
+
+## frame_set fallbacks
+
+def frame_remapping(scene, camera):
+    scene.render.frame_map_new = 200
+
+def foreign_handler(scene, camera):
+    fake_blender.app.handlers.frame_change_post.append(lambda scene: None)
+
+def drivers(scene, camera):
+    camera.animation_data.drivers.append(fcurves('location', [lambda f: 0.0])[0])
+
+def nla_tracks(scene, camera):
+    camera.animation_data.nla_tracks.append(types.SimpleNamespace(mute=False))
+
+def tweak_mode(scene, camera):
+    camera.animation_data.use_tweak_mode = True
+
+def action_influence(scene, camera):
+    camera.animation_data.action_influence = 0.5
+
+def rigid_body(scene, camera):
+    camera.rigid_body = types.SimpleNamespace(type='ACTIVE')
+
+def foreign_constraint(scene, camera):
+    camera.constraints.new('COPY_LOCATION').target = fake_blender.add_empty(scene, 'Target')
+
+def partial_influence(scene, camera):
+    constraint = camera.constraints.new('TRACK_TO')
+    constraint.target = fake_blender.add_empty(scene, 'Target')
+    constraint.influence = 0.5
+
+def local_space_constraint(scene, camera):
+    constraint = camera.constraints.new('TRACK_TO')
+    constraint.target = fake_blender.add_empty(scene, 'Target')
+    constraint.owner_space = 'LOCAL'
+
+def two_constraints(scene, camera):
+    for name in ('Target', 'Other Target'):
+        camera.constraints.new('TRACK_TO').target = fake_blender.add_empty(scene, name)
+
+def animated_parent_driver(scene, camera):
+    parent = fake_blender.add_empty(scene, 'Parent')
+    parent.animate([])
+    parent.animation_data.drivers.append(fcurves('location', [lambda f: 0.0])[0])
+    camera.parent = parent
+
+def bone_parent(scene, camera):
+    camera.parent = fake_blender.add_empty(scene, 'Armature')
+    camera.parent_type = 'BONE'
+
+def curve_path(scene, camera):
+    curve = scene.link(fake_blender.Object('Curve', type='CURVE', data=types.SimpleNamespace(use_path=True)))
+    camera.parent = curve
+
+def cyclic_constraints(scene, camera):
+    target = fake_blender.add_empty(scene, 'Target')
+    camera.constraints.new('TRACK_TO').target = target
+    target.constraints.new('TRACK_TO').target = camera
+
+def sphere_camera_parent(scene, camera):
+    camera.parent = fake_blender.add_empty(scene, 'BlenderNeRF Camera')
+
+@pytest.mark.parametrize('setup', [
+    frame_remapping, foreign_handler, drivers, nla_tracks, tweak_mode, action_influence, rigid_body, foreign_constraint, partial_influence,
+    local_space_constraint, two_constraints, animated_parent_driver, bone_parent, curve_path, cyclic_constraints, sphere_camera_parent,
+], ids=lambda setup: setup.__name__)
+def test_fallbacks(addon, scene, setup):
+    camera = animated_camera(scene)
+    assert addon.extrinsics.can_batch_evaluate(scene, camera)
+
+    setup(scene, camera)
+    assert not addon.extrinsics.can_batch_evaluate(scene, camera)
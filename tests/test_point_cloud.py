@@ -0,0 +1,22 @@
+import numpy as np
+from benchmarks import fake_blender
+
+
+def test_zero_scale_objects_are_skipped(addon, scene):
+    visible = fake_blender.add_grid_mesh(scene, 'Visible', 16)
+    hidden = fake_blender.add_grid_mesh(scene, 'Hidden', 16)
+    hidden.location = (5.0, 0.0, 0.0)
+    hidden.scale = (0.0, 0.0, 0.0)
+
+    points, normals, colors = addon.point_cloud.sample_points([visible, hidden], None)
+    assert len(points) == len(visible.data.vertices)
+    assert np.allclose(normals, [0.0, 0.0, 1.0])
+
+    points, normals, colors = addon.point_cloud.sample_points([hidden], None, sampling='SURFACE', budget=100)
+    assert points.shape == normals.shape == colors.shape == (0, 3)
+
+def test_flat_objects_are_skipped(addon, scene):
+    flat = fake_blender.add_grid_mesh(scene, 'Flat', 16)
+    flat.scale = (1.0, 1.0, 0.0)
+
+    assert addon.point_cloud.mesh_arrays(flat, None) is None
\ No newline at end of file
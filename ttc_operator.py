@@ -1,7 +1,6 @@
 import os
-import shutil
 import bpy
-from . import blender_nerf_operator
+from . import helper, blender_nerf_operator
 
 
 # train and test cameras operator class
@@ -10,7 +9,8 @@ class TrainTestCameras(blender_nerf_operator.BlenderNeRF_Operator):
     bl_idname = 'object.train_test_cameras'
     bl_label = 'Train and Test Cameras TTC'
 
-    def execute(self, context):
+    # dataset creation stages, see BlenderNeRF_Operator.execute and invoke
+    def run(self, context):
         scene = context.scene
         train_camera = scene.camera_train_target
         test_camera = scene.camera_test_target
@@ -18,13 +18,13 @@ class TrainTestCameras(blender_nerf_operator.BlenderNeRF_Operator):
         # check if cameras are selected : next errors depend on existing cameras
         if train_camera == None or test_camera == None:
             self.report({'ERROR'}, 'Be sure to have selected a train and test camera!')
-            return {'FINISHED'}
+            return {'CANCELLED'}
 
         # if there is an error, print first error message
         error_messages = self.asserts(scene, method='TTC')
         if len(error_messages) > 0:
            self.report({'ERROR'}, error_messages[0])
-           return {'FINISHED'}
+           return {'CANCELLED'}
 
         output_train_data = self.get_camera_intrinsics(scene, train_camera)
         output_test_data = self.get_camera_intrinsics(scene, test_camera)
@@ -33,37 +33,63 @@ class TrainTestCameras(blender_nerf_operator.BlenderNeRF_Operator):
         output_dir = bpy.path.clean_name(scene.ttc_dataset_name)
         output_path = os.path.join(scene.save_path, output_dir)
         os.makedirs(output_path, exist_ok=True)
+        if scene.shard_count == 1: helper.open_archive(scene, output_path)
+        self.start_profile(scene, method='TTC')
 
-        if scene.logs: self.save_log_file(scene, output_path, method='TTC')
-        if scene.splats: self.save_splats_ply(scene, output_path)
+        # shared dataset files are only saved by the first shard
+        first_shard = (scene.shard_index == 0)
+        if scene.logs and first_shard: self.save_log_file(scene, output_path, method='TTC')
+        if scene.splats and first_shard: yield from self.save_splats_ply(scene, output_path)
 
         # initial properties might have changed since set_init_props update
         scene.init_output_path = scene.render.filepath
-        scene.init_frame_end = scene.frame_end
 
-        if scene.test_data:
+        if scene.test_data and first_shard:
             # testing transforms
+            yield 'Test camera poses'
             output_test_data['frames'] = self.get_camera_extrinsics(scene, test_camera, mode='TEST', method='TTC')
-            self.save_json(output_path, 'transforms_test.json', output_test_data)
+            yield from self.in_worker('Saving test transforms', self.save_transforms, self.transforms_settings(scene), output_path, 'transforms_test.json', output_test_data)
+            self.queue_test_frames(scene, output_path, test_camera, method='TTC')
 
         if scene.train_data:
             # training transforms
+            yield 'Training camera poses'
             output_train_data['frames'] = self.get_camera_extrinsics(scene, train_camera, mode='TRAIN', method='TTC')
-            self.save_json(output_path, 'transforms_train.json', output_train_data)
+            yield from self.in_worker('Saving training transforms', self.save_transforms, self.transforms_settings(scene), output_path, 'transforms_train.json', output_train_data)
 
             # rendering
-            if scene.render_frames:
+            frames = self.get_frames(scene, mode='TRAIN', method='TTC')
+            render = scene.render_frames and len(frames) > 0
+            if render:
                 output_train = os.path.join(output_path, 'train')
                 os.makedirs(output_train, exist_ok=True)
-                scene.rendering = (False, True, False)
-                scene.frame_end = scene.frame_start + scene.ttc_nb_frames - 1 # update end frame
+                scene.rendering = (False, True, False, False)
+                helper.set_frame_range(scene, frames) # update end frame (and range of the shard)
                 scene.render.filepath = os.path.join(output_train, '') # training frames path
-                bpy.ops.render.render('INVOKE_DEFAULT', animation=True, write_still=True) # render scene
+
+                # render scene, or directly finalize the dataset if all frames are already rendered
+                with helper.profile_stage('manifest'): # resumed and cached frames
+                    frames_to_render = self.start_manifest(scene, output_path, train_camera, frames, output_train_data['frames'])
+                if len(frames_to_render) > 0:
+                    self.render_animation(len(frames_to_render))
+                else:
+                    helper.post_render(scene)
+
+        # testing frames are rendered right away if no training frames are, or once they are without user interface
+        rendering = scene.train_data and render
+        if helper.test_split is not None and (bpy.app.background or not rendering):
+            helper.render_test_split()
+            rendering = True
+
+        # with user interface, wait until all frames are rendered and the dataset is finalized by the handler function
+        yield from self.wait_for_render(scene)
+        if rendering and helper.render_cancelled:
+            return {'CANCELLED'}
 
         # if frames are rendered, the below code is executed by the handler function
-        if not any(scene.rendering):
-            # compress dataset and remove folder (only keep zip)
-            shutil.make_archive(output_path, 'zip', output_path) # output filename = output_path
-            shutil.rmtree(output_path)
+        if not rendering:
+            # compress dataset and remove folder (only keep archive), finalized in the background
+            if scene.shard_count == 1: helper.close_archive(scene, output_path)
+            else: helper.close_profile(output_path)
 
         return {'FINISHED'}
\ No newline at end of file
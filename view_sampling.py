@@ -0,0 +1,135 @@
+import math
+import random
+import functools
+import numpy as np
+
+
+# global addon script variables
+GOLDEN_RATIO = (1 + math.sqrt(5)) / 2
+SOBOL_BITS = 32
+POISSON_CANDIDATES = 32
+POISSON_DENSITY = 0.5 # fraction of the sphere area covered by the disks around the views, for the automatic minimum angle
+
+
+# unit directions (N, 3) from uniform coordinates in [0, 1)^2 : longitude and area preserving height (upper hemisphere : z in [0, 1])
+def uv_to_directions(u, v, upper_views=False):
+    theta = 2 * math.pi * u
+    z = 1 - v if upper_views else 1 - 2 * v
+    r = np.sqrt(np.clip(1 - z * z, 0, 1))
+    return np.stack([r * np.cos(theta), r * np.sin(theta), z], axis=1)
+
+# unit directions (N, 3) of all views of a sampling mode, cached since shared by all frames
+@functools.lru_cache(maxsize=16)
+def unit_directions(sampling, nb_points, seed, upper_views=False, min_angle=0.0):
+    assert sampling == 'FIBONACCI' or sampling == 'HALTON' or sampling == 'SOBOL' or sampling == 'POISSON'
+
+    if sampling == 'POISSON':
+        directions = poisson_directions(nb_points, seed, upper_views, min_angle)
+    else:
+        samplers = {'FIBONACCI': fibonacci, 'HALTON': halton, 'SOBOL': sobol}
+        u, v = samplers[sampling](nb_points, seed)
+        directions = uv_to_directions(u, v, upper_views)
+
+    directions.setflags(write=False)
+    return directions
+
+# fibonacci lattice, rotated around the z axis by the seed
+def fibonacci(nb_points, seed):
+    offset = random.Random(seed).random()
+    indices = np.arange(nb_points)
+    u = (indices / GOLDEN_RATIO + offset) % 1
+    v = (indices + 0.5) / nb_points
+    return u, v
+
+# radical inverse of integers in a given base (van der corput sequence)
+def radical_inverse(indices, base):
+    indices = indices.copy()
+    result = np.zeros(len(indices))
+    factor = 1 / base
+    while np.any(indices > 0):
+        result += factor * (indices % base)
+        indices //= base
+        factor /= base
+    return result
+
+# halton sequence in bases 2 and 3, randomly shifted by the seed (cranley patterson rotation)
+def halton(nb_points, seed):
+    rng = random.Random(seed)
+    indices = np.arange(1, nb_points + 1)
+    u = (radical_inverse(indices, 2) + rng.random()) % 1
+    v = (radical_inverse(indices, 3) + rng.random()) % 1
+    return u, v
+
+# first two dimensions of the sobol sequence, scrambled by a random digital shift from the seed
+def sobol(nb_points, seed):
+    # direction numbers : van der corput for the first dimension, primitive polynomial x + 1 for the second one
+    m = [1]
+    for _ in range(SOBOL_BITS - 1):
+        m.append((m[-1] << 1) ^ m[-1])
+    directions = [
+        [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)],
+        [m[k] << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)],
+    ]
+
+    rng = random.Random(seed)
+    indices = np.arange(nb_points, dtype=np.uint64)
+    coordinates = []
+    for dimension in directions:
+        x = np.full(nb_points, rng.getrandbits(SOBOL_BITS), dtype=np.uint64) # digital shift
+        for k, direction in enumerate(dimension):
+            x ^= ((indices >> np.uint64(k)) & np.uint64(1)) * np.uint64(direction)
+        coordinates.append(x / float(1 << SOBOL_BITS))
+
+    return coordinates[0], coordinates[1]
+
+# blue noise directions : random candidates further than min_angle (radians, 0 for automatic) from all previous views,
+# or the furthest candidate if none is
+def poisson_directions(nb_points, seed, upper_views=False, min_angle=0.0):
+    if min_angle <= 0:
+        area = 2 * math.pi if upper_views else 4 * math.pi
+        min_angle = 2 * math.sqrt(POISSON_DENSITY * area / (math.pi * nb_points))
+    max_dot = math.cos(min(min_angle, math.pi))
+
+    rng = np.random.default_rng(seed & 0xFFFFFFFF) # numpy seeds must be non negative
+    points = np.empty((nb_points, 3))
+    for i in range(nb_points):
+        candidates = uv_to_directions(rng.random(POISSON_CANDIDATES), rng.random(POISSON_CANDIDATES), upper_views)
+        if i == 0:
+            points[i] = candidates[0]
+            continue
+
+        closest = (candidates @ points[:i].T).max(axis=1) # cosine of the angle to the closest previous view
+        valid = np.flatnonzero(closest <= max_dot)
+        points[i] = candidates[valid[0]] if len(valid) > 0 else candidates[np.argmin(closest)]
+
+    return points
+
+# indices of camera poses in farthest point sampling order, on positions (normalized by the trajectory extent) and view directions
+# the order stops after nb_views poses, or before the first pose closer than min_distance to a previous one
+def farthest_point_order(positions, directions, nb_views, min_distance=0.0):
+    if len(positions) == 0:
+        return []
+
+    extent = max(float(np.ptp(positions, axis=0).max()), 1e-6)
+    features = np.concatenate([positions / extent, directions / np.linalg.norm(directions, axis=1, keepdims=True)], axis=1)
+
+    order = [0]
+    distances = np.linalg.norm(features - features[0], axis=1)
+    distances[0] = -math.inf
+    while len(order) < nb_views:
+        index = int(np.argmax(distances))
+        if distances[index] <= min_distance: # remaining poses are duplicates
+            break
+        order.append(index)
+        distances = np.minimum(distances, np.linalg.norm(features - features[index], axis=1))
+        distances[index] = -math.inf
+
+    return order
+
+# indices of the most diverse camera poses (sorted), poses closer than min_distance to an already selected one are never selected
+def select_views(positions, directions, nb_views, min_distance=0.0):
+    return sorted(farthest_point_order(positions, directions, nb_views, min_distance))
+
+# indices of all camera poses, such that every prefix is spread over the views (duplicate poses included)
+def coverage_order(positions, directions):
+    return farthest_point_order(positions, directions, len(positions), min_distance=-math.inf)